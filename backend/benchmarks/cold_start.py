@@ -0,0 +1,185 @@
+"""
+Cold-start benchmark for the Lambda entry point.
+
+Each measurement runs in a fresh interpreter so nothing is served from sys.modules:
+- import cost per module from `python -X importtime`
+- time-to-first-response: importing `lambda_handler` plus handling a first `GET /` API Gateway event
+
+Usage (from backend/):
+    uv run benchmarks/cold_start.py --runs 5 --max-first-response-ms 6000
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Import roots of the two kinds of Lambda invocation
+ENTRY_POINTS = {
+    "lambda_handler": "backend.lambda_handler",
+    "http": "backend.main.server",
+    "sqs": "backend.main.outbox",
+}
+
+FIRST_RESPONSE_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from backend.lambda_handler import handler
+imported = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "GET /",
+    "rawPath": "/",
+    "rawQueryString": "",
+    "headers": {"host": "localhost"},
+    "requestContext": {
+        "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "cold-start"},
+        "stage": "$default",
+        "requestId": "cold-start",
+    },
+    "isBase64Encoded": False,
+}
+response = handler(event, None)
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (done - start) * 1000,
+    "status_code": response["statusCode"],
+}))
+"""
+
+
+def _run_python(args: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(output: str) -> list[dict]:
+    """Parse `-X importtime` lines into {module, self_us, cumulative_us, depth} entries"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": depth,
+        })
+    return entries
+
+
+def measure_imports(module: str) -> list[dict]:
+    result = _run_python(["-X", "importtime", "-c", f"import {module}"])
+    return parse_importtime(result.stderr)
+
+
+def package_costs(entries: list[dict]) -> dict[str, float]:
+    """Self import time in ms summed per top-level package"""
+    costs: dict[str, float] = defaultdict(float)
+    for entry in entries:
+        costs[entry["module"].split(".")[0]] += entry["self_us"] / 1000
+    return dict(costs)
+
+
+def measure_entry_point(module: str, runs: int, top: int) -> dict:
+    totals = []
+    per_package: dict[str, list[float]] = defaultdict(list)
+    first_party: dict[str, list[float]] = defaultdict(list)
+    for _ in range(runs):
+        entries = measure_imports(module)
+        totals.append(next(e["cumulative_us"] for e in entries if e["module"] == module) / 1000)
+        for package, cost in package_costs(entries).items():
+            per_package[package].append(cost)
+        for entry in entries:
+            if entry["module"].startswith("backend."):
+                first_party[entry["module"]].append(entry["cumulative_us"] / 1000)
+
+    def ranked(samples: dict[str, list[float]]) -> list[dict]:
+        medians = {name: statistics.median(values) for name, values in samples.items()}
+        return [
+            {"module": name, "ms": round(ms, 1)}
+            for name, ms in sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(totals), 1),
+        "packages": ranked(per_package),
+        "first_party": ranked(first_party),
+    }
+
+
+def measure_first_response(runs: int) -> dict:
+    samples = [json.loads(_run_python(["-c", FIRST_RESPONSE_SNIPPET]).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "first_response_ms": round(statistics.median(s["first_response_ms"] for s in samples), 1),
+        "status_codes": sorted({s["status_code"] for s in samples}),
+    }
+
+
+def _print_report(report: dict) -> None:
+    for name, result in report["entry_points"].items():
+        print(f"\n{name}: import {result['module']} = {result['import_ms']:.1f} ms")
+        print("  self import time by package:")
+        for row in result["packages"]:
+            print(f"    {row['ms']:>9.1f} ms  {row['module']}")
+        print("  first-party modules (cumulative):")
+        for row in result["first_party"]:
+            print(f"    {row['ms']:>9.1f} ms  {row['module']}")
+
+    first = report["first_response"]
+    print(
+        f"\nTime to first response (GET /): {first['first_response_ms']:.1f} ms "
+        f"(import {first['import_ms']:.1f} ms, status {first['status_codes']})"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure Lambda cold-start import cost and time to first response")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="rows to show per ranking")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--max-import-ms", type=float, help="fail if importing the HTTP app takes longer")
+    parser.add_argument("--max-first-response-ms", type=float, help="fail if the first GET / takes longer")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "entry_points": {
+            name: measure_entry_point(module, args.runs, args.top) for name, module in ENTRY_POINTS.items()
+        },
+        "first_response": measure_first_response(args.runs),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    failures = []
+    if args.max_import_ms is not None and report["entry_points"]["http"]["import_ms"] > args.max_import_ms:
+        failures.append(f"HTTP import {report['entry_points']['http']['import_ms']:.1f} ms > {args.max_import_ms:.1f} ms")
+    if args.max_first_response_ms is not None and report["first_response"]["first_response_ms"] > args.max_first_response_ms:
+        failures.append(
+            f"first response {report['first_response']['first_response_ms']:.1f} ms > {args.max_first_response_ms:.1f} ms"
+        )
+    for failure in failures:
+        print(f"Cold-start budget exceeded: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
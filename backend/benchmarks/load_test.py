@@ -0,0 +1,608 @@
+"""
+Offline load test for the chat API.
+
+Serves the FastAPI app from backend/main/server.py with uvicorn and drives it over HTTP against local
+stand-ins, so no provider credits are spent:
+- a fake OpenAI/Anthropic-compatible LLM server (own thread and event loop) with configurable latency,
+  token rate, failure injection, evaluator rejections and tool calls
+- a fake Mailjet send endpoint on the same server, for emails queued by tool calls
+- an in-memory S3 client behind the S3 conversation backend
+
+Concurrent sessions each send several turns to /chat (or /chat/stream). The report has p50/p95/p99
+latency, requests/sec, event-loop lag of the app's loop, per-stage timings from the metrics module
+and upstream call counts, and is written as JSON so runs can be compared.
+
+Usage (from backend/):
+    uv run benchmarks/load_test.py --sessions 20 --turns 5 --output load.json
+    uv run benchmarks/load_test.py --stream --failure-rate 0.05 --baseline load.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import statistics
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+QUESTIONS = [
+    "Hi! What do you currently work on?",
+    "Which programming languages are you most comfortable with?",
+    "Tell me about a project you are proud of.",
+    "How do you approach system design for a new feature?",
+    "What did you study?",
+    "Have you worked with AWS?",
+    "What kind of role are you looking for next?",
+    "How do you handle production incidents?",
+]
+
+# Baseline comparison rows: (label, path into the report, lower is better)
+COMPARED = [
+    ("throughput rps", ("throughput_rps",), False),
+    ("latency p50 ms", ("latency_ms", "p50"), True),
+    ("latency p95 ms", ("latency_ms", "p95"), True),
+    ("latency p99 ms", ("latency_ms", "p99"), True),
+    ("loop lag p99 ms", ("event_loop_lag_ms", "p99"), True),
+    ("error rate", ("requests", "error_rate"), True),
+]
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_ms: float = 300.0
+    jitter_ms: float = 100.0
+    tokens_per_second: float = 200.0
+    reply_tokens: int = 60
+    failure_rate: float = 0.0
+    failure_status: int = 500
+    reject_rate: float = 0.1
+    tool_call_rate: float = 0.0
+
+
+@dataclass
+class FakeProviderStats:
+    requests: int = 0
+    streamed: int = 0
+    failures_injected: int = 0
+    evaluations: int = 0
+    rejections: int = 0
+    tool_calls: int = 0
+    mailjet_sends: int = 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def create_fake_provider(config: FakeProviderConfig, stats: FakeProviderStats):
+    """FastAPI app answering OpenAI chat completions, Anthropic messages and Mailjet sends"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+
+    def reply_for(messages: list, tools: Optional[list]) -> tuple[str, Optional[dict]]:
+        transcript = json.dumps(messages)
+        if "Return only JSON" in transcript:
+            stats.evaluations += 1
+            acceptable = random.random() >= config.reject_rate
+            stats.rejections += not acceptable
+            confidence = round(random.uniform(0.5, 1.0), 2)
+            return json.dumps({"is_acceptable": acceptable, "feedback": "ok" if acceptable else "Too vague", "confidence": confidence}), None
+        if "running summary" in transcript:
+            return "The visitor asked about background, skills and projects.", None
+        if tools and messages and messages[-1].get("role") != "tool" and random.random() < config.tool_call_rate:
+            stats.tool_calls += 1
+            return "", {"name": "record_unknown_question", "arguments": json.dumps({"question": "load test question"})}
+        words = ["I", "have", "worked", "on", "backend", "systems", "and", "AI", "features", "at", "scale."]
+        return " ".join(words[i % len(words)] for i in range(config.reply_tokens)), None
+
+    async def begin() -> Optional[JSONResponse]:
+        stats.requests += 1
+        await asyncio.sleep(max(config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms), 0) / 1000)
+        if random.random() < config.failure_rate:
+            stats.failures_injected += 1
+            return JSONResponse(
+                {"error": {"message": "injected failure", "type": "server_error"}}, status_code=config.failure_status
+            )
+        return None
+
+    def usage(messages, text: str) -> tuple[int, int]:
+        return len(json.dumps(messages)) // 4, max(len(text.split()), 1)
+
+    async def generate(text: str) -> None:
+        await asyncio.sleep(len(text.split()) / config.tokens_per_second)
+
+    async def stream_words(text: str):
+        words = text.split(" ")
+        for start in range(0, len(words), 5):
+            await asyncio.sleep(min(5, len(words) - start) / config.tokens_per_second)
+            yield " ".join(words[start:start + 5]) + (" " if start + 5 < len(words) else "")
+
+    @app.post("/v1/chat/completions")
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        failure = await begin()
+        if failure is not None:
+            return failure
+        text, tool_call = reply_for(body["messages"], body.get("tools"))
+        prompt_tokens, completion_tokens = usage(body["messages"], text)
+        model = body.get("model", "fake")
+
+        if body.get("stream"):
+            stats.streamed += 1
+
+            async def events():
+                def chunk(delta: dict, finish_reason=None, extra: Optional[dict] = None) -> str:
+                    payload = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                        **(extra or {}),
+                    }
+                    return f"data: {json.dumps(payload)}\n\n"
+
+                if tool_call:
+                    yield chunk({"role": "assistant", "tool_calls": [{"index": 0, "id": "call_fake", "type": "function", "function": tool_call}]})
+                    yield chunk({}, "tool_calls")
+                else:
+                    async for piece in stream_words(text):
+                        yield chunk({"role": "assistant", "content": piece})
+                    usage_block = {"usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}}
+                    yield chunk({}, "stop", usage_block)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await generate(text)
+        message = {"role": "assistant", "content": text or None}
+        if tool_call:
+            message["tool_calls"] = [{"id": "call_fake", "type": "function", "function": tool_call}]
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(request: Request):
+        body = await request.json()
+        failure = await begin()
+        if failure is not None:
+            return failure
+        messages = [{"role": "system", "content": body.get("system", "")}] + body["messages"]
+        # Tool calls are only simulated on the OpenAI-compatible endpoint
+        text, _ = reply_for(messages, None)
+        input_tokens, output_tokens = usage(messages, text)
+        model = body.get("model", "fake")
+
+        if body.get("stream"):
+            stats.streamed += 1
+
+            async def events():
+                def event(name: str, data: dict) -> str:
+                    return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+
+                yield event("message_start", {"message": {
+                    "id": "msg_fake", "type": "message", "role": "assistant", "model": model, "content": [],
+                    "stop_reason": None, "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+                }})
+                yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+                async for piece in stream_words(text):
+                    yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": piece}})
+                yield event("content_block_stop", {"index": 0})
+                yield event("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": output_tokens}})
+                yield event("message_stop", {})
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await generate(text)
+        return {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    @app.post("/v3.1/send")
+    async def mailjet_send(request: Request):
+        body = await request.json()
+        stats.mailjet_sends += len(body.get("Messages", []))
+        return {"Messages": [{"Status": "success"} for _ in body.get("Messages", [])]}
+
+    return app
+
+
+class FakeS3Client:
+    """Thread-safe in-memory stand-in for the boto3 S3 calls the S3 conversation backend makes"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.objects: dict[str, bytes] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        # boto3 calls run in worker threads, so blocking here is what a slow S3 round trip looks like
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _error(code: str, operation: str):
+        from botocore.exceptions import ClientError
+
+        return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+    def get_paginator(self, operation: str):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix="", StartAfter=""):
+                client._call()
+                with client._lock:
+                    keys = sorted(key for key in client.objects if key.startswith(Prefix) and key > StartAfter)
+                yield {"Contents": [{"Key": key} for key in keys]} if keys else {}
+
+        return Paginator()
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", MaxKeys=1000):
+        self._call()
+        with self._lock:
+            keys = sorted(key for key in self.objects if key.startswith(Prefix) and key > StartAfter)[:MaxKeys]
+        return {"Contents": [{"Key": key} for key in keys]} if keys else {}
+
+    def get_object(self, Bucket, Key):
+        self._call()
+        with self._lock:
+            body = self.objects.get(Key)
+        if body is None:
+            raise self._error("NoSuchKey", "GetObject")
+
+        class Body:
+            def read(self):
+                return body
+
+        return {"Body": Body()}
+
+    def put_object(self, Bucket, Key, Body, IfNoneMatch=None, **kwargs):
+        self._call()
+        with self._lock:
+            if IfNoneMatch == "*" and Key in self.objects:
+                raise self._error("PreconditionFailed", "PutObject")
+            self.objects[Key] = Body
+        return {}
+
+    def delete_object(self, Bucket, Key):
+        self._call()
+        with self._lock:
+            self.objects.pop(Key, None)
+        return {}
+
+
+def start_fake_provider(config: FakeProviderConfig, stats: FakeProviderStats) -> str:
+    """Run the fake provider with uvicorn in a daemon thread, so its work stays off the app's event loop"""
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_fake_provider(config, stats), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-provider", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def configure_environment(provider_url: str, args) -> None:
+    """Point the backend at the stand-ins; must run before backend.main is imported"""
+    os.environ.update({
+        "USE_OPENROUTER": "false",
+        "USE_EVALUATION_OPENROUTER": "false",
+        "OPENCODE_GO_API_KEY": "load-test",
+        "OPENCODE_GO_API_STYLE": args.api_style,
+        "OPENCODE_GO_OPENAI_BASE_URL": f"{provider_url}/v1",
+        "OPENCODE_GO_ANTHROPIC_BASE_URL": provider_url,
+        "OPENROUTER_API_KEY": "load-test",
+        "OPENROUTER_BASE_URL": f"{provider_url}/api/v1",
+        "MAILJET_API_URL": f"{provider_url}/v3.1/send",
+        "MAILJET_API_KEY": "load-test",
+        "MAILJET_API_SECRET": "load-test",
+        "MAILJET_FROM_EMAIL": "twin@example.com",
+        "MAILJET_TO_EMAIL": "owner@example.com",
+        "EMAIL_OUTBOX_BACKEND": "memory",
+        "RESUME_SOURCE": "bundled",
+        "MEMORY_BACKEND": "memory",
+        "CHECK_CHAT_API_KEY": "false",
+        "METRICS_EMF_ENABLED": "false",
+        "PERSONA_RELOAD_INTERVAL_SECONDS": "0",
+    })
+    for assignment in args.env:
+        name, _, value = assignment.partition("=")
+        os.environ[name] = value
+
+
+@dataclass
+class RequestResult:
+    latency_ms: float
+    ok: bool
+    first_token_ms: Optional[float] = None
+
+
+@dataclass
+class LoadTestRun:
+    results: list[RequestResult] = field(default_factory=list)
+    loop_lag_ms: list[float] = field(default_factory=list)
+    stages: dict[str, list[float]] = field(default_factory=dict)
+
+
+async def _chat_turn(client, args, payload: dict) -> tuple[RequestResult, Optional[str]]:
+    started = time.perf_counter()
+    if not args.stream:
+        response = await client.post("/chat", json=payload)
+        ok = response.status_code == 200
+        session_id = response.json().get("session_id") if ok else None
+        return RequestResult((time.perf_counter() - started) * 1000, ok), session_id
+
+    first_token, session_id, ok, event = None, None, False, None
+    async with client.stream("POST", "/chat/stream", json=payload) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+                if event == "token" and first_token is None:
+                    first_token = (time.perf_counter() - started) * 1000
+            elif line.startswith("data: ") and event in {"session", "done"}:
+                data = json.loads(line.removeprefix("data: "))
+                session_id = data.get("session_id", session_id)
+                ok = ok or event == "done"
+    return RequestResult((time.perf_counter() - started) * 1000, ok, first_token), session_id
+
+
+async def _session(client, index: int, args, run: LoadTestRun, limit: asyncio.Semaphore) -> None:
+    session_id = None
+    for turn in range(args.turns):
+        payload = {"message": QUESTIONS[(index + turn) % len(QUESTIONS)], "session_id": session_id}
+        async with limit:
+            try:
+                result, returned_id = await _chat_turn(client, args, payload)
+            except Exception:
+                result, returned_id = RequestResult(0.0, False), None
+        run.results.append(result)
+        session_id = returned_id or session_id
+        if args.think_ms:
+            await asyncio.sleep(args.think_ms / 1000)
+
+
+async def _monitor_loop_lag(run: LoadTestRun, stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        run.loop_lag_ms.append(max(time.perf_counter() - started - interval, 0.0) * 1000)
+
+
+async def drive(args, run: LoadTestRun) -> float:
+    """Serve the app on this event loop and run all sessions; returns the wall time in seconds"""
+    import httpx
+    import uvicorn
+    from backend.main.server import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(run, stop))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    limit = asyncio.Semaphore(args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            # One request first, so lazy imports and persona loading are not counted as load
+            await _chat_turn(client, args, {"message": "warm up", "session_id": None})
+            run.results.clear()
+            run.stages.clear()
+            started = time.perf_counter()
+            await asyncio.gather(*(_session(client, index, args, run, limit) for index in range(args.sessions)))
+            return time.perf_counter() - started
+    finally:
+        stop.set()
+        await monitor
+        server.should_exit = True
+        await serving
+
+
+def build_report(args, run: LoadTestRun, wall_seconds: float, provider_stats: FakeProviderStats, s3: Optional[FakeS3Client]) -> dict:
+    from backend.main.clients import client_registry
+    from backend.main.metrics import metrics
+    from backend.main.model_client import model_router
+    from backend.main.provider_health import provider_health
+
+    snapshot = metrics.snapshot()
+
+    def counter(name: str, *label_names: str) -> dict:
+        totals: dict[str, float] = {}
+        for row in snapshot["counters"].get(name, []):
+            key = "/".join(str(row["labels"].get(label)) for label in label_names) if label_names else "total"
+            totals[key] = totals.get(key, 0) + row["value"]
+        return totals
+
+    ok = [result for result in run.results if result.ok]
+    total = len(run.results)
+    first_tokens = [result.first_token_ms for result in ok if result.first_token_ms is not None]
+    tokens = counter("llm_tokens_total", "kind")
+    return {
+        "started_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(args).items() if key not in {"output", "baseline", "json"}},
+        "requests": {
+            "total": total,
+            "errors": total - len(ok),
+            "error_rate": round((total - len(ok)) / total, 4) if total else None,
+        },
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else None,
+        "latency_ms": _percentiles([result.latency_ms for result in ok]),
+        "time_to_first_token_ms": _percentiles(first_tokens),
+        "event_loop_lag_ms": _percentiles(run.loop_lag_ms),
+        "stages_ms": {stage: {"count": len(samples), **_percentiles(samples)} for stage, samples in sorted(run.stages.items())},
+        "llm": {
+            "calls": counter("llm_calls_total", "label"),
+            "input_tokens": tokens.get("input", 0),
+            "cached_tokens": tokens.get("cached", 0),
+            "output_tokens": tokens.get("output", 0),
+        },
+        "evaluations": counter("evaluations_total", "result"),
+        "evaluator_tiers": counter("evaluator_tier_total", "tier", "verdict", "decision"),
+        "provider_errors": counter("provider_errors_total", "api_style", "kind"),
+        "provider_fallbacks": counter("provider_fallbacks_total", "from_style", "to_style"),
+        "provider_health": provider_health.status(),
+        "connections": client_registry.connection_stats(),
+        "model_router": model_router.status(),
+        "fake_provider": asdict(provider_stats),
+        "fake_s3_requests": s3.requests if s3 else None,
+    }
+
+
+def _lookup(report: dict, path: tuple):
+    for key in path:
+        report = (report or {}).get(key)
+    return report
+
+
+def _print_report(report: dict, baseline: Optional[dict]) -> None:
+    requests = report["requests"]
+    print(f"\n{requests['total']} requests, {requests['errors']} errors in {report['wall_seconds']:.1f}s "
+          f"({report['throughput_rps']} req/s)")
+    for name in ("latency_ms", "time_to_first_token_ms", "event_loop_lag_ms"):
+        if report[name]:
+            values = report[name]
+            print(f"  {name:<24} p50 {values['p50']:>9.1f}  p95 {values['p95']:>9.1f}  p99 {values['p99']:>9.1f}  max {values['max']:>9.1f}")
+    print("  stages (ms):")
+    for stage, values in report["stages_ms"].items():
+        print(f"    {stage:<22} n={values['count']:<5} p50 {values['p50']:>9.1f}  p95 {values['p95']:>9.1f}")
+    print(f"  upstream calls: {report['llm']['calls']}  evaluations: {report['evaluations']}")
+
+    if baseline:
+        print("\nCompared with baseline:")
+        for label, path, lower_is_better in COMPARED:
+            current, previous = _lookup(report, path), _lookup(baseline, path)
+            if current is None or previous is None:
+                continue
+            if not previous:
+                print(f"  {label:<18} {previous:>10} -> {current:<10}")
+                continue
+            change = (current - previous) / previous * 100
+            better = (change < 0) == lower_is_better if change else True
+            print(f"  {label:<18} {previous:>10} -> {current:<10} ({change:+.1f}%{'' if better else ', worse'})")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the chat API offline against fake providers")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent visitor sessions")
+    parser.add_argument("--turns", type=int, default=4, help="turns per session")
+    parser.add_argument("--concurrency", type=int, help="max in-flight requests (defaults to --sessions)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a session's turns")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--storage", choices=["memory", "s3"], default="s3", help="conversation backend (s3 uses an in-memory S3 client)")
+    parser.add_argument("--s3-latency-ms", type=float, default=20.0, help="latency of each fake S3 call")
+    parser.add_argument("--api-style", choices=["openai", "anthropic"], default="openai", help="fake OpenCode Go API style")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake provider time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="uniform +/- jitter on --latency-ms")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="fake provider output token rate")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="words per fake agent reply")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of provider calls answered with an error")
+    parser.add_argument("--failure-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--reject-rate", type=float, default=0.1, help="share of replies the fake evaluator rejects")
+    parser.add_argument("--tool-call-rate", type=float, default=0.0, help="share of agent calls answered with a tool call (OpenAI style only)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="client timeout per request in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra backend setting, e.g. EVALUATION_MODE=tiered")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for jitter, failures and rejections")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or args.sessions
+    random.seed(args.seed)
+
+    provider_config = FakeProviderConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        reject_rate=args.reject_rate,
+        tool_call_rate=args.tool_call_rate,
+    )
+    provider_stats = FakeProviderStats()
+    provider_url = start_fake_provider(provider_config, provider_stats)
+    configure_environment(provider_url, args)
+
+    sys.path.insert(0, PROJECT_ROOT)
+    from backend.main import conversation
+    from backend.main.metrics import trace_listeners
+
+    s3 = None
+    if args.storage == "s3":
+        s3 = FakeS3Client(args.s3_latency_ms)
+        conversation.conversation_store.backend = conversation.S3Backend("load-test", client=s3)
+
+    run = LoadTestRun()
+
+    def collect_stages(trace, elapsed, outcome) -> None:
+        for stage, seconds in trace.stages.items():
+            run.stages.setdefault(stage, []).append(seconds * 1000)
+
+    trace_listeners.append(collect_stages)
+    wall_seconds = asyncio.run(drive(args, run))
+    report = build_report(args, run, wall_seconds, provider_stats, s3)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
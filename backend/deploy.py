@@ -6,6 +6,8 @@ import time
 
 import boto3
 
+from main.resources import build_resource_bundle
+
 
 def main():
     print("Creating Lambda deployment package...")
@@ -45,6 +47,10 @@ def main():
         check=True,
     )
 
+    # Precompile persona documents so the Lambda cold start never parses PDFs
+    print("Building persona resource bundle...")
+    build_resource_bundle()
+
     # Copy application files
     print("Copying application files...")
 
@@ -1,5 +1,23 @@
 from mangum import Mangum
-from backend.main.server import app
 
-# Create the Lambda handler
-handler = Mangum(app)
+_http_handler = None
+
+
+def http_handler(event, context):
+    # The FastAPI app (agent, litellm, provider clients) is only imported by containers serving HTTP
+    global _http_handler
+    if _http_handler is None:
+        from backend.main.server import app
+
+        _http_handler = Mangum(app)
+    return _http_handler(event, context)
+
+
+def handler(event, context):
+    # SQS batches come from the email outbox queue, everything else is API Gateway traffic
+    records = event.get("Records") or []
+    if records and records[0].get("eventSource") == "aws:sqs":
+        from backend.main.outbox import handle_sqs_event
+
+        return handle_sqs_event(event)
+    return http_handler(event, context)
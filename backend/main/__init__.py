@@ -0,0 +1,4 @@
+from .env import load_environment
+
+# Every module in this package reads its settings after the environment is loaded
+load_environment()
@@ -0,0 +1,103 @@
+import os
+import time
+import base64
+import logging
+from threading import Lock
+
+import requests
+
+from .clients import client_registry
+from .constants import RESUME_URL
+from .resources import data_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_RESUME_CACHE_TTL_SECONDS = 3600
+BUNDLED_RESUME_PATH = os.path.join(data_dir, "resume.pdf")
+
+
+def _resume_source() -> str:
+    """`remote` serves RESUME_URL with revalidation, `bundled` only ever serves backend/data/resume.pdf"""
+    source = os.getenv("RESUME_SOURCE", "remote").strip().lower()
+    if source not in {"remote", "bundled"}:
+        raise ValueError("RESUME_SOURCE must be remote or bundled")
+    return source
+
+
+def _cache_ttl() -> float:
+    return float(os.getenv("RESUME_CACHE_TTL_SECONDS", DEFAULT_RESUME_CACHE_TTL_SECONDS))
+
+
+class ResumeAttachmentCache:
+    """
+    Keeps the base64-encoded resume attachment in memory.
+    Remote copies are revalidated with ETag/Last-Modified once the TTL expires, and the
+    bundled PDF is served whenever the remote cannot be reached and nothing is cached yet.
+    """
+
+    def __init__(self, url: str = RESUME_URL, bundled_path: str = BUNDLED_RESUME_PATH):
+        self.url = url
+        self.bundled_path = bundled_path
+        self._lock = Lock()
+        self._payload: str | None = None
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._validated_at = 0.0
+        self._from_bundle = False
+
+    def _load_bundled(self) -> str:
+        with open(self.bundled_path, "rb") as f:
+            return base64.b64encode(f.read()).decode("utf-8")
+
+    def _use_bundled(self) -> str:
+        if self._payload is None or not self._from_bundle:
+            self._payload = self._load_bundled()
+            self._etag = None
+            self._last_modified = None
+            self._from_bundle = True
+        return self._payload
+
+    def _revalidate(self) -> str:
+        headers = {}
+        if self._payload is not None and not self._from_bundle:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+        response = client_registry.http_session("resume").get(self.url, headers=headers, timeout=30)
+        if response.status_code == 304 and headers:
+            logger.info("Resume attachment not modified, keeping cached copy")
+            return self._payload
+
+        response.raise_for_status()
+        self._payload = base64.b64encode(response.content).decode("utf-8")
+        self._etag = response.headers.get("ETag")
+        self._last_modified = response.headers.get("Last-Modified")
+        self._from_bundle = False
+        logger.info("Resume attachment downloaded (etag=%s)", self._etag)
+        return self._payload
+
+    def get_base64(self) -> str:
+        with self._lock:
+            if _resume_source() == "bundled":
+                return self._use_bundled()
+
+            if self._payload is not None and time.monotonic() - self._validated_at < _cache_ttl():
+                return self._payload
+
+            try:
+                payload = self._revalidate()
+            except requests.RequestException as e:
+                if self._payload is not None:
+                    logger.warning("Resume revalidation failed, serving cached copy: %s", str(e))
+                    payload = self._payload
+                else:
+                    logger.warning("Resume download failed, serving bundled copy: %s", str(e))
+                    payload = self._use_bundled()
+            self._validated_at = time.monotonic()
+            return payload
+
+
+resume_attachment = ResumeAttachmentCache()
@@ -0,0 +1,213 @@
+import os
+import json
+import logging
+from dataclasses import dataclass
+from threading import RLock
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import constants
+
+if TYPE_CHECKING:
+    from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_POOL_MAXSIZE = 20
+DEFAULT_POOL_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY_SECONDS = 60.0
+DEFAULT_HTTP_TIMEOUT_SECONDS = 60.0
+
+
+def _pool_maxsize() -> int:
+    return int(os.getenv("HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE))
+
+
+def _pool_keepalive() -> int:
+    return int(os.getenv("HTTP_POOL_KEEPALIVE", DEFAULT_POOL_KEEPALIVE))
+
+
+def _keepalive_expiry() -> float:
+    return float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", DEFAULT_KEEPALIVE_EXPIRY_SECONDS))
+
+
+def _http_timeout() -> float:
+    return float(os.getenv("HTTP_TIMEOUT_SECONDS", DEFAULT_HTTP_TIMEOUT_SECONDS))
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections_opened: int = 0
+
+    def snapshot(self) -> dict:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connection_reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+        }
+
+
+class _TracingAsyncTransport(httpx.AsyncHTTPTransport):
+    """Pooled httpx transport that counts requests and newly opened TCP connections"""
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                self.stats.connections_opened += 1
+
+        self.stats.requests += 1
+        request.extensions = {**request.extensions, "trace": trace}
+        return await super().handle_async_request(request)
+
+
+class ClientRegistry:
+    """
+    Process-lifetime upstream clients.
+    Created lazily on first use and kept for the life of the process, so uvicorn workers
+    and warm Lambda containers reuse keep-alive connections instead of a TLS handshake per call.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._clients: dict[str, object] = {}
+        self._stats: dict[str, ConnectionStats] = {}
+        self._mailjet: Optional[tuple[str, dict]] = None
+
+    def _get_or_create(self, name: str, factory):
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = factory()
+                logger.info("Created pooled client %s (pool size %s)", name, _pool_maxsize())
+            return self._clients[name]
+
+    def _stats_for(self, name: str) -> ConnectionStats:
+        return self._stats.setdefault(name, ConnectionStats())
+
+    def async_http_client(self, name: str) -> httpx.AsyncClient:
+        def factory() -> httpx.AsyncClient:
+            limits = httpx.Limits(
+                max_connections=_pool_maxsize(),
+                max_keepalive_connections=_pool_keepalive(),
+                keepalive_expiry=_keepalive_expiry(),
+            )
+            return httpx.AsyncClient(
+                transport=_TracingAsyncTransport(self._stats_for(name), limits=limits),
+                timeout=_http_timeout(),
+            )
+
+        return self._get_or_create(name, factory)
+
+    def http_session(self, name: str) -> requests.Session:
+        def factory() -> requests.Session:
+            stats = self._stats_for(name)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_pool_keepalive(), pool_maxsize=_pool_maxsize())
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            def count_request(response, *args, **kwargs):
+                stats.requests += 1
+
+            session.hooks["response"].append(count_request)
+            return session
+
+        return self._get_or_create(name, factory)
+
+    def openrouter_client(self) -> "AsyncOpenAI":
+        return self.openai_compatible_client("openrouter", constants.OPENROUTER_BASE_URL, os.getenv("OPENROUTER_API_KEY"))
+
+    def openai_compatible_client(self, name: str, base_url: str, api_key: Optional[str]) -> "AsyncOpenAI":
+        """AsyncOpenAI client for an OpenAI-compatible provider, on its own connection pool"""
+        def factory() -> "AsyncOpenAI":
+            from openai import AsyncOpenAI
+
+            return AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.async_http_client(f"{name}_http"),
+            )
+
+        return self._get_or_create(name, factory)
+
+    def configure_litellm(self) -> None:
+        """Route litellm's OpenAI-compatible calls (agent model and OpenCode Go completions) through a shared pool"""
+        import litellm
+
+        if litellm.aclient_session is None:
+            litellm.aclient_session = self.async_http_client("litellm")
+
+    def litellm_http_handler(self, name: str) -> "AsyncHTTPHandler":
+        """
+        litellm's Anthropic and OpenRouter routes ignore `litellm.aclient_session` and open their own aiohttp session,
+        so those calls pass this handler (as litellm's `client` argument) to use the pooled httpx client `name` instead
+        """
+        def factory() -> "AsyncHTTPHandler":
+            from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+            pooled = self.async_http_client(name)
+
+            class PooledHandler(AsyncHTTPHandler):
+                def create_client(self, *args, **kwargs) -> httpx.AsyncClient:
+                    # AsyncHTTPHandler.__init__ gets its client from this factory; the pooled one is used instead
+                    return pooled
+
+                def __deepcopy__(self, memo):
+                    # Model settings carrying the handler are deep-copied for tracing; the pool stays shared
+                    return self
+
+            return PooledHandler(timeout=_http_timeout(), client_alias=name)
+
+        return self._get_or_create(f"{name}_handler", factory)
+
+    def _mailjet_endpoint(self) -> tuple[str, dict]:
+        """Send URL and headers from mailjet_rest's config, read once"""
+        if self._mailjet is None:
+            from mailjet_rest import Client
+
+            url, headers = Client(auth=("", ""), version="v3.1").config["send"]
+            self._mailjet = (os.getenv("MAILJET_API_URL") or url, headers)
+        return self._mailjet
+
+    def mailjet_send(self, data: dict) -> requests.Response:
+        """
+        POST a Mailjet v3.1 send payload over the pooled Mailjet session.
+        Raises `requests.HTTPError` on a non-2xx answer (Mailjet reports rejected messages as 400)
+        so callers such as the email outbox retry or dead-letter the send instead of treating it as delivered
+        """
+        url, headers = self._mailjet_endpoint()
+        response = self.http_session("mailjet").post(
+            url,
+            data=json.dumps(data),
+            headers=headers,
+            auth=(os.getenv("MAILJET_API_KEY"), os.getenv("MAILJET_API_SECRET")),
+            timeout=_http_timeout(),
+        )
+        if not response.ok:
+            logger.error("Mailjet send failed with HTTP %s: %s", response.status_code, response.text[:500])
+        response.raise_for_status()
+        return response
+
+    def connection_stats(self) -> dict:
+        for name, client in list(self._clients.items()):
+            if isinstance(client, requests.Session):
+                # urllib3 pools track how many connections they opened themselves
+                pools = client.get_adapter("https://").poolmanager.pools
+                self._stats[name].connections_opened = sum(pools[key].num_connections for key in pools.keys())
+        return {name: stats.snapshot() for name, stats in list(self._stats.items())}
+
+
+client_registry = ClientRegistry()
@@ -1,8 +1,11 @@
+import os
+
+# Provider base URLs can be pointed elsewhere (e.g. the offline load-test provider) through the environment
 ANTHROPIC_BASE_URL = "https://api.anthropic.com/v1/"
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
-OPENCODE_GO_OPENAI_BASE_URL = "https://opencode.ai/zen/go/v1"
-OPENCODE_GO_ANTHROPIC_BASE_URL = "https://opencode.ai/zen/go"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENCODE_GO_OPENAI_BASE_URL = os.getenv("OPENCODE_GO_OPENAI_BASE_URL", "https://opencode.ai/zen/go/v1")
+OPENCODE_GO_ANTHROPIC_BASE_URL = os.getenv("OPENCODE_GO_ANTHROPIC_BASE_URL", "https://opencode.ai/zen/go")
 RESUME_URL = "https://storage.googleapis.com/kaushik-resources/Kaushik%20Paul%20Resume.pdf"
@@ -1,15 +1,40 @@
-from .resources import resume, summary, facts, style, linkedin
-from datetime import datetime
+from datetime import date
+import hashlib
 
-
-full_name = facts["full_name"]
-name = facts["name"]
+from .resources import derived_artifact, load_resources
+from .retrieval import retrieval_enabled
 
 
 class ChatPrompt:
 
     @staticmethod
-    def prompt():
+    def _profile_documents(resources):
+        name = resources.facts["name"]
+        if retrieval_enabled():
+            return (
+                f"Excerpts from {name}'s summary notes, resume and Linkedin profile that are relevant to the user's latest message "
+                "are provided right after that message, in a note marked as reference material that was not written by the user, "
+                "under \"Relevant excerpts from the profile documents\". Treat them as part of this context."
+            )
+        return f"""Here are summary notes from {name}:
+            {resources.summary}
+            
+            Here is the Resume of {name}:
+            {resources.resume}
+            
+            Here is the Linkedin profile of {name}:
+            {resources.linkedin}"""
+
+    @staticmethod
+    @derived_artifact()
+    def persona_prompt(snapshot):
+        """
+        Static persona system prompt.
+        Built once per persona resources version and byte-identical across requests so provider-side prompt caching can reuse it;
+        anything that changes per request belongs in `prompt()` after this prefix.
+        """
+        resources = snapshot.resources
+        full_name, name = resources.facts["full_name"], resources.facts["name"]
         return f"""
             # Your Role
             
@@ -21,23 +46,12 @@ class ChatPrompt:
             ## Important Context
             
             Here is some basic information about {name}:
-            {facts}
-            
-            Here are summary notes from {name}:
-            {summary}
+            {resources.facts}
             
-            Here is the Resume of {name}:
-            {resume}
-            
-            Here is the Linkedin profile of {name}:
-            {linkedin}
+            {ChatPrompt._profile_documents(resources)}
             
             Here are some notes from {name} about their communications style:
-            {style}
-            
-            
-            For reference, here is the current date and time:
-            {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+            {resources.style}
             
             ## Your task
             
@@ -82,16 +96,36 @@ class ChatPrompt:
             Avoid responding in a way that feels like a chatbot or AI assistant, and don't end every message with a question; channel a smart conversation with an engaging person, a true reflection of {name}.
             """
 
+    @staticmethod
+    @derived_artifact()
+    def prompt_hash(snapshot):
+        return hashlib.sha256(ChatPrompt.persona_prompt(snapshot).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def date_context():
+        return f"## Current date\nFor reference, today's date is {date.today().isoformat()}."
+
+    @staticmethod
+    def prompt():
+        return ChatPrompt.persona_prompt() + "\n\n" + ChatPrompt.date_context()
+
 class EvaluationPrompt:
     @staticmethod
-    def fetch_evaluator_system_prompt():
+    @derived_artifact()
+    def fetch_evaluator_system_prompt(snapshot):
+        resources = snapshot.resources
+        full_name, name = resources.facts["full_name"], resources.facts["name"]
         evaluator_system_prompt = f"You are an evaluator that decides whether a response to a question is acceptable. \
         You are provided with a conversation between a User and an Agent. Your task is to decide whether the Agent's latest response is acceptable quality, with a focus on staying faithful to {full_name}'s real background, skills, and professional persona. \
         The Agent is playing the role of {full_name} and is representing {full_name} on their website. \
         The Agent has been instructed to be professional and engaging, as if talking to a potential client or future employer who came across the website. \
         The Agent has been provided with context on {full_name} in the form of their summary and Resume details. Here's the information:"
 
-        evaluator_system_prompt += f"\n\n## Summary:\n{summary}\n\n## Resume:\n{resume}\n\n"
+        if retrieval_enabled():
+            evaluator_system_prompt += f"\n\n## Facts:\n{resources.facts}\n\n"
+            evaluator_system_prompt += "Excerpts from the summary and resume that are relevant to each response are provided with it, under \"Relevant excerpts from the profile documents\".\n\n"
+        else:
+            evaluator_system_prompt += f"\n\n## Summary:\n{resources.summary}\n\n## Resume:\n{resources.resume}\n\n"
         evaluator_system_prompt += f"The Agent is not a generic chatbot with no outside capabilities. In this application, the Agent has access to these tool-backed actions: \
         `record_user_details` records contact details when a user shares an email address or asks to stay in touch; \
         `record_unknown_question` logs questions the Agent cannot confidently answer; \
@@ -109,9 +143,28 @@ class EvaluationPrompt:
         return evaluator_system_prompt
 
     @staticmethod
-    def evaluator_user_prompt(reply, message, history):
-        user_prompt = f"Here's the conversation between the User and the Agent: \n\n{history}\n\n"
+    def evaluator_user_prompt(reply, message, history, excerpts=""):
+        user_prompt = f"{excerpts}\n\n" if excerpts else ""
+        user_prompt += f"Here's the conversation between the User and the Agent: \n\n{history}\n\n"
         user_prompt += f"Here's the latest message from the User: \n\n{message}\n\n"
         user_prompt += f"Here's the latest response from the Agent: \n\n{reply}\n\n"
         user_prompt += "Please evaluate the response, replying with whether it is acceptable and your feedback."
         return user_prompt
+
+
+class SummaryPrompt:
+    @staticmethod
+    def system_prompt():
+        full_name = load_resources().facts["full_name"]
+        return f"You maintain a running summary of a conversation between a website visitor (User) and the AI digital twin of {full_name} (Agent). \
+        Merge the previous summary with the new messages into one updated summary of at most 200 words. \
+        Keep facts the visitor shared about themselves (name, email, company, role, what they are looking for), questions they asked, \
+        what the Agent answered or promised, and any actions taken such as recording contact details or sending the resume. \
+        Drop greetings and small talk. Write plain prose in the third person and return only the summary."
+
+    @staticmethod
+    def user_prompt(previous_summary, transcript):
+        user_prompt = f"## Previous summary:\n{previous_summary or 'None yet.'}\n\n"
+        user_prompt += f"## New messages to fold into the summary:\n{transcript}\n\n"
+        user_prompt += "Return the updated summary."
+        return user_prompt
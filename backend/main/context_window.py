@@ -0,0 +1,224 @@
+import os
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .clients import client_registry
+from .context import SummaryPrompt
+from .conversation import SessionLog, conversation_store
+from .metrics import span
+from .model_client import (
+    active_chat_model_name,
+    model_router,
+    opencode_go_completion,
+    record_prompt_cache_usage,
+    use_openrouter,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SUMMARY_ROLE = "summary"
+PROMPT_FIELDS = ("role", "content")
+
+DEFAULT_RECENT_TURNS = 6
+DEFAULT_SUMMARY_BATCH_TURNS = 4
+DEFAULT_HISTORY_TOKENS = 4000
+DEFAULT_SUMMARY_WAIT_SECONDS = 2.0
+# History budget (summary plus verbatim turns) per chat model, well below each context window
+MODEL_HISTORY_TOKENS = {
+    "deepseek-v4-flash": 6000,
+    "google/gemini-2.5-flash-lite": 8000,
+}
+
+
+def summary_enabled() -> bool:
+    return os.getenv("CONTEXT_SUMMARY_ENABLED", "true").strip().lower() == "true"
+
+
+def _recent_turns() -> int:
+    return int(os.getenv("CONTEXT_RECENT_TURNS", DEFAULT_RECENT_TURNS))
+
+
+def _summary_batch_turns() -> int:
+    return int(os.getenv("CONTEXT_SUMMARY_BATCH_TURNS", DEFAULT_SUMMARY_BATCH_TURNS))
+
+
+def _summary_wait_seconds() -> float:
+    return float(os.getenv("CONTEXT_SUMMARY_WAIT_SECONDS", DEFAULT_SUMMARY_WAIT_SECONDS))
+
+
+def history_token_budget(model: Optional[str] = None) -> int:
+    """`CONTEXT_HISTORY_TOKENS` overrides the per-model budget for history sent with each prompt"""
+    override = os.getenv("CONTEXT_HISTORY_TOKENS")
+    if override:
+        return int(override)
+    return MODEL_HISTORY_TOKENS.get(model or active_chat_model_name(), DEFAULT_HISTORY_TOKENS)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting and costs no tokenizer import
+    return len(text) // 4 + 1
+
+
+def strip_metadata(messages: List[Dict]) -> List[Dict]:
+    """Only role and content reach the model; timestamps and other stored fields are dropped"""
+    return [{key: message[key] for key in PROMPT_FIELDS} for message in messages]
+
+
+def conversation_messages(stored: List[Dict]) -> List[Dict]:
+    """Stored session entries without the rolling summary records"""
+    return [message for message in stored if message.get("role") != SUMMARY_ROLE]
+
+
+@dataclass
+class ContextWindow:
+    summary: Optional[str] = None
+    messages: List[Dict] = field(default_factory=list)
+    dropped: int = 0
+
+    def as_history(self) -> List[Dict]:
+        """Role-tagged history for model calls, led by the summary of older turns"""
+        history = list(self.messages)
+        if self.summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return history
+
+    def token_count(self) -> int:
+        return sum(estimate_tokens(message["content"]) for message in self.as_history())
+
+
+def _split_summary(stored: List[Dict]) -> tuple[Optional[Dict], List[Dict]]:
+    """Latest summary record and the conversation messages it does not cover"""
+    for index in range(len(stored) - 1, -1, -1):
+        if stored[index].get("role") == SUMMARY_ROLE:
+            # Covered by timestamp rather than position, so turns appended concurrently are never lost
+            record = stored[index]
+            through = record.get("through", "")
+            uncovered = [m for m in conversation_messages(stored) if m.get("timestamp", "") > through]
+            return record, uncovered
+    return None, conversation_messages(stored)
+
+
+def build_context_window(stored: List[Dict], model: Optional[str] = None) -> ContextWindow:
+    """
+    Bounded history for one turn: the rolling summary plus the newest turns verbatim.
+    Turns past the last K that are not summarized yet stay verbatim while the token budget allows;
+    the oldest messages are dropped first when the budget is exceeded.
+    """
+    record, uncovered = _split_summary(stored)
+    window = ContextWindow(summary=record["content"] if record else None, messages=strip_metadata(uncovered))
+
+    budget = history_token_budget(model)
+    while len(window.messages) > 2 and window.token_count() > budget:
+        window.messages.pop(0)
+        window.dropped += 1
+        if window.messages and window.messages[0]["role"] == "assistant":
+            window.messages.pop(0)
+            window.dropped += 1
+    if window.dropped:
+        logger.info("Context window dropped %s messages to fit %s tokens", window.dropped, budget)
+    return window
+
+
+def _transcript(messages: List[Dict]) -> str:
+    return "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+
+
+async def summarize(previous_summary: Optional[str], messages: List[Dict]) -> str:
+    """Fold `messages` into the previous summary with the chat model"""
+    model = active_chat_model_name()
+    request = [
+        {"role": "system", "content": SummaryPrompt.system_prompt()},
+        {"role": "user", "content": SummaryPrompt.user_prompt(previous_summary, _transcript(messages))},
+    ]
+    with span("summary"):
+        if model_router.active():
+            response, backend = await model_router.completion("summary", request)
+            model = backend.model
+        elif use_openrouter():
+            response = await client_registry.openrouter_client().chat.completions.create(model=model, messages=request)
+        else:
+            response = await opencode_go_completion(request, model)
+    record_prompt_cache_usage("summary", model, getattr(response, "usage", None))
+    return (response.choices[0].message.content or "").strip()
+
+
+def _turns_to_fold(session: SessionLog) -> tuple[Optional[Dict], List[Dict]]:
+    """Latest summary record and the messages due to be folded into it (empty until a batch is waiting)"""
+    record, uncovered = _split_summary(session.messages)
+    recent_count = _recent_turns() * 2
+    to_fold = uncovered[:-recent_count] if recent_count else uncovered
+    if len(to_fold) < _summary_batch_turns() * 2:
+        return record, []
+    return record, to_fold
+
+
+async def update_summary(session_id: str, session: SessionLog) -> SessionLog:
+    """
+    Incrementally fold turns older than the last K into the session's rolling summary.
+    Runs once CONTEXT_SUMMARY_BATCH_TURNS turns are waiting, so the summarizer is not called every turn;
+    the new summary is appended to the session log as a `summary` record.
+    """
+    if not summary_enabled():
+        return session
+    record, to_fold = _turns_to_fold(session)
+    if not to_fold:
+        return session
+
+    try:
+        summary = await summarize(record["content"] if record else None, strip_metadata(to_fold))
+    except Exception as e:
+        # The unsummarized turns stay in the window (within budget) and are retried next turn
+        logger.error("Summarizing session_id=%s failed: %s", session_id, str(e))
+        return session
+    if not summary:
+        return session
+
+    summary_record = {
+        "role": SUMMARY_ROLE,
+        "content": summary,
+        "through": to_fold[-1].get("timestamp", ""),
+        "timestamp": datetime.now().isoformat(),
+    }
+    logger.info("Folded %s messages into the summary for session_id=%s", len(to_fold), session_id)
+    return await conversation_store.append(session_id, session, [summary_record])
+
+
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+
+def schedule_summary(session_id: str, session: SessionLog) -> None:
+    """
+    Start `update_summary` as a detached task once a batch is due, so no reply waits on the summarizer.
+    At most one summary runs per session; on Lambda an unfinished task resumes with the container's next invocation.
+    """
+    if not summary_enabled() or not _turns_to_fold(session)[1]:
+        return
+    running = _summary_tasks.get(session_id)
+    if running is not None and not running.done():
+        return
+    task = asyncio.get_running_loop().create_task(update_summary(session_id, session))
+    _summary_tasks[session_id] = task
+
+    def forget(done: asyncio.Task) -> None:
+        if _summary_tasks.get(session_id) is done:
+            del _summary_tasks[session_id]
+
+    task.add_done_callback(forget)
+
+
+async def wait_for_summary(session_id: str) -> None:
+    """
+    Called before a turn loads its session: waits up to CONTEXT_SUMMARY_WAIT_SECONDS for a summary
+    still running for it, then carries on with the unsummarized turns (which the next summary picks up)
+    """
+    task = _summary_tasks.get(session_id)
+    if task is None or task.done():
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout=_summary_wait_seconds())
+    except asyncio.TimeoutError:
+        logger.info("Summary for session_id=%s still running, continuing without it", session_id)
@@ -1,53 +1,586 @@
 import os
 import json
-import boto3
-from botocore.exceptions import ClientError
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
 from typing import List, Dict
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
 MEMORY_DIR = os.getenv("MEMORY_DIR", "../../memory")
 USE_S3 = os.getenv("USE_S3", "false").lower() == "true"
 S3_BUCKET = os.getenv("S3_BUCKET", "")
+DYNAMODB_TABLE = os.getenv("DYNAMODB_TABLE", "")
+
+DEFAULT_CACHE_MAX_SESSIONS = 256
+DEFAULT_CACHE_TTL_SECONDS = 300.0
+DEFAULT_COMPACT_SEGMENTS = 20
+DEFAULT_S3_LOAD_CONCURRENCY = 8
+DEFAULT_APPEND_ATTEMPTS = 3
+DEFAULT_HISTORY_TURNS = 50
+DEFAULT_TTL_DAYS = 30
+
+
+def memory_backend() -> str:
+    """`MEMORY_BACKEND` picks the session store; without it `USE_S3` chooses between s3 and local"""
+    backend = os.getenv("MEMORY_BACKEND", "").strip().lower() or ("s3" if USE_S3 else "local")
+    if backend not in {"local", "s3", "dynamodb", "memory"}:
+        raise ValueError("MEMORY_BACKEND must be local, s3, dynamodb, or memory")
+    return backend
+
+
+def _cache_max_sessions() -> int:
+    return int(os.getenv("CONVERSATION_CACHE_MAX_SESSIONS", DEFAULT_CACHE_MAX_SESSIONS))
+
+
+def _cache_ttl() -> float:
+    return float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS))
+
+
+def cache_revalidation_enabled() -> bool:
+    return os.getenv("CONVERSATION_CACHE_REVALIDATE", "true").strip().lower() == "true"
+
+
+def _compact_segments() -> int:
+    return int(os.getenv("CONVERSATION_COMPACT_SEGMENTS", DEFAULT_COMPACT_SEGMENTS))
+
+
+def _s3_load_concurrency() -> int:
+    # Stays below botocore's default of 10 pooled connections per client
+    return int(os.getenv("CONVERSATION_S3_LOAD_CONCURRENCY", DEFAULT_S3_LOAD_CONCURRENCY))
+
+
+def _append_attempts() -> int:
+    return int(os.getenv("CONVERSATION_APPEND_ATTEMPTS", DEFAULT_APPEND_ATTEMPTS))
+
+
+def _history_turns() -> int:
+    return int(os.getenv("MEMORY_HISTORY_TURNS", DEFAULT_HISTORY_TURNS))
+
+
+def _ttl_days() -> float:
+    return float(os.getenv("MEMORY_TTL_DAYS", DEFAULT_TTL_DAYS))
+
+
+def _dump_lines(messages: List[Dict]) -> str:
+    return "".join(json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n" for message in messages)
+
+
+def _parse_lines(data: str) -> List[Dict]:
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+class ConcurrentWriteError(Exception):
+    """The session changed since it was loaded; reload it and append again"""
+
+
+@dataclass
+class SessionLog:
+    """
+    Messages of one session plus the backend version they were read at.
+    `version` is opaque to callers and is passed back on append for optimistic concurrency.
+    """
+    messages: List[Dict] = field(default_factory=list)
+    version: int = 0
+    compacted_version: int = 0
 
-# Initialize S3 client if needed
-if USE_S3:
-    s3_client = boto3.client("s3")
 
 # Memory management functions
 def get_memory_path(session_id: str) -> str:
+    """Pre-append-log session file, still read so existing sessions carry over"""
     return f"{session_id}.json"
 
 
-def load_conversation(session_id: str) -> List[Dict]:
-    """Load conversation history from storage"""
-    if USE_S3:
+def get_log_path(session_id: str) -> str:
+    return f"{session_id}.jsonl"
+
+
+class LocalFileBackend:
+    """
+    One JSON Lines file per session under MEMORY_DIR; each turn appends its messages.
+    The version is the byte length of the complete lines read, checked under an exclusive
+    file lock before appending. Blocking file I/O runs in a worker thread.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = MEMORY_DIR):
+        self.directory = directory
+
+    def _migrate_legacy(self, session_id: str, log_path: str) -> None:
+        legacy_path = os.path.join(self.directory, get_memory_path(session_id))
+        if os.path.exists(log_path) or not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, "r") as f:
+            messages = json.load(f)
+        tmp_path = log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(_dump_lines(messages))
+        os.replace(tmp_path, log_path)
+        os.remove(legacy_path)
+        logger.info("Migrated session %s to the append-only log", session_id)
+
+    def _load(self, session_id: str) -> SessionLog:
+        log_path = os.path.join(self.directory, get_log_path(session_id))
+        self._migrate_legacy(session_id, log_path)
+        try:
+            with open(log_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return SessionLog()
+        # A torn final line from an interrupted write is not part of the session
+        complete = data[: data.rfind(b"\n") + 1]
+        return SessionLog(messages=_parse_lines(complete.decode("utf-8")), version=len(complete))
+
+    def _append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        os.makedirs(self.directory, exist_ok=True)
+        log_path = os.path.join(self.directory, get_log_path(session_id))
+        payload = _dump_lines(messages).encode("utf-8")
+        with open(log_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                size = f.seek(0, os.SEEK_END)
+                if size != base.version:
+                    f.seek(base.version)
+                    tail = f.read()
+                    if size < base.version or b"\n" in tail:
+                        raise ConcurrentWriteError(f"Session {session_id} changed since it was loaded")
+                    f.truncate(base.version)
+                f.write(payload)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return SessionLog(messages=base.messages + messages, version=base.version + len(payload))
+
+    def _is_current(self, session_id: str, version: int) -> bool:
+        try:
+            return os.path.getsize(os.path.join(self.directory, get_log_path(session_id))) == version
+        except FileNotFoundError:
+            return version == 0
+
+    async def load(self, session_id: str) -> SessionLog:
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def is_current(self, session_id: str, version: int) -> bool:
+        """Whether the log still ends at `version`, from one stat call"""
+        return await asyncio.to_thread(self._is_current, session_id, version)
+
+    async def append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        return await asyncio.to_thread(self._append, session_id, base, messages)
+
+
+class S3Backend:
+    """
+    Append-only session log in S3_BUCKET: each turn writes a new immutable segment object
+    `<session_id>/segments/<seq>.jsonl` guarded by `IfNoneMatch="*"`, so two writers can never
+    claim the same sequence number. Every CONVERSATION_COMPACT_SEGMENTS segments the full
+    session is written to `<session_id>/snapshots/<seq>.jsonl`, and loads read the newest
+    snapshot plus only the segments after it, fetching the objects concurrently over the client's
+    connection pool. Segments are kept after compaction so a stale writer still collides on its
+    sequence number. boto3 calls run in a worker thread.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, client=None):
+        if client is None:
+            # boto3 is only imported for S3 storage
+            import boto3
+
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=_s3_load_concurrency(), thread_name_prefix="s3-load")
+
+    @staticmethod
+    def _segment_key(session_id: str, seq: int) -> str:
+        return f"{session_id}/segments/{seq:08d}.jsonl"
+
+    @staticmethod
+    def _snapshot_key(session_id: str, seq: int) -> str:
+        return f"{session_id}/snapshots/{seq:08d}.jsonl"
+
+    @staticmethod
+    def _seq_from_key(key: str) -> int:
+        return int(key.rsplit("/", 1)[1].split(".", 1)[0])
+
+    def _list_keys(self, prefix: str, start_after: str | None = None) -> List[str]:
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix}
+        if start_after:
+            kwargs["StartAfter"] = start_after
+        keys = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(**kwargs):
+            keys.extend(item["Key"] for item in page.get("Contents", []))
+        return sorted(keys)
+
+    def _get_text(self, key: str) -> str | None:
+        from botocore.exceptions import ClientError
+
         try:
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=get_memory_path(session_id))
-            return json.loads(response["Body"].read().decode("utf-8"))
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
         except ClientError as e:
             if e.response["Error"]["Code"] == "NoSuchKey":
-                return []
+                return None
+            raise
+        return response["Body"].read().decode("utf-8")
+
+    def _put_new(self, key: str, body: str) -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body.encode("utf-8"),
+                ContentType="application/x-ndjson",
+                IfNoneMatch="*",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in {"PreconditionFailed", "ConditionalRequestConflict"}:
+                raise ConcurrentWriteError(f"{key} was already written") from e
             raise
-    else:
-        # Local file storage
-        file_path = os.path.join(MEMORY_DIR, get_memory_path(session_id))
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                return json.load(f)
-        return []
-
-
-def save_conversation(session_id: str, messages: List[Dict]):
-    """Save conversation history to storage"""
-    if USE_S3:
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=get_memory_path(session_id),
-            Body=json.dumps(messages, indent=2),
-            ContentType="application/json",
+
+    def _load(self, session_id: str) -> SessionLog:
+        # LIST snapshots, then GET the snapshot while listing the segments after it, then GET those
+        # segments together: three round trips however many segments the session has
+        compacted = 0
+        snapshot = None
+        snapshots = self._list_keys(f"{session_id}/snapshots/")
+        if snapshots:
+            compacted = self._seq_from_key(snapshots[-1])
+            snapshot = self._executor.submit(self._get_text, snapshots[-1])
+
+        segments = self._list_keys(
+            f"{session_id}/segments/",
+            start_after=self._segment_key(session_id, compacted) if compacted else None,
+        )
+        if not snapshots and not segments:
+            # Sessions written before the append-only log are migrated by the first append
+            legacy = self._get_text(get_memory_path(session_id))
+            return SessionLog(messages=json.loads(legacy) if legacy else [])
+
+        contiguous = []
+        for key in segments:
+            if self._seq_from_key(key) != compacted + len(contiguous) + 1:
+                # A gap means a write is still in flight; stop at the last contiguous segment
+                break
+            contiguous.append(key)
+
+        messages: List[Dict] = _parse_lines(snapshot.result() or "") if snapshot else []
+        for text in self._executor.map(self._get_text, contiguous):
+            messages.extend(_parse_lines(text or ""))
+        return SessionLog(messages=messages, version=compacted + len(contiguous), compacted_version=compacted)
+
+    def _append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        seq = base.version + 1
+        # The first segment of a legacy session carries its earlier messages
+        segment = base.messages + messages if base.version == 0 else messages
+        self._put_new(self._segment_key(session_id, seq), _dump_lines(segment))
+        session = SessionLog(
+            messages=base.messages + messages, version=seq, compacted_version=base.compacted_version
         )
-    else:
-        # Local file storage
-        os.makedirs(MEMORY_DIR, exist_ok=True)
-        file_path = os.path.join(MEMORY_DIR, get_memory_path(session_id))
-        with open(file_path, "w") as f:
-            json.dump(messages, f, indent=2)
\ No newline at end of file
+        if seq - session.compacted_version >= _compact_segments():
+            try:
+                self._compact(session_id, session)
+            except Exception as e:
+                # The segments are already durable; compaction is retried on a later turn
+                logger.warning("Compaction failed for session %s: %s", session_id, str(e))
+        return session
+
+    def _compact(self, session_id: str, session: SessionLog) -> None:
+        try:
+            self._put_new(self._snapshot_key(session_id, session.version), _dump_lines(session.messages))
+        except ConcurrentWriteError:
+            pass
+        for key in self._list_keys(f"{session_id}/snapshots/"):
+            if self._seq_from_key(key) < session.version:
+                self.client.delete_object(Bucket=self.bucket, Key=key)
+        session.compacted_version = session.version
+        logger.info("Compacted session %s at segment %s", session_id, session.version)
+
+    def _is_current(self, session_id: str, version: int) -> bool:
+        kwargs = {"Bucket": self.bucket, "Prefix": f"{session_id}/segments/", "MaxKeys": 1}
+        if version:
+            kwargs["StartAfter"] = self._segment_key(session_id, version)
+        return not self.client.list_objects_v2(**kwargs).get("Contents")
+
+    async def load(self, session_id: str) -> SessionLog:
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def is_current(self, session_id: str, version: int) -> bool:
+        """Whether no segment was written after `version`, from one single-key LIST"""
+        return await asyncio.to_thread(self._is_current, session_id, version)
+
+    async def append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        return await asyncio.to_thread(self._append, session_id, base, messages)
+
+
+class DynamoDBBackend:
+    """
+    One item per message in DYNAMODB_TABLE, keyed by `session_id` (partition) and `seq` (sort).
+    Loads query the newest MEMORY_HISTORY_TURNS turns in descending `seq` order, one page at a
+    time, instead of reading the whole session. Appends write the turn in one transaction
+    conditioned on each `seq` being new, and set `expires_at` for DynamoDB TTL expiry.
+    DYNAMODB_ENDPOINT_URL points the client at DynamoDB Local or moto server for development.
+    boto3 calls run in a worker thread.
+    """
+
+    name = "dynamodb"
+
+    def __init__(self, table: str = DYNAMODB_TABLE, client=None):
+        if client is None:
+            # boto3 is only imported for DynamoDB storage
+            import boto3
+
+            client = boto3.client("dynamodb", endpoint_url=os.getenv("DYNAMODB_ENDPOINT_URL") or None)
+        self.table = table
+        self.client = client
+
+    def _load(self, session_id: str) -> SessionLog:
+        limit = _history_turns() * 2
+        now = int(time.time())
+        items: List[Dict] = []
+        version = 0
+        query = {
+            "TableName": self.table,
+            "KeyConditionExpression": "session_id = :session_id",
+            "ExpressionAttributeValues": {":session_id": {"S": session_id}},
+            "ProjectionExpression": "seq, message, expires_at",
+            "ScanIndexForward": False,
+            "ConsistentRead": True,
+        }
+        while True:
+            page = self.client.query(**query, Limit=max(limit - len(items), 1))
+            for item in page.get("Items", []):
+                seq = int(item["seq"]["N"])
+                version = max(version, seq)
+                # TTL deletion lags expiry by up to a few days, so expired items are skipped here
+                if "expires_at" in item and int(item["expires_at"]["N"]) <= now:
+                    continue
+                items.append(item)
+            if len(items) >= limit or "LastEvaluatedKey" not in page:
+                break
+            query["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+        messages = [json.loads(item["message"]["S"]) for item in reversed(items[:limit])]
+        return SessionLog(messages=messages, version=version)
+
+    def _append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        ttl_days = _ttl_days()
+        expires_at = int(time.time() + ttl_days * 86400) if ttl_days > 0 else None
+        transact_items = []
+        for offset, message in enumerate(messages, start=1):
+            item = {
+                "session_id": {"S": session_id},
+                "seq": {"N": str(base.version + offset)},
+                "message": {"S": json.dumps(message, ensure_ascii=False, separators=(",", ":"))},
+            }
+            if expires_at is not None:
+                item["expires_at"] = {"N": str(expires_at)}
+            transact_items.append({
+                "Put": {
+                    "TableName": self.table,
+                    "Item": item,
+                    "ConditionExpression": "attribute_not_exists(seq)",
+                }
+            })
+
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+        except self.client.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get("Code") for reason in e.response.get("CancellationReasons", [])]
+            if "ConditionalCheckFailed" in reasons:
+                raise ConcurrentWriteError(f"Session {session_id} changed since it was loaded") from e
+            raise
+
+        limit = _history_turns() * 2
+        return SessionLog(messages=(base.messages + messages)[-limit:], version=base.version + len(messages))
+
+    def _is_current(self, session_id: str, version: int) -> bool:
+        page = self.client.query(
+            TableName=self.table,
+            KeyConditionExpression="session_id = :session_id",
+            ExpressionAttributeValues={":session_id": {"S": session_id}},
+            ProjectionExpression="seq",
+            ScanIndexForward=False,
+            ConsistentRead=True,
+            Limit=1,
+        )
+        items = page.get("Items", [])
+        return (int(items[0]["seq"]["N"]) if items else 0) == version
+
+    async def load(self, session_id: str) -> SessionLog:
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def is_current(self, session_id: str, version: int) -> bool:
+        """Whether the newest `seq` is still `version`, from a key-only query for one item"""
+        return await asyncio.to_thread(self._is_current, session_id, version)
+
+    async def append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        return await asyncio.to_thread(self._append, session_id, base, messages)
+
+
+class MemoryBackend:
+    """Process-local stand-in for development and load tests; sessions are lost on restart"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._sessions: Dict[str, List[Dict]] = {}
+
+    async def load(self, session_id: str) -> SessionLog:
+        messages = self._sessions.get(session_id, [])
+        return SessionLog(messages=list(messages), version=len(messages))
+
+    async def append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        current = self._sessions.setdefault(session_id, [])
+        if len(current) != base.version:
+            raise ConcurrentWriteError(f"Session {session_id} changed since it was loaded")
+        current.extend(messages)
+        return SessionLog(messages=base.messages + messages, version=len(current))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    stale: int = 0
+    write_conflicts: int = 0
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale": self.stale,
+            "write_conflicts": self.write_conflicts,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class ConversationStore:
+    """
+    Async session store in front of an append-only storage backend.
+    Keeps a bounded LRU of recently used sessions with a TTL and writes through to the backend,
+    so warm workers skip the backend read for active sessions. Backends shared between processes
+    (`is_current`) revalidate a cached session's version with a cheap check before it is served, since
+    another Lambda container may have appended to it. Appends carry the version the
+    session was read at; when another worker or Lambda container wrote in between, the session
+    is reloaded and the turn is appended after the other writer's messages instead of replacing them.
+    """
+
+    def __init__(self, backend, max_sessions: int | None = None, ttl_seconds: float | None = None):
+        self.backend = backend
+        self.max_sessions = _cache_max_sessions() if max_sessions is None else max_sessions
+        self.ttl_seconds = _cache_ttl() if ttl_seconds is None else ttl_seconds
+        self.stats = CacheStats()
+        self._lock = Lock()
+        self._cache: OrderedDict[str, tuple[float, SessionLog]] = OrderedDict()
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name
+
+    @staticmethod
+    def _copy(session: SessionLog) -> SessionLog:
+        return SessionLog(
+            messages=list(session.messages),
+            version=session.version,
+            compacted_version=session.compacted_version,
+        )
+
+    def _cache_get(self, session_id: str) -> SessionLog | None:
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is None:
+                return None
+            cached_at, session = entry
+            if time.monotonic() - cached_at >= self.ttl_seconds:
+                del self._cache[session_id]
+                return None
+            self._cache.move_to_end(session_id)
+            return self._copy(session)
+
+    def _cache_put(self, session_id: str, session: SessionLog) -> None:
+        if self.max_sessions <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._cache[session_id] = (time.monotonic(), self._copy(session))
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_sessions:
+                self._cache.popitem(last=False)
+                self.stats.evictions += 1
+
+    async def _is_current(self, session_id: str, session: SessionLog) -> bool:
+        if not cache_revalidation_enabled() or not hasattr(self.backend, "is_current"):
+            return True
+        try:
+            return await self.backend.is_current(session_id, session.version)
+        except Exception as e:
+            logger.warning("Revalidating cached session %s failed, reloading it: %s", session_id, str(e))
+            return False
+
+    async def load(self, session_id: str) -> SessionLog:
+        """Load conversation history, from the cache when the session is hot and still current"""
+        session = self._cache_get(session_id)
+        if session is not None:
+            if await self._is_current(session_id, session):
+                self.stats.hits += 1
+                return session
+            self.stats.stale += 1
+
+        self.stats.misses += 1
+        session = await self.backend.load(session_id)
+        self._cache_put(session_id, session)
+        return self._copy(session)
+
+    async def append(self, session_id: str, base: SessionLog, messages: List[Dict]) -> SessionLog:
+        """Append one turn's messages to the session read as `base`, then refresh the cached copy"""
+        attempts = _append_attempts()
+        for attempt in range(1, attempts + 1):
+            try:
+                session = await self.backend.append(session_id, base, messages)
+                break
+            except ConcurrentWriteError:
+                self.stats.write_conflicts += 1
+                if attempt == attempts:
+                    raise
+                logger.warning("Concurrent write on session %s, reloading and appending again", session_id)
+                base = await self.backend.load(session_id)
+        self._cache_put(session_id, session)
+        return self._copy(session)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cached_sessions = len(self._cache)
+        return {"backend": self.backend_name, "cached_sessions": cached_sessions, **self.stats.snapshot()}
+
+
+def create_conversation_store() -> ConversationStore:
+    backend = memory_backend()
+    if backend == "s3":
+        return ConversationStore(S3Backend(S3_BUCKET))
+    if backend == "dynamodb":
+        if not DYNAMODB_TABLE:
+            raise RuntimeError("Missing required environment variable: DYNAMODB_TABLE")
+        return ConversationStore(DynamoDBBackend(DYNAMODB_TABLE))
+    if backend == "memory":
+        return ConversationStore(MemoryBackend())
+    return ConversationStore(LocalFileBackend(MEMORY_DIR))
+
+
+conversation_store = create_conversation_store()
@@ -0,0 +1,115 @@
+import os
+import re
+import time
+import logging
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from threading import Lock
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_MAX_ITEMS = 20
+DEFAULT_MAX_AGE_SECONDS = 900.0
+DEFAULT_SIMILARITY = 0.9
+
+SECTION_TITLES = {
+    "user_details": "Visitors who want to connect",
+    "unknown_question": "Questions I couldn't answer",
+}
+
+
+def digest_enabled() -> bool:
+    return os.getenv("EMAIL_DIGEST_ENABLED", "false").strip().lower() == "true"
+
+
+def _max_items() -> int:
+    return int(os.getenv("EMAIL_DIGEST_MAX_ITEMS", DEFAULT_MAX_ITEMS))
+
+
+def _max_age_seconds() -> float:
+    return float(os.getenv("EMAIL_DIGEST_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS))
+
+
+def _similarity_threshold() -> float:
+    return float(os.getenv("EMAIL_DIGEST_SIMILARITY", DEFAULT_SIMILARITY))
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s@.]", "", text.lower())).strip()
+
+
+@dataclass
+class DigestEntry:
+    kind: str
+    text: str
+    normalized: str
+    count: int = 1
+
+
+class NotificationDigest:
+    """
+    Buffers owner notifications and sends them as one digest email.
+    Near-identical unknown questions are merged into a single entry with a count.
+    """
+
+    def __init__(self, send: Callable[[str, str], object]):
+        self._send = send
+        self._lock = Lock()
+        self._entries: list[DigestEntry] = []
+        self._oldest_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, kind: str, text: str) -> None:
+        normalized = _normalize(text)
+        with self._lock:
+            if kind == "unknown_question":
+                for entry in self._entries:
+                    if entry.kind == kind and SequenceMatcher(None, entry.normalized, normalized).ratio() >= _similarity_threshold():
+                        entry.count += 1
+                        return
+            self._entries.append(DigestEntry(kind=kind, text=text, normalized=normalized))
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._entries:
+                return False
+            return len(self._entries) >= _max_items() or time.monotonic() - self._oldest_at >= _max_age_seconds()
+
+    @staticmethod
+    def _render(entries: list[DigestEntry]) -> str:
+        sections = []
+        for kind, title in SECTION_TITLES.items():
+            lines = [
+                f"- {entry.text}" + (f" (asked {entry.count} times)" if entry.count > 1 else "")
+                for entry in entries
+                if entry.kind == kind
+            ]
+            if lines:
+                sections.append(f"{title}:\n" + "\n".join(lines))
+        return "\n\n".join(sections)
+
+    def flush(self) -> int:
+        """Send all buffered notifications in one email, returning how many entries were sent"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            oldest_at, self._oldest_at = self._oldest_at, None
+        if not entries:
+            return 0
+
+        total = sum(entry.count for entry in entries)
+        try:
+            self._send(self._render(entries), f"AI Twin digest: {total} notifications")
+        except Exception:
+            # Keep the entries so the next flush retries them
+            with self._lock:
+                self._entries = entries + self._entries
+                self._oldest_at = oldest_at
+            raise
+        logger.info("Sent notification digest with %s entries (%s notifications)", len(entries), total)
+        return len(entries)
@@ -1,28 +1,24 @@
 import os
-import base64
 import logging
-import requests
-from dotenv import load_dotenv
-from mailjet_rest import Client
 
-from .constants import RESUME_URL
+from .attachments import resume_attachment
+from .clients import client_registry
+from .digest import NotificationDigest, digest_enabled
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-load_dotenv(override=True)
-
 
 class MailJetEmail:
 
-    def send_email(self, message: str):
+    def __init__(self):
+        self.digest = NotificationDigest(self.send_email)
+
+    def send_email(self, message: str, subject: str = "Notification from AI Twin"):
         """ Send out an email with the given body to all sales prospects """
 
-        api_key = os.getenv("MAILJET_API_KEY")
-        api_secret = os.getenv("MAILJET_API_SECRET")
         from_email = os.getenv("MAILJET_FROM_EMAIL")
         to_email = os.getenv("MAILJET_TO_EMAIL")
-        mailjet = Client(auth=(api_key, api_secret), version='v3.1')
 
         data = {
             'Messages': [
@@ -37,42 +33,54 @@ class MailJetEmail:
                             "Name": "Ai Twin Owner"
                         }
                     ],
-                    "Subject": "Notification from AI Twin",
+                    "Subject": subject,
                     "TextPart": message,
                 }
             ]
         }
-        result = mailjet.send.create(data=data)
+        result = client_registry.mailjet_send(data)
         return {
             "status": "success",
             "response": result.json()
         }
 
+    def _add_to_digest(self, kind: str, text: str) -> None:
+        self.digest.add(kind, text)
+        if self.digest.due():
+            self.flush_digest()
+
+    def flush_digest(self) -> None:
+        try:
+            self.digest.flush()
+        except Exception as e:
+            # Entries stay buffered and are retried on the next flush
+            logger.error("Failed to send notification digest: %s", str(e))
+
+    def flush_digest_if_due(self) -> None:
+        if self.digest.due():
+            self.flush_digest()
+
     def record_user_details(self, email: str, name: str = "not provided", notes: str = "not provided") -> dict:
+        if digest_enabled():
+            self._add_to_digest("user_details", f"Name: {name}, Email: {email}, Notes: {notes}")
+            return {"recorded": "ok"}
         self.send_email(f"Recording interest from\nName: {name},\nEmail: {email},\nNotes: {notes}")
         return {"recorded": "ok"}
 
     def record_unknown_question(self, question: str) -> dict:
+        if digest_enabled():
+            self._add_to_digest("unknown_question", question)
+            return {"recorded": "ok"}
         self.send_email("Recording question that was asked but I couldn't answer.\n"
                 f"Question: {question}")
         return {"recorded": "ok"}
 
     def send_resume_to_user(self, to_email: str) -> dict:
-        """Download resume PDF, convert to base64, and send via Mailjet with attachment"""
+        """Send the cached base64 resume PDF via Mailjet as an attachment"""
         try:
-            # Download the resume PDF
-            response = requests.get(RESUME_URL, timeout=30)
-            response.raise_for_status()
-            pdf_content = response.content
-            
-            # Convert to base64
-            pdf_base64 = base64.b64encode(pdf_content).decode('utf-8')
-            
-            # Get Mailjet credentials
-            api_key = os.getenv("MAILJET_API_KEY")
-            api_secret = os.getenv("MAILJET_API_SECRET")
+            pdf_base64 = resume_attachment.get_base64()
+
             from_email = os.getenv("MAILJET_FROM_EMAIL")
-            mailjet = Client(auth=(api_key, api_secret), version='v3.1')
             
             # Prepare email with attachment
             data = {
@@ -102,7 +110,7 @@ class MailJetEmail:
                 ]
             }
             
-            result = mailjet.send.create(data=data)
+            result = client_registry.mailjet_send(data)
             response_json = result.json()
             
             logger.info("Resume sent successfully to %s", to_email)
@@ -112,9 +120,6 @@ class MailJetEmail:
                 "response": response_json
             }
             
-        except requests.RequestException as e:
-            logger.error("Failed to download resume: %s", str(e))
-            raise Exception(f"Failed to download resume: {str(e)}")
         except Exception as e:
             logger.error("Failed to send resume to %s: %s", to_email, str(e))
             raise
@@ -0,0 +1,11 @@
+from functools import cache
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+
+@cache
+def load_environment() -> None:
+    """Load .env files once per process: the nearest .env first, then the project root .env"""
+    load_dotenv(override=True)
+    load_dotenv(Path(__file__).resolve().parents[2] / ".env", override=True)
@@ -1,17 +1,26 @@
 import os
 import logging
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from openai import OpenAI
+from pydantic import BaseModel, field_validator
+from pydantic.json_schema import SkipJsonSchema
 
+from .clients import client_registry
 from .context import EvaluationPrompt
-from . import constants
+from .prescreen import evaluation_mode, reply_prescreen
+from .retrieval import reference_material, relevant_context
+from .metrics import metrics, record_evaluation, span
 from .model_client import (
+    DEFAULT_OPENROUTER_MODEL,
+    RouteBackend,
     active_chat_model_name,
     active_evaluation_model_name,
+    apply_prompt_cache_markers,
+    cacheable_system_message,
+    model_router,
     opencode_go_completion,
     parse_json_model_response,
+    provider_completion,
+    record_prompt_cache_usage,
     use_evaluation_openrouter,
     use_openrouter,
 )
@@ -19,13 +28,17 @@ from .model_client import (
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-load_dotenv(override=True)
-
 groq_api_key = os.getenv('GROQ_API_KEY')
-openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
 model_name = active_chat_model_name()
 evaluator_model_name = active_evaluation_model_name()
 
+DEFAULT_CASCADE_ACCEPT_CONFIDENCE = 0.8
+JSON_VERDICT_INSTRUCTION = (
+    "Return only JSON with this shape: "
+    '{"is_acceptable": boolean, "feedback": string, "confidence": number}, '
+    "where confidence is how sure you are of the verdict, from 0 to 1."
+)
+
 
 def _parse_comma_separated_env(var_name: str) -> Optional[List[str]]:
     value = os.getenv(var_name)
@@ -44,20 +57,66 @@ def _parse_bool_env(var_name: str) -> Optional[bool]:
 
     return value.strip().lower() == "true"
 
+
+def evaluation_cascade_enabled() -> bool:
+    """`EVALUATION_CASCADE_ENABLED=true` asks a small model first and only escalates uncertain or rejected verdicts"""
+    return _parse_bool_env("EVALUATION_CASCADE_ENABLED")
+
+
+def cascade_small_backend() -> RouteBackend:
+    """`EVALUATION_SMALL_MODEL` as `provider:model`; defaults to the OpenRouter default model"""
+    return RouteBackend.parse(os.getenv("EVALUATION_SMALL_MODEL", f"openrouter:{DEFAULT_OPENROUTER_MODEL}"))
+
+
+def _cascade_accept_confidence() -> float:
+    return float(os.getenv("EVALUATION_CASCADE_ACCEPT_CONFIDENCE", DEFAULT_CASCADE_ACCEPT_CONFIDENCE))
+
+
+def _cascade_reject_confidence() -> Optional[float]:
+    value = os.getenv("EVALUATION_CASCADE_REJECT_CONFIDENCE")
+    return float(value) if value else None
+
+
+PRESCREEN_TIER = "prescreen"
+SMALL_TIER = "small"
+EVALUATOR_TIER = "evaluator"
+
+
 class Evaluation(BaseModel):
     is_acceptable: bool
     feedback: str
+    # Evaluators that do not report a confidence are taken as certain
+    confidence: float = 1.0
+    # Which tier produced the verdict: PRESCREEN_TIER, SMALL_TIER or EVALUATOR_TIER (also the `tier` label of
+    # `evaluator_tier_total`); set here, never asked of the model
+    tier: SkipJsonSchema[str] = EVALUATOR_TIER
+
+    @field_validator("confidence")
+    @classmethod
+    def _clamp_confidence(cls, value: float) -> float:
+        # Kept out of the JSON schema, so structured-output providers see a plain number
+        return min(max(value, 0.0), 1.0)
+
+    @property
+    def approved_by_model(self) -> bool:
+        """Accepted by an LLM evaluator rather than only the local pre-screen"""
+        return self.is_acceptable and self.tier != PRESCREEN_TIER
+
 
 class ChatEvaluation:
     def __init__(self):
-        self.evaluator_system_prompt = EvaluationPrompt().fetch_evaluator_system_prompt()
         self.client = (
-            OpenAI(api_key=openrouter_api_key, base_url=constants.OPENROUTER_BASE_URL)
+            client_registry.openrouter_client()
             if use_openrouter() or use_evaluation_openrouter()
             else None
         )
         self.provider_preferences = self._build_provider_preferences()
 
+    @property
+    def evaluator_system_prompt(self) -> str:
+        # Follows persona resource reloads; the string is only rebuilt when the resources change
+        return EvaluationPrompt.fetch_evaluator_system_prompt()
+
     @staticmethod
     def _build_provider_preferences() -> Dict:
         provider_config: Dict = {}
@@ -69,47 +128,118 @@ class ChatEvaluation:
 
         return provider_config
 
-    def evaluate(self, reply, message, history) -> Evaluation:
+    async def evaluate(self, reply, message, history, tool_calls=None) -> Evaluation:
         """
         Evaluate the response from the agent
         :param reply: Response from agent
         :param message: Message from user
         :param history: Conversation history
+        :param tool_calls: Names of the tools the agent called while producing the reply
         :return: Evaluation result
         """
 
-        messages = [{"role": "system", "content": self.evaluator_system_prompt}] + [{"role": "user", "content": EvaluationPrompt.evaluator_user_prompt(reply, message, history)}]
+        if evaluation_mode() == "tiered":
+            prescreen_result = reply_prescreen.screen(reply, message, tool_calls)
+            if prescreen_result.approved:
+                record_evaluation("prescreen_approved")
+                return Evaluation(is_acceptable=True, feedback="Approved by local pre-screen", tier=PRESCREEN_TIER)
+
+        if evaluation_cascade_enabled():
+            evaluation = await self._cascade(reply, message, history)
+        else:
+            with span("evaluate"):
+                evaluation = await self._evaluator_call(reply, message, history)
+        record_evaluation("accepted" if evaluation.is_acceptable else "rejected")
+        return evaluation
+
+    @staticmethod
+    def _user_message(reply, message, history) -> Dict:
+        # With retrieval enabled the persona documents relevant to this exchange travel in the user prompt
+        excerpts = relevant_context(f"{message}\n{reply}")
+        return {"role": "user", "content": EvaluationPrompt.evaluator_user_prompt(reply, message, history, excerpts)}
+
+    def _json_messages(self, user_message) -> List[Dict]:
+        # The evaluator system prompt is identical on every call, so it is marked as a cache breakpoint
+        return [
+            cacheable_system_message(self.evaluator_system_prompt),
+            user_message,
+            {"role": "user", "content": JSON_VERDICT_INSTRUCTION},
+        ]
+
+    @staticmethod
+    def _log_tier(tier: str, model: str, evaluation: Optional[Evaluation], decision: str) -> None:
+        verdict = "error" if evaluation is None else ("accepted" if evaluation.is_acceptable else "rejected")
+        metrics.increment("evaluator_tier_total", tier=tier, verdict=verdict, decision=decision)
+        logger.info(
+            "Evaluator tier=%s model=%s verdict=%s confidence=%s decision=%s",
+            tier, model, verdict, "-" if evaluation is None else f"{evaluation.confidence:.2f}", decision,
+        )
+
+    @staticmethod
+    def _small_verdict_final(evaluation: Evaluation) -> bool:
+        if evaluation.is_acceptable:
+            return evaluation.confidence >= _cascade_accept_confidence()
+        reject_confidence = _cascade_reject_confidence()
+        return reject_confidence is not None and evaluation.confidence >= reject_confidence
+
+    async def _cascade(self, reply, message, history) -> Evaluation:
+        """
+        Small model first; its verdict stands if it accepts with at least EVALUATION_CASCADE_ACCEPT_CONFIDENCE
+        (or rejects with at least EVALUATION_CASCADE_REJECT_CONFIDENCE, when set), otherwise the regular evaluator decides
+        """
+        small = cascade_small_backend()
+        user_message = self._user_message(reply, message, history)
+        try:
+            with span("evaluate_small"):
+                response = await provider_completion(small.provider, self._json_messages(user_message), small.model)
+            record_prompt_cache_usage("evaluation_small", small.model, getattr(response, "usage", None))
+            verdict = parse_json_model_response(response.choices[0].message.content or "", Evaluation)
+            verdict.tier = SMALL_TIER
+        except Exception as e:
+            logger.warning("Small evaluator call failed, escalating: %s", str(e))
+            self._log_tier(SMALL_TIER, small.name, None, "escalate")
+        else:
+            if self._small_verdict_final(verdict):
+                self._log_tier(SMALL_TIER, small.name, verdict, "final")
+                return verdict
+            self._log_tier(SMALL_TIER, small.name, verdict, "escalate")
+
+        with span("evaluate"):
+            evaluation = await self._evaluator_call(reply, message, history, user_message)
+        self._log_tier(evaluation.tier, evaluator_model_name, evaluation, "final")
+        return evaluation
+
+    async def _evaluator_call(self, reply, message, history, user_message=None) -> Evaluation:
+        user_message = user_message or self._user_message(reply, message, history)
         try:
-            if use_evaluation_openrouter():
+            if use_evaluation_openrouter() and not model_router.active():
                 request_kwargs = {
                     "model": evaluator_model_name,
-                    "input": messages,
+                    "input": [{"role": "system", "content": self.evaluator_system_prompt}, user_message],
                     "text_format": Evaluation,
                 }
 
                 # Extra body for provider preferences
                 if self.provider_preferences:
                     request_kwargs["extra_body"] = {"provider": self.provider_preferences}
-                response = self.client.responses.parse(**request_kwargs)
+                response = await self.client.responses.parse(**request_kwargs)
+                record_prompt_cache_usage("evaluation", evaluator_model_name, response.usage)
                 return response.output_parsed
 
-            messages.append(
-                {
-                    "role": "user",
-                    "content": (
-                        "Return only JSON with this shape: "
-                        '{"is_acceptable": boolean, "feedback": string}.'
-                    ),
-                }
-            )
-            response = opencode_go_completion(messages, evaluator_model_name)
+            messages = self._json_messages(user_message)
+            if model_router.active():
+                response, backend = await model_router.completion("evaluation", messages)
+                record_prompt_cache_usage("evaluation", backend.model, getattr(response, "usage", None))
+            else:
+                response = await opencode_go_completion(messages, evaluator_model_name)
+                record_prompt_cache_usage("evaluation", evaluator_model_name, getattr(response, "usage", None))
             content = response.choices[0].message.content or ""
             return parse_json_model_response(content, Evaluation)
         except Exception as e:
             logger.error("Evaluation API call failed: %s", str(e))
             raise
 
-    def rerun(self, system_prompt, reply, message, history, feedback):
+    async def rerun(self, system_prompt, reply, message, history, feedback):
         """
         Rerun the chat agent with the updated system prompt
         :param system_prompt: Original system chat prompt
@@ -120,16 +250,29 @@ class ChatEvaluation:
         :return: Updated response from agent
         """
 
-        updated_system_prompt = system_prompt + "\n\n## Previous answer rejected\nYou just tried to reply, but the quality control rejected your reply\n"
-        updated_system_prompt += f"## Your attempted answer:\n{reply}\n\n"
-        updated_system_prompt += f"## Reason for rejection:\n{feedback}\n\n"
-        messages = [{"role": "system", "content": updated_system_prompt}] + history + [{"role": "user", "content": message}]
-        try:
-            if use_openrouter():
-                response = self.client.chat.completions.create(model=model_name, messages=messages)
-            else:
-                response = opencode_go_completion(messages, model_name)
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error("Rerun API call failed: %s", str(e))
-            raise
+        # The persona prompt stays a cacheable prefix; the rejection details follow the cache breakpoint
+        rejection_prompt = "\n\n## Previous answer rejected\nYou just tried to reply, but the quality control rejected your reply\n"
+        rejection_prompt += f"## Your attempted answer:\n{reply}\n\n"
+        rejection_prompt += f"## Reason for rejection:\n{feedback}\n\n"
+        messages = [cacheable_system_message(system_prompt, suffix=rejection_prompt)] + history + [{"role": "user", "content": message}]
+        # Excerpts go where the persona prompt says they are, right after the user's message, as for the agent
+        reference = reference_material(history, message)
+        if reference is not None:
+            messages.append(reference)
+        with span("rerun"):
+            try:
+                rerun_model = model_name
+                if model_router.active():
+                    response, backend = await model_router.completion("agent", messages)
+                    rerun_model = backend.model
+                elif use_openrouter():
+                    response = await self.client.chat.completions.create(
+                        model=model_name, messages=apply_prompt_cache_markers(messages, "openrouter")
+                    )
+                else:
+                    response = await opencode_go_completion(messages, model_name)
+                record_prompt_cache_usage("rerun", rerun_model, getattr(response, "usage", None))
+                return response.choices[0].message.content
+            except Exception as e:
+                logger.error("Rerun API call failed: %s", str(e))
+                raise
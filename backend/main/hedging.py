@@ -0,0 +1,352 @@
+import os
+import re
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Awaitable, Callable, Optional
+
+from agents import RunHooks
+
+from .context import ChatPrompt
+from .context_window import estimate_tokens
+from .evaluation import ChatEvaluation, Evaluation
+from .metrics import span
+from .model_client import (
+    cacheable_system_message,
+    chat_provider,
+    provider_completion,
+    provider_configured,
+    provider_model_name,
+    record_prompt_cache_usage,
+)
+from .prescreen import EMAIL_PATTERN
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_HEDGE_DELAY_SECONDS = 6.0
+DEFAULT_LATENCY_SLO_SECONDS = 15.0
+DEFAULT_MAX_EXTRA_TOKENS = 12000
+DEFAULT_MAX_HEDGE_RATIO = 0.25
+# Turns remembered for the hedge ratio cap
+HEDGE_WINDOW_TURNS = 200
+
+# When no candidate is approved, the one returned is the first of these that produced a reply;
+# a primary reply the evaluator rejected is never returned, and past the SLO neither is any other
+# rejected reply while a candidate is still running
+FALLBACK_ORDER = ("rerun", "hedge", "primary")
+
+# Messages likely to make the agent call a tool are never hedged, since the hedge has no tools.
+# An agent run that calls a tool anyway is never cancelled (see `_Race.cancel`)
+TOOL_INTENT_PATTERN = re.compile(r"\b(resume|cv|contact|reach (you|out)|get in touch|email)\b", re.IGNORECASE)
+
+HEDGE_NOTE = (
+    "\n\n## Tools unavailable\nTools cannot be called for this reply. Do not say that a resume was sent, "
+    "contact details were recorded or a question was logged."
+)
+
+
+def hedging_enabled() -> bool:
+    """`true` races a second candidate from another provider on slow or rejected turns"""
+    return os.getenv("HEDGING_ENABLED", "false").strip().lower() == "true"
+
+
+def _hedge_delay() -> float:
+    return float(os.getenv("HEDGE_DELAY_SECONDS", DEFAULT_HEDGE_DELAY_SECONDS))
+
+
+def _latency_slo() -> float:
+    return float(os.getenv("HEDGE_LATENCY_SLO_SECONDS", DEFAULT_LATENCY_SLO_SECONDS))
+
+
+def _max_extra_tokens() -> int:
+    return int(os.getenv("HEDGE_MAX_EXTRA_TOKENS", DEFAULT_MAX_EXTRA_TOKENS))
+
+
+def _max_hedge_ratio() -> float:
+    return float(os.getenv("HEDGE_MAX_RATIO", DEFAULT_MAX_HEDGE_RATIO))
+
+
+def hedge_provider() -> Optional[str]:
+    """`HEDGE_PROVIDER` picks `openrouter` or `opencode_go`; by default the configured provider the agent is not using"""
+    provider = os.getenv("HEDGE_PROVIDER", "alternate").strip().lower()
+    if provider not in {"alternate", "openrouter", "opencode_go"}:
+        raise ValueError("HEDGE_PROVIDER must be alternate, openrouter or opencode_go")
+    if provider == "alternate":
+        primary = chat_provider()
+        alternate = "opencode_go" if primary == "openrouter" else "openrouter"
+        provider = alternate if provider_configured(alternate) else primary
+    return provider if provider_configured(provider) else None
+
+
+@dataclass
+class Candidate:
+    path: str
+    reply: str
+    tool_calls: list = field(default_factory=list)
+    evaluation: Optional[Evaluation] = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.evaluation is not None and self.evaluation.is_acceptable
+
+
+@dataclass
+class HedgeStats:
+    turns: int = 0
+    hedged: int = 0
+    hedge_reasons: Counter = field(default_factory=Counter)
+    wins: Counter = field(default_factory=Counter)
+    slo_exceeded: int = 0
+    skipped_over_budget: int = 0
+    skipped_over_ratio: int = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": hedging_enabled(),
+            "turns": self.turns,
+            "hedged": self.hedged,
+            "hedge_reasons": dict(self.hedge_reasons),
+            "wins": dict(self.wins),
+            "slo_exceeded": self.slo_exceeded,
+            "skipped_over_budget": self.skipped_over_budget,
+            "skipped_over_ratio": self.skipped_over_ratio,
+        }
+
+
+# Agent runs left to finish after their race ended, referenced so they are not garbage collected
+_detached: set[asyncio.Task] = set()
+
+
+class _ToolStartHooks(RunHooks):
+    """Marks the race once the agent starts a tool call"""
+
+    def __init__(self, race: "_Race"):
+        self.race = race
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self.race.tool_started = True
+
+
+class _Race:
+    """One turn's candidate tasks, keyed by path"""
+
+    def __init__(self):
+        self.tasks: dict[asyncio.Task, str] = {}
+        self.replies: dict[str, Candidate] = {}
+        self.reply_arrived = asyncio.Event()
+        self.hedged = False
+        self.tool_started = False
+        self.finished = False
+
+    def start(self, path: str, coro: Awaitable[Candidate]) -> None:
+        self.tasks[asyncio.ensure_future(coro)] = path
+
+    def fallback(self, include_rejected: bool = True) -> Optional[Candidate]:
+        for path in FALLBACK_ORDER:
+            candidate = self.replies.get(path)
+            if candidate is None or (path == "primary" and candidate.evaluation is not None):
+                continue
+            if candidate.evaluation is not None and not include_rejected:
+                continue
+            return candidate
+        return None
+
+    def cancel(self) -> None:
+        self.finished = True
+        for task, path in self.tasks.items():
+            if path == "primary" and self.tool_started:
+                # Cancelling could interrupt a tool mid-call (e.g. a resume email half queued), so the
+                # agent run finishes on its own; its reply is discarded
+                _detached.add(task)
+                task.add_done_callback(_detached.discard)
+                continue
+            task.cancel()
+        self.tasks.clear()
+
+
+class HedgedResponder:
+    """
+    Hedged generation for one chat turn. The agent runs as usual; when it is slower than
+    HEDGE_DELAY_SECONDS, fails, or its reply is rejected, a second candidate is generated on the
+    hedge provider while the rejected reply is rerun, and the candidates are evaluated concurrently.
+    The first approved candidate wins. After HEDGE_LATENCY_SLO_SECONDS a reply still being evaluated
+    is returned instead of waiting for its evaluation; rejected replies are only returned once no
+    candidate is left. Either way the result is not `accepted`, so `/chat` neither caches it nor saves it
+    as an approved turn. Hedges are capped by estimated extra tokens per turn and by the share of recent
+    turns allowed to hedge. An agent run that has started a tool call is never cancelled when another
+    candidate wins.
+    Only `/chat` races the agent itself; `/chat/stream` has already sent the agent's tokens, so it only
+    uses `correct` for a rejected reply.
+    """
+
+    def __init__(self, evaluator: ChatEvaluation):
+        self.evaluator = evaluator
+        self.stats = HedgeStats()
+        self._lock = Lock()
+        self._recent: deque[bool] = deque(maxlen=HEDGE_WINDOW_TURNS)
+
+    def _hedge_allowed(self, message: str, agent_input: list) -> bool:
+        if hedge_provider() is None or EMAIL_PATTERN.search(message) or TOOL_INTENT_PATTERN.search(message):
+            return False
+        # The hedge sends the prompt twice (generation and evaluation)
+        prompt_tokens = estimate_tokens(ChatPrompt.prompt()) + sum(estimate_tokens(item["content"]) for item in agent_input)
+        with self._lock:
+            if 2 * prompt_tokens > _max_extra_tokens():
+                self.stats.skipped_over_budget += 1
+                return False
+            if self._recent and sum(self._recent) >= _max_hedge_ratio() * len(self._recent):
+                self.stats.skipped_over_ratio += 1
+                return False
+        return True
+
+    async def _evaluated(self, path: str, reply: str, tool_calls: list, message: str, conversation: list, race: _Race) -> Candidate:
+        race.replies[path] = Candidate(path, reply, tool_calls)
+        race.reply_arrived.set()
+        evaluation = await self.evaluator.evaluate(reply, message, conversation, tool_calls)
+        race.replies[path] = Candidate(path, reply, tool_calls, evaluation)
+        return race.replies[path]
+
+    async def _primary(self, run_primary, message, conversation, race) -> Candidate:
+        reply, tool_calls = await run_primary(_ToolStartHooks(race))
+        if race.finished:
+            # Another candidate won while this run finished its tool call
+            return Candidate("primary", reply, tool_calls)
+        return await self._evaluated("primary", reply, tool_calls, message, conversation, race)
+
+    async def _rerun(self, rejected: Candidate, message, conversation, race) -> Candidate:
+        reply = await self.evaluator.rerun(
+            ChatPrompt.prompt(), rejected.reply, message, conversation, rejected.evaluation.feedback
+        )
+        return await self._evaluated("rerun", reply, rejected.tool_calls, message, conversation, race)
+
+    async def _hedge(self, provider: str, message, conversation, agent_input, race) -> Candidate:
+        model = provider_model_name(provider)
+        messages = [cacheable_system_message(ChatPrompt.prompt(), suffix=HEDGE_NOTE)] + agent_input
+        with span("hedge"):
+            response = await provider_completion(provider, messages, model)
+        record_prompt_cache_usage("hedge", model, getattr(response, "usage", None))
+        reply = (response.choices[0].message.content or "").strip()
+        return await self._evaluated("hedge", reply, [], message, conversation, race)
+
+    def _start_hedge(self, reason: str, allowed: bool, message, conversation, agent_input, race) -> None:
+        if race.hedged or not allowed:
+            return
+        race.hedged = True
+        provider = hedge_provider()
+        race.start("hedge", self._hedge(provider, message, conversation, agent_input, race))
+        with self._lock:
+            self.stats.hedged += 1
+            self.stats.hedge_reasons[reason] += 1
+        logger.info("Hedging turn on %s (%s)", provider, reason)
+
+    async def _run(self, race: _Race, message, conversation, agent_input, session_id, allowed: bool, hedge_at: Optional[float]) -> Candidate:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + _latency_slo()
+        error: Optional[Exception] = None
+        try:
+            while race.tasks:
+                now = loop.time()
+                if now >= deadline and race.fallback(include_rejected=False) is not None:
+                    # Past the SLO, waiting on further evaluations only adds latency
+                    with self._lock:
+                        self.stats.slo_exceeded += 1
+                    return self._finish(race.fallback(include_rejected=False), session_id, started, "slo_exceeded")
+                if hedge_at is not None and now >= hedge_at and not race.tool_started:
+                    # An agent that is running a tool is slow for a reason the tool-less hedge cannot cover
+                    self._start_hedge("slow", allowed, message, conversation, agent_input, race)
+
+                wake_at = deadline if now < deadline else None
+                if hedge_at is not None and now < hedge_at and allowed:
+                    wake_at = min(wake_at, hedge_at) if wake_at is not None else hedge_at
+                waiting = set(race.tasks)
+                reply_arrived = None
+                if now >= deadline:
+                    # Past the SLO the next reply is returned without waiting for its evaluation
+                    race.reply_arrived.clear()
+                    reply_arrived = asyncio.ensure_future(race.reply_arrived.wait())
+                    waiting.add(reply_arrived)
+                done, _ = await asyncio.wait(
+                    waiting, timeout=max(wake_at - now, 0) if wake_at is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if reply_arrived is not None:
+                    reply_arrived.cancel()
+                    done.discard(reply_arrived)
+
+                for task in done:
+                    path = race.tasks.pop(task)
+                    try:
+                        candidate = task.result()
+                    except Exception as e:
+                        logger.error("Hedged %s candidate failed for session_id=%s: %s", path, session_id, str(e))
+                        error = error or e
+                        if path == "primary":
+                            self._start_hedge("primary_failed", allowed, message, conversation, agent_input, race)
+                        continue
+                    if candidate.accepted:
+                        return self._finish(candidate, session_id, started, "accepted")
+                    logger.info("Hedged %s candidate rejected for session_id=%s: %s", path, session_id, candidate.evaluation.feedback)
+                    if path == "primary":
+                        race.start("rerun", self._rerun(candidate, message, conversation, race))
+                        self._start_hedge("rejected", allowed, message, conversation, agent_input, race)
+        finally:
+            race.cancel()
+
+        fallback = race.fallback()
+        if fallback is None:
+            raise error or RuntimeError("No candidate reply was produced")
+        return self._finish(fallback, session_id, started, "fallback")
+
+    def _finish(self, candidate: Candidate, session_id: str, started: float, outcome: str) -> Candidate:
+        elapsed = asyncio.get_running_loop().time() - started
+        with self._lock:
+            self.stats.wins[candidate.path] += 1
+        logger.info(
+            "Hedged turn for session_id=%s won by %s (%s) after %.2fs",
+            session_id, candidate.path, outcome, elapsed,
+        )
+        return candidate
+
+    def _record_turn(self, race: _Race) -> None:
+        with self._lock:
+            self.stats.turns += 1
+            self._recent.append(race.hedged)
+
+    async def respond(
+        self,
+        message: str,
+        conversation: list,
+        agent_input: list,
+        run_primary: Callable[[RunHooks], Awaitable[tuple[str, list]]],
+        session_id: str,
+    ) -> Candidate:
+        """
+        Run the agent via `run_primary` (given run hooks to pass to the Runner, returning reply and tool call names)
+        and hedge it as needed
+        """
+        race = _Race()
+        allowed = self._hedge_allowed(message, agent_input)
+        race.start("primary", self._primary(run_primary, message, conversation, race))
+        hedge_at = asyncio.get_running_loop().time() + _hedge_delay()
+        try:
+            return await self._run(race, message, conversation, agent_input, session_id, allowed, hedge_at)
+        finally:
+            self._record_turn(race)
+
+    async def correct(
+        self, rejected: Candidate, message: str, conversation: list, agent_input: list, session_id: str,
+    ) -> Candidate:
+        """Race a rerun against a hedge for a reply already delivered (streamed) and rejected"""
+        race = _Race()
+        race.replies["primary"] = rejected
+        allowed = self._hedge_allowed(message, agent_input)
+        race.start("rerun", self._rerun(rejected, message, conversation, race))
+        self._start_hedge("rejected", allowed, message, conversation, agent_input, race)
+        try:
+            return await self._run(race, message, conversation, agent_input, session_id, allowed, None)
+        finally:
+            self._record_turn(race)
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+METRIC_PREFIX = "twin_"
+DEFAULT_NAMESPACE = "DigitalTwin"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# USD per million tokens; MODEL_PRICES_JSON adds or overrides entries. Models without a price report no cost.
+MODEL_PRICES = {
+    "google/gemini-2.5-flash-lite": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+}
+
+HELP = {
+    "stage_duration_seconds": "Time spent in each /chat pipeline stage",
+    "request_duration_seconds": "End-to-end chat request latency",
+    "requests_total": "Chat requests by route and outcome",
+    "llm_calls_total": "Upstream model calls by call site and model",
+    "llm_tokens_total": "Upstream model tokens by call site, model and kind",
+    "llm_cost_usd_total": "Estimated upstream model cost in USD",
+    "evaluations_total": "Evaluator results (accepted, rejected, prescreen_approved)",
+    "evaluator_tier_total": "Evaluator cascade verdicts by tier (small or evaluator), verdict and decision (final or escalate)",
+    "tool_calls_total": "Agent tool calls by tool and outcome",
+    "provider_fallbacks_total": "OpenCode Go calls retried with the other API style",
+    "provider_errors_total": "Failed upstream calls by provider, API style and error kind",
+    "router_failovers_total": "Routed model calls that failed over to the next backend, by role and failed backend",
+}
+
+
+def _on_lambda() -> bool:
+    return bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
+
+def emf_enabled() -> bool:
+    """`METRICS_EMF_ENABLED` prints one CloudWatch Embedded Metric Format line per request (defaults to on in Lambda)"""
+    return os.getenv("METRICS_EMF_ENABLED", "true" if _on_lambda() else "false").strip().lower() == "true"
+
+
+def metrics_endpoint_enabled() -> bool:
+    """`METRICS_ENDPOINT_ENABLED` serves GET /metrics (defaults to off in Lambda, where the API is public)"""
+    return os.getenv("METRICS_ENDPOINT_ENABLED", "false" if _on_lambda() else "true").strip().lower() == "true"
+
+
+def _namespace() -> str:
+    return os.getenv("METRICS_NAMESPACE", DEFAULT_NAMESPACE)
+
+
+def _model_prices() -> dict:
+    prices = dict(MODEL_PRICES)
+    override = os.getenv("MODEL_PRICES_JSON")
+    if override:
+        try:
+            prices.update(json.loads(override))
+        except ValueError as e:
+            logger.warning("Ignoring invalid MODEL_PRICES_JSON: %s", str(e))
+    return prices
+
+
+def estimate_cost(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> Optional[float]:
+    price = _model_prices().get(model)
+    if not price:
+        return None
+    uncached = max(input_tokens - cached_tokens, 0)
+    cached_price = price.get("cached_input", price["input"])
+    return (uncached * price["input"] + cached_tokens * cached_price + output_tokens * price.get("output", 0)) / 1_000_000
+
+
+@dataclass
+class _Histogram:
+    counts: list = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """In-process counters and latency histograms; one lock acquisition per update keeps the hot path cheap"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, _Histogram]] = {}
+
+    def increment(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._histograms.setdefault(name, {}).setdefault(key, _Histogram()).observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Counters and histograms as plain data, e.g. for benchmark reports"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {"labels": dict(key), "count": h.count, "sum": h.total}
+                        for key, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                lines.extend(f"{metric}{_format_labels(key)} {value:g}" for key, value in sorted(series.items()))
+            for name, series in sorted(self._histograms.items()):
+                metric = METRIC_PREFIX + name
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        bucket_label = f'le="{le}"'
+                        lines.append(f"{metric}_bucket{_format_labels(key, bucket_label)} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {histogram.total:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+@dataclass
+class RequestTrace:
+    """Stage timings and model usage of one chat request, emitted as a single EMF line when it ends"""
+    route: str
+    started: float = field(default_factory=time.perf_counter)
+    stages: dict = field(default_factory=dict)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    llm_calls: int = 0
+    rejections: int = 0
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+# Called with (trace, elapsed seconds, outcome) when a request trace ends, e.g. by the load-test harness
+trace_listeners: list[Callable[[RequestTrace, float, str], None]] = []
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage into the stage histogram and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("stage_duration_seconds", elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def request_trace(route: str):
+    """Trace one chat request; stages and model calls made inside (including child tasks) are attributed to it"""
+    trace = RequestTrace(route)
+    token = _current_trace.set(trace)
+    outcome = "error"
+    try:
+        yield trace
+        outcome = "ok"
+    finally:
+        _current_trace.reset(token)
+        elapsed = time.perf_counter() - trace.started
+        metrics.observe("request_duration_seconds", elapsed, route=route)
+        metrics.increment("requests_total", route=route, outcome=outcome)
+        if emf_enabled():
+            _emit_emf(trace, elapsed, outcome)
+        for listener in trace_listeners:
+            listener(trace, elapsed, outcome)
+
+
+def record_llm_usage(label: str, model: str, input_tokens: int, cached_tokens: int, cache_write_tokens: int, output_tokens: int) -> None:
+    metrics.increment("llm_calls_total", label=label, model=model)
+    for kind, value in (("input", input_tokens), ("cached", cached_tokens), ("cache_write", cache_write_tokens), ("output", output_tokens)):
+        if value:
+            metrics.increment("llm_tokens_total", value, label=label, model=model, kind=kind)
+    cost = estimate_cost(model, input_tokens, cached_tokens, output_tokens)
+    if cost:
+        metrics.increment("llm_cost_usd_total", cost, label=label, model=model)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.llm_calls += 1
+        trace.input_tokens += input_tokens
+        trace.output_tokens += output_tokens
+        trace.cost_usd += cost or 0.0
+
+
+def record_evaluation(result: str) -> None:
+    metrics.increment("evaluations_total", result=result)
+    trace = _current_trace.get()
+    if trace is not None and result == "rejected":
+        trace.rejections += 1
+
+
+def _emit_emf(trace: RequestTrace, elapsed: float, outcome: str) -> None:
+    values = {"RequestLatency": elapsed * 1000}
+    values.update({f"{stage}_latency": seconds * 1000 for stage, seconds in trace.stages.items()})
+    units = {name: "Milliseconds" for name in values}
+    counts = {
+        "InputTokens": trace.input_tokens,
+        "OutputTokens": trace.output_tokens,
+        "LLMCalls": trace.llm_calls,
+        "EvaluatorRejections": trace.rejections,
+    }
+    units.update({name: "Count" for name in counts})
+    values.update(counts)
+    values["CostUSD"] = trace.cost_usd
+    units["CostUSD"] = "None"
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": _namespace(),
+                "Dimensions": [["Route"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+            }],
+        },
+        "Route": trace.route,
+        "Outcome": outcome,
+        **values,
+    }
+    # EMF must be a bare JSON log line, so it bypasses the logging formatter
+    print(json.dumps(record), flush=True)
@@ -1,23 +1,43 @@
 import json
+import logging
 import os
-from collections.abc import AsyncIterator
-from dataclasses import replace
-from pathlib import Path
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field, replace
+from statistics import median
+from threading import Lock
 from typing import Any
 
-import litellm
-from agents import Model
-from agents.extensions.models.litellm_model import LitellmModel
-from dotenv import load_dotenv
+from agents import Model, ModelSettings
 from pydantic import BaseModel
 
 from . import constants
+from .clients import client_registry
+from .metrics import estimate_cost, metrics, record_llm_usage
+from .retrieval import retrieval_enabled
+from .provider_health import RETRYABLE_KINDS, ProviderUnavailableError, classify_error, is_request_error, provider_health
 
-load_dotenv(override=True)
-load_dotenv(Path(__file__).resolve().parents[2] / ".env", override=True)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 DEFAULT_OPENROUTER_MODEL = "google/gemini-2.5-flash-lite"
 DEFAULT_OPENCODE_GO_MODEL = "deepseek-v4-flash"
+# API key variable and base URL per provider; OpenCode Go picks its base URL per API style
+PROVIDERS = {
+    "opencode_go": ("OPENCODE_GO_API_KEY", None),
+    "openrouter": ("OPENROUTER_API_KEY", constants.OPENROUTER_BASE_URL),
+    "groq": ("GROQ_API_KEY", constants.GROQ_BASE_URL),
+    "deepseek": ("DEEPSEEK_API_KEY", constants.DEEPSEEK_BASE_URL),
+    "gemini": ("GEMINI_API_KEY", constants.GEMINI_BASE_URL),
+}
+ROUTER_POLICIES = ("static", "latency", "cost")
+DEFAULT_ROUTER_WINDOW_CALLS = 50
+DEFAULT_ROUTER_WINDOW_SECONDS = 300.0
+# Backends with fewer recent calls than this are tried before ranked ones, so every backend gets measured
+ROUTER_MIN_SAMPLES = 3
+# Latency score multiplier per unit of error rate, e.g. a 25% error rate doubles a backend's score
+ROUTER_ERROR_PENALTY = 4.0
 
 
 def _env_bool(name: str, default: bool = False) -> bool:
@@ -42,18 +62,39 @@ def use_evaluation_openrouter() -> bool:
     return _env_bool("USE_EVALUATION_OPENROUTER", default=False)
 
 
-def active_chat_model_name() -> str:
-    if use_openrouter():
+def chat_provider() -> str:
+    """Provider serving the chat agent: `openrouter` or `opencode_go`"""
+    return "openrouter" if use_openrouter() else "opencode_go"
+
+
+def provider_model_name(provider: str) -> str:
+    if provider == "openrouter":
         return os.getenv("DEFAULT_MODEL_NAME", DEFAULT_OPENROUTER_MODEL)
     return os.getenv("OPENCODE_GO_MODEL", DEFAULT_OPENCODE_GO_MODEL)
 
 
+def provider_configured(provider: str) -> bool:
+    return bool(os.getenv(PROVIDERS[provider][0]))
+
+
+def active_chat_model_name() -> str:
+    return provider_model_name(chat_provider())
+
+
 def active_evaluation_model_name() -> str:
     if use_evaluation_openrouter():
         return os.getenv("EVALUATION_MODEL_NAME", DEFAULT_OPENROUTER_MODEL)
     return os.getenv("OPENCODE_GO_MODEL", DEFAULT_OPENCODE_GO_MODEL)
 
 
+def _litellm_model(**kwargs: Any) -> Model:
+    # litellm costs seconds of import time, so it is only loaded once a chat model is built
+    from agents.extensions.models.litellm_model import LitellmModel
+
+    client_registry.configure_litellm()
+    return LitellmModel(**kwargs)
+
+
 def _opencode_go_model_name(model: str, api_style: str) -> str:
     return f"{api_style}/{model}"
 
@@ -62,14 +103,64 @@ def _disable_opencode_go_thinking() -> bool:
     return _env_bool("OPENCODE_GO_DISABLE_THINKING", default=True)
 
 
-def _with_opencode_model_settings(
-    args: tuple[Any, ...], kwargs: dict[str, Any], api_style: str
-) -> tuple[tuple[Any, ...], dict[str, Any]]:
-    if api_style != "openai" or not _disable_opencode_go_thinking():
-        return args, kwargs
+def prompt_caching_enabled(provider: str) -> bool:
+    """
+    Whether to mark system prompts as cacheable for a provider:
+    `anthropic`/`openai` are the OpenCode Go API styles, `openrouter` is OpenRouter passthrough.
+    """
+    if not _env_bool("PROMPT_CACHING_ENABLED", default=True):
+        return False
+    providers = os.getenv("PROMPT_CACHING_PROVIDERS", "anthropic,openrouter")
+    return provider in {item.strip().lower() for item in providers.split(",") if item.strip()}
+
+
+def cacheable_system_message(content: str, suffix: str = "") -> dict[str, Any]:
+    """System message whose `content` is marked as a cache breakpoint; `suffix` follows the breakpoint uncached"""
+    blocks = [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+    if suffix:
+        blocks.append({"type": "text", "text": suffix})
+    return {"role": "system", "content": blocks}
+
+
+def apply_prompt_cache_markers(messages: list[dict[str, Any]], provider: str) -> list[dict[str, Any]]:
+    """Keep cache markers for providers with caching enabled, otherwise flatten marked system messages to plain text"""
+    if prompt_caching_enabled(provider):
+        return messages
+    return [
+        {**message, "content": "".join(block.get("text", "") for block in message["content"])}
+        if message.get("role") == "system" and isinstance(message.get("content"), list)
+        else message
+        for message in messages
+    ]
+
+
+def agent_cache_control_args() -> dict[str, Any]:
+    """
+    litellm injects Anthropic-style cache_control markers on the system message and on the turn's user message,
+    so the next turn (whose input extends this one) reads the conversation prefix from cache. With persona
+    retrieval the turn's excerpts trail the user message (see `server._build_agent_input`) and are not saved
+    with the turn, so the breakpoint moves one message back to keep them after it
+    """
+    return {
+        "cache_control_injection_points": [
+            {"location": "message", "role": "system"},
+            {"location": "message", "index": -2 if retrieval_enabled() else -1},
+        ]
+    }
 
-    if "model_settings" in kwargs:
-        model_settings = kwargs["model_settings"]
+
+def agent_model_settings() -> ModelSettings:
+    # A routed model adds cache markers per backend itself
+    if router_policy() != "static" or not use_openrouter():
+        return ModelSettings()
+    settings = _with_pooled_client(ModelSettings(), "litellm_openrouter")
+    if prompt_caching_enabled("openrouter"):
+        settings = replace(settings, extra_args={**settings.extra_args, **agent_cache_control_args()})
+    return settings
+
+
+def _opencode_model_settings(model_settings: ModelSettings, api_style: str) -> ModelSettings:
+    if api_style == "openai" and _disable_opencode_go_thinking():
         extra_body = {
             **(model_settings.extra_body or {}),
             "extra_body": {
@@ -77,35 +168,109 @@ def _with_opencode_model_settings(
                 "thinking": {"type": "disabled"},
             },
         }
-        kwargs = {
-            **kwargs,
-            "model_settings": replace(
-                model_settings, extra_body=extra_body
-            ),
-        }
+        model_settings = replace(model_settings, extra_body=extra_body)
+
+    if prompt_caching_enabled(api_style):
+        model_settings = replace(
+            model_settings,
+            extra_args={**(model_settings.extra_args or {}), **agent_cache_control_args()},
+        )
+    if api_style == "anthropic":
+        model_settings = _with_pooled_client(model_settings, "litellm_anthropic")
+    return model_settings
+
+
+def _with_pooled_client(model_settings: ModelSettings, name: str) -> ModelSettings:
+    """Settings whose litellm call runs on a pooled client; see `ClientRegistry.litellm_http_handler`"""
+    return replace(
+        model_settings,
+        extra_args={**(model_settings.extra_args or {}), "client": client_registry.litellm_http_handler(name)},
+    )
+
+
+def _replace_model_settings(
+    args: tuple[Any, ...], kwargs: dict[str, Any], update: Callable[[ModelSettings], ModelSettings]
+) -> tuple[tuple[Any, ...], dict[str, Any]]:
+    if "model_settings" in kwargs:
+        kwargs = {**kwargs, "model_settings": update(kwargs["model_settings"])}
         return args, kwargs
 
     model_settings_index = 2
     if len(args) <= model_settings_index:
         return args, kwargs
 
-    model_settings = args[model_settings_index]
-    extra_body = {
-        **(model_settings.extra_body or {}),
-        "extra_body": {
-            **(model_settings.extra_body or {}).get("extra_body", {}),
-            "thinking": {"type": "disabled"},
-        },
-    }
     updated_args = list(args)
-    updated_args[model_settings_index] = replace(
-        model_settings, extra_body=extra_body
-    )
+    updated_args[model_settings_index] = update(args[model_settings_index])
     return tuple(updated_args), kwargs
 
 
+def _with_opencode_model_settings(
+    args: tuple[Any, ...], kwargs: dict[str, Any], api_style: str
+) -> tuple[tuple[Any, ...], dict[str, Any]]:
+    return _replace_model_settings(args, kwargs, lambda settings: _opencode_model_settings(settings, api_style))
+
+
+@dataclass
+class PromptCacheStats:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cache_hit_ratio": (
+                round(self.cached_tokens / self.input_tokens, 3) if self.input_tokens else None
+            ),
+        }
+
+
+prompt_cache_stats: dict[str, PromptCacheStats] = {}
+
+
+def _usage_value(source: Any, *names: str) -> int:
+    for name in names:
+        value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+        if value:
+            return int(value)
+    return 0
+
+
+def record_prompt_cache_usage(label: str, model: str, usage: Any) -> None:
+    """
+    Log and accumulate cached vs uncached input tokens from an OpenAI, litellm or Agents SDK usage object,
+    and record the call's tokens and estimated cost in the metrics registry
+    """
+    if usage is None:
+        return
+    input_tokens = _usage_value(usage, "input_tokens", "prompt_tokens")
+    details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = _usage_value(details, "cached_tokens") if details else 0
+    cached_tokens = cached_tokens or _usage_value(usage, "cache_read_input_tokens")
+    cache_write_tokens = _usage_value(usage, "cache_creation_input_tokens")
+    output_tokens = _usage_value(usage, "output_tokens", "completion_tokens")
+    record_llm_usage(label, model, input_tokens, cached_tokens, cache_write_tokens, output_tokens)
+
+    stats = prompt_cache_stats.setdefault(label, PromptCacheStats())
+    stats.calls += 1
+    stats.input_tokens += input_tokens
+    stats.cached_tokens += cached_tokens
+    stats.cache_write_tokens += cache_write_tokens
+    logger.info(
+        "Prompt cache usage label=%s model=%s input_tokens=%s cached_tokens=%s cache_write_tokens=%s",
+        label, model, input_tokens, cached_tokens, cache_write_tokens,
+    )
+
+
 class OpenCodeGoModel(Model):
-    _api_style_cache: dict[str, str] = {}
+    """
+    OpenCode Go through litellm in either API style. With `auto`, the style pinned in `provider_health`
+    is tried first and the other one only for errors where switching can help.
+    """
 
     def __init__(
         self, model: str, api_key: str | None, api_style: str = "auto"
@@ -115,89 +280,67 @@ class OpenCodeGoModel(Model):
         if self.api_style not in {"auto", "openai", "anthropic"}:
             raise ValueError("OPENCODE_GO_API_STYLE must be auto, openai, or anthropic")
         self._clients = {
-            "openai": LitellmModel(
+            "openai": _litellm_model(
                 model=_opencode_go_model_name(model, "openai"),
                 base_url=constants.OPENCODE_GO_OPENAI_BASE_URL,
                 api_key=api_key,
             ),
-            "anthropic": LitellmModel(
+            "anthropic": _litellm_model(
                 model=_opencode_go_model_name(model, "anthropic"),
                 base_url=constants.OPENCODE_GO_ANTHROPIC_BASE_URL,
                 api_key=api_key,
             ),
         }
-        self._active_api_style = self._initial_api_style()
-
-    def _initial_api_style(self) -> str:
-        if self.api_style != "auto":
-            return self.api_style
-        return self._api_style_cache.get(self.model, "openai")
-
-    def _alternate_api_style(self) -> str:
-        return "anthropic" if self._active_api_style == "openai" else "openai"
 
     async def get_response(self, *args: Any, **kwargs: Any) -> Any:
-        try:
-            call_args, call_kwargs = _with_opencode_model_settings(
-                args, kwargs, self._active_api_style
-            )
-            response = await self._clients[self._active_api_style].get_response(
-                *call_args, **call_kwargs
-            )
-            self._api_style_cache[self.model] = self._active_api_style
-            return response
-        except Exception as first_error:
-            if self.api_style != "auto":
-                raise
-            first_api_style = self._active_api_style
-            self._active_api_style = self._alternate_api_style()
+        first_error: Exception | None = None
+        for style in provider_health.styles(self.model, self.api_style):
+            call_args, call_kwargs = _with_opencode_model_settings(args, kwargs, style)
             try:
-                call_args, call_kwargs = _with_opencode_model_settings(
-                    args, kwargs, self._active_api_style
-                )
-                response = await self._clients[self._active_api_style].get_response(
-                    *call_args, **call_kwargs
-                )
-                self._api_style_cache[self.model] = self._active_api_style
-                return response
-            except Exception as second_error:
-                raise RuntimeError(
-                    f"OpenCode Go model '{self.model}' failed with both "
-                    f"{first_api_style} and {self._active_api_style} API styles. "
-                    f"First error: {first_error}"
-                ) from second_error
+                response = await self._clients[style].get_response(*call_args, **call_kwargs)
+            except Exception as error:
+                first_error = first_error or error
+                if not provider_health.failed(self.model, style, self.api_style, error):
+                    raise
+                continue
+            provider_health.succeeded(self.model, style, self.api_style)
+            return response
+        raise provider_health.exhausted(self.model, first_error) from first_error
 
     def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
         async def stream() -> AsyncIterator[Any]:
-            try:
-                stream_args, stream_kwargs = _with_opencode_model_settings(
-                    args, kwargs, self._active_api_style
-                )
-                async for chunk in self._clients[
-                    self._active_api_style
-                ].stream_response(*stream_args, **stream_kwargs):
-                    yield chunk
-                self._api_style_cache[self.model] = self._active_api_style
-            except Exception:
-                if self.api_style != "auto":
-                    raise
-                self._active_api_style = self._alternate_api_style()
-                stream_args, stream_kwargs = _with_opencode_model_settings(
-                    args, kwargs, self._active_api_style
-                )
-                async for chunk in self._clients[
-                    self._active_api_style
-                ].stream_response(*stream_args, **stream_kwargs):
-                    yield chunk
-                self._api_style_cache[self.model] = self._active_api_style
+            first_error: Exception | None = None
+            for style in provider_health.styles(self.model, self.api_style):
+                stream_args, stream_kwargs = _with_opencode_model_settings(args, kwargs, style)
+                started = False
+                try:
+                    async for chunk in self._clients[style].stream_response(*stream_args, **stream_kwargs):
+                        started = True
+                        yield chunk
+                except Exception as error:
+                    first_error = first_error or error
+                    # Once events reached the caller the turn cannot be replayed on another style
+                    if not provider_health.failed(self.model, style, self.api_style, error) or started:
+                        raise
+                    continue
+                provider_health.succeeded(self.model, style, self.api_style)
+                return
+            raise provider_health.exhausted(self.model, first_error) from first_error
 
         return stream()
 
 
 def create_agent_model() -> Model:
+    if router_policy() != "static":
+        return RoutedModel("agent")
+
     if use_openrouter():
         model_name = os.getenv("DEFAULT_MODEL_NAME", DEFAULT_OPENROUTER_MODEL)
-        return LitellmModel(model="openrouter/" + model_name)
+        return _litellm_model(
+            model="openrouter/" + model_name,
+            base_url=constants.OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+        )
 
     return OpenCodeGoModel(
         model=active_chat_model_name(),
@@ -206,24 +349,26 @@ def create_agent_model() -> Model:
     )
 
 
-def opencode_go_completion(messages: list[dict[str, str]], model: str) -> Any:
+async def opencode_go_completion(messages: list[dict[str, Any]], model: str) -> Any:
+    import litellm
+
+    client_registry.configure_litellm()
     api_key = _env_required("OPENCODE_GO_API_KEY")
     api_style = os.getenv("OPENCODE_GO_API_STYLE", "auto").strip().lower()
     if api_style not in {"auto", "openai", "anthropic"}:
         raise ValueError("OPENCODE_GO_API_STYLE must be auto, openai, or anthropic")
 
-    api_styles = ["openai", "anthropic"] if api_style == "auto" else [api_style]
     first_error: Exception | None = None
-
-    for style in api_styles:
+    for style in provider_health.styles(model, api_style):
+        extra_kwargs = {}
+        if style == "openai" and _disable_opencode_go_thinking():
+            extra_kwargs["extra_body"] = {"thinking": {"type": "disabled"}}
+        if style == "anthropic":
+            extra_kwargs["client"] = client_registry.litellm_http_handler("litellm_anthropic")
         try:
-            extra_kwargs = {}
-            if style == "openai" and _disable_opencode_go_thinking():
-                extra_kwargs["extra_body"] = {"thinking": {"type": "disabled"}}
-
-            return litellm.completion(
+            response = await litellm.acompletion(
                 model=_opencode_go_model_name(model, style),
-                messages=messages,
+                messages=apply_prompt_cache_markers(messages, style),
                 api_key=api_key,
                 base_url=(
                     constants.OPENCODE_GO_OPENAI_BASE_URL
@@ -233,17 +378,320 @@ def opencode_go_completion(messages: list[dict[str, str]], model: str) -> Any:
                 **extra_kwargs,
             )
         except Exception as error:
-            if first_error is None:
-                first_error = error
-            if api_style != "auto":
+            first_error = first_error or error
+            if not provider_health.failed(model, style, api_style, error):
                 raise
+            continue
+        provider_health.succeeded(model, style, api_style)
+        return response
+
+    raise provider_health.exhausted(model, first_error) from first_error
+
+
+def _openai_compatible_client(provider: str) -> Any:
+    if provider == "openrouter":
+        return client_registry.openrouter_client()
+    api_key_name, base_url = PROVIDERS[provider]
+    return client_registry.openai_compatible_client(provider, base_url, os.getenv(api_key_name))
+
 
-    raise RuntimeError(
-        f"OpenCode Go model '{model}' failed with both OpenAI-compatible and "
-        f"Anthropic API styles. First error: {first_error}"
+async def provider_completion(provider: str, messages: list[dict[str, Any]], model: str | None = None) -> Any:
+    """One chat completion on `provider` outside the Agents SDK (no tools)"""
+    model = model or provider_model_name(provider)
+    if provider != "opencode_go":
+        breaker = provider_health.breaker(provider)
+        if not breaker.allow():
+            raise ProviderUnavailableError(f"{provider} is unavailable: circuit breaker is open")
+        try:
+            response = await _openai_compatible_client(provider).chat.completions.create(
+                model=model, messages=apply_prompt_cache_markers(messages, provider)
+            )
+        except Exception as error:
+            kind = classify_error(error)
+            metrics.increment("provider_errors_total", provider=provider, api_style="openai", kind=kind)
+            if kind in RETRYABLE_KINDS:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return response
+    return await opencode_go_completion(messages, model)
+
+
+def router_policy() -> str:
+    """
+    `MODEL_ROUTER_POLICY`: `static` (default) serves each call from the statically configured model;
+    `latency` and `cost` pick the fastest or cheapest healthy backend from the pool and fail over to the next
+    """
+    policy = os.getenv("MODEL_ROUTER_POLICY", "static").strip().lower()
+    if policy not in ROUTER_POLICIES:
+        raise ValueError("MODEL_ROUTER_POLICY must be static, latency, or cost")
+    return policy
+
+
+def _router_window_calls() -> int:
+    return int(os.getenv("MODEL_ROUTER_WINDOW_CALLS", DEFAULT_ROUTER_WINDOW_CALLS))
+
+
+def _router_window_seconds() -> float:
+    return float(os.getenv("MODEL_ROUTER_WINDOW_SECONDS", DEFAULT_ROUTER_WINDOW_SECONDS))
+
+
+@dataclass(frozen=True)
+class RouteBackend:
+    provider: str
+    model: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    @classmethod
+    def parse(cls, value: str) -> "RouteBackend":
+        """Parse a `provider:model` entry, e.g. `groq:llama-3.3-70b-versatile`"""
+        provider, _, model = value.strip().partition(":")
+        if provider not in PROVIDERS or not model:
+            raise ValueError(f"Model backends must be provider:model with provider one of {', '.join(PROVIDERS)}, got {value!r}")
+        return cls(provider, model)
+
+
+def _static_backend(role: str) -> RouteBackend:
+    if role == "evaluation":
+        return RouteBackend("openrouter" if use_evaluation_openrouter() else "opencode_go", active_evaluation_model_name())
+    return RouteBackend(chat_provider(), active_chat_model_name())
+
+
+def router_backends() -> list[RouteBackend]:
+    """
+    `MODEL_ROUTER_BACKENDS` lists `provider:model` entries, e.g. `groq:llama-3.3-70b-versatile`;
+    by default the static agent and evaluator models plus each provider's default model.
+    Backends whose provider has no API key are left out.
+    """
+    value = os.getenv("MODEL_ROUTER_BACKENDS")
+    if value:
+        backends = [RouteBackend.parse(item) for item in value.split(",") if item.strip()]
+    else:
+        backends = [_static_backend("agent"), _static_backend("evaluation")]
+        backends += [RouteBackend(provider, provider_model_name(provider)) for provider in ("opencode_go", "openrouter")]
+    return [backend for backend in dict.fromkeys(backends) if provider_configured(backend.provider)]
+
+
+@dataclass
+class _RouteSample:
+    at: float
+    seconds: float
+    ok: bool
+    cost_usd: float | None
+
+
+@dataclass
+class BackendStats:
+    """Rolling window of one backend's calls for one role"""
+    samples: deque = field(default_factory=lambda: deque(maxlen=_router_window_calls()))
+
+    def recent(self) -> list[_RouteSample]:
+        cutoff = time.monotonic() - _router_window_seconds()
+        return [sample for sample in self.samples if sample.at >= cutoff]
+
+    def summary(self) -> dict[str, Any]:
+        samples = self.recent()
+        latencies = [sample.seconds for sample in samples if sample.ok]
+        costs = [sample.cost_usd for sample in samples if sample.ok and sample.cost_usd is not None]
+        return {
+            "calls": len(samples),
+            "error_rate": round(sum(not sample.ok for sample in samples) / len(samples), 3) if samples else None,
+            "p50_seconds": round(median(latencies), 3) if latencies else None,
+            "mean_cost_usd": sum(costs) / len(costs) if costs else None,
+        }
+
+
+def _usage_cost(model: str, usage: Any) -> float | None:
+    if usage is None:
+        return None
+    details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    return estimate_cost(
+        model,
+        _usage_value(usage, "input_tokens", "prompt_tokens"),
+        _usage_value(details, "cached_tokens") if details else 0,
+        _usage_value(usage, "output_tokens", "completion_tokens"),
     )
 
 
+class ModelRouter:
+    """
+    Routes agent, evaluation and summary calls across the backend pool under `MODEL_ROUTER_POLICY`,
+    from rolling per-role latency, error rate and cost
+    """
+
+    def __init__(self):
+        self._stats: dict[tuple[str, RouteBackend], BackendStats] = {}
+        self._lock = Lock()
+
+    def active(self) -> bool:
+        return router_policy() != "static"
+
+    def _backend_stats(self, role: str, backend: RouteBackend) -> BackendStats:
+        with self._lock:
+            return self._stats.setdefault((role, backend), BackendStats())
+
+    def _score(self, role: str, backend: RouteBackend, policy: str) -> tuple:
+        summary = self._backend_stats(role, backend).summary()
+        if summary["p50_seconds"] is None:
+            return (float("inf"), float("inf"))
+        latency = summary["p50_seconds"] * (1 + ROUTER_ERROR_PENALTY * summary["error_rate"])
+        if policy == "cost":
+            cost = summary["mean_cost_usd"]
+            return (float("inf") if cost is None else cost, latency)
+        return (latency,)
+
+    def order(self, role: str) -> list[RouteBackend]:
+        """Backends to try for one call, best first"""
+        policy = router_policy()
+        pool = router_backends() if policy != "static" else []
+        if not pool:
+            return [_static_backend(role)]
+        unmeasured = [backend for backend in pool if len(self._backend_stats(role, backend).recent()) < ROUTER_MIN_SAMPLES]
+        ranked = sorted(
+            (backend for backend in pool if backend not in unmeasured),
+            key=lambda backend: self._score(role, backend, policy),
+        )
+        return unmeasured + ranked
+
+    def record(self, role: str, backend: RouteBackend, seconds: float, ok: bool, usage: Any = None) -> None:
+        cost = _usage_cost(backend.model, usage) if ok else None
+        self._backend_stats(role, backend).samples.append(_RouteSample(time.monotonic(), seconds, ok, cost))
+
+    def failed_over(self, role: str, backend: RouteBackend, error: Exception) -> bool:
+        """Log a failed call; returns whether the next backend should be tried"""
+        if is_request_error(error):
+            return False
+        logger.warning("Routed %s call failed backend=%s error=%s", role, backend.name, error)
+        metrics.increment("router_failovers_total", role=role, backend=backend.name)
+        return True
+
+    async def completion(self, role: str, messages: list[dict[str, Any]]) -> tuple[Any, RouteBackend]:
+        """One chat completion (no tools) on the best backend for `role`, failing over down the order"""
+        first_error: Exception | None = None
+        for backend in self.order(role):
+            started = time.perf_counter()
+            try:
+                response = await provider_completion(backend.provider, messages, backend.model)
+            except Exception as error:
+                self.record(role, backend, time.perf_counter() - started, ok=False)
+                first_error = first_error or error
+                if not self.failed_over(role, backend, error):
+                    raise
+                continue
+            self.record(role, backend, time.perf_counter() - started, ok=True, usage=getattr(response, "usage", None))
+            return response, backend
+        raise RuntimeError(f"No model backend could serve the {role} call. First error: {first_error}") from first_error
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        backends: dict[str, dict[str, Any]] = {}
+        for (role, backend), backend_stats in stats.items():
+            backends.setdefault(role, {})[backend.name] = backend_stats.summary()
+        return {
+            "policy": router_policy(),
+            "pool": [backend.name for backend in router_backends()],
+            "backends": backends,
+        }
+
+
+model_router = ModelRouter()
+
+
+class RoutedModel(Model):
+    """Agents SDK model that sends each model call to the router's best backend for `role`"""
+
+    def __init__(self, role: str = "agent") -> None:
+        self.role = role
+        # Built up front, while the app is imported, so the first call to a backend does not stall
+        # the event loop on litellm's import and model construction
+        self._models: dict[RouteBackend, Model] = {backend: self._build(backend) for backend in router_backends()}
+
+    @staticmethod
+    def _build(backend: RouteBackend) -> Model:
+        if backend.provider == "opencode_go":
+            return OpenCodeGoModel(
+                model=backend.model,
+                api_key=os.getenv("OPENCODE_GO_API_KEY"),
+                api_style=os.getenv("OPENCODE_GO_API_STYLE", "auto"),
+            )
+        if backend.provider == "openrouter":
+            return _litellm_model(
+                model="openrouter/" + backend.model,
+                base_url=constants.OPENROUTER_BASE_URL,
+                api_key=os.getenv("OPENROUTER_API_KEY"),
+            )
+        api_key_name, base_url = PROVIDERS[backend.provider]
+        return _litellm_model(model=f"openai/{backend.model}", base_url=base_url, api_key=os.getenv(api_key_name))
+
+    def _model(self, backend: RouteBackend) -> Model:
+        if backend not in self._models:
+            self._models[backend] = self._build(backend)
+        return self._models[backend]
+
+    @staticmethod
+    def _call_args(backend: RouteBackend, args: tuple[Any, ...], kwargs: dict[str, Any]) -> tuple[tuple[Any, ...], dict[str, Any]]:
+        if backend.provider != "openrouter":
+            return args, kwargs
+
+        def update(settings: ModelSettings) -> ModelSettings:
+            settings = _with_pooled_client(settings, "litellm_openrouter")
+            if prompt_caching_enabled("openrouter"):
+                settings = replace(settings, extra_args={**settings.extra_args, **agent_cache_control_args()})
+            return settings
+
+        return _replace_model_settings(args, kwargs, update)
+
+    async def get_response(self, *args: Any, **kwargs: Any) -> Any:
+        first_error: Exception | None = None
+        for backend in model_router.order(self.role):
+            call_args, call_kwargs = self._call_args(backend, args, kwargs)
+            started = time.perf_counter()
+            try:
+                response = await self._model(backend).get_response(*call_args, **call_kwargs)
+            except Exception as error:
+                model_router.record(self.role, backend, time.perf_counter() - started, ok=False)
+                first_error = first_error or error
+                if not model_router.failed_over(self.role, backend, error):
+                    raise
+                continue
+            model_router.record(self.role, backend, time.perf_counter() - started, ok=True, usage=response.usage)
+            return response
+        raise RuntimeError(f"No model backend could serve the {self.role} call. First error: {first_error}") from first_error
+
+    def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        async def stream() -> AsyncIterator[Any]:
+            first_error: Exception | None = None
+            for backend in model_router.order(self.role):
+                call_args, call_kwargs = self._call_args(backend, args, kwargs)
+                started = time.perf_counter()
+                usage = None
+                streamed = False
+                try:
+                    async for event in self._model(backend).stream_response(*call_args, **call_kwargs):
+                        streamed = True
+                        if getattr(event, "type", None) == "response.completed":
+                            usage = getattr(event.response, "usage", None)
+                        yield event
+                except Exception as error:
+                    model_router.record(self.role, backend, time.perf_counter() - started, ok=False)
+                    first_error = first_error or error
+                    # Events already sent to the caller cannot be replayed from another backend
+                    if streamed or not model_router.failed_over(self.role, backend, error):
+                        raise
+                    continue
+                model_router.record(self.role, backend, time.perf_counter() - started, ok=True, usage=usage)
+                return
+            raise RuntimeError(f"No model backend could serve the {self.role} call. First error: {first_error}") from first_error
+
+        return stream()
+
+
 def parse_json_model_response(content: str, schema: type[BaseModel]) -> BaseModel:
     try:
         return schema.model_validate_json(content)
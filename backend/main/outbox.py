@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import asdict, dataclass, field
+
+from .digest import digest_enabled
+from .email_sender import MailJetEmail
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+FILE_QUEUE_POLL_SECONDS = 0.5
+DIGEST_POLL_SECONDS = 30.0
+# Mailjet answers that are worth retrying; any other 4xx means the message itself was rejected
+TRANSIENT_STATUS_CODES = {408, 429}
+
+
+def outbox_backend() -> str:
+    backend = os.getenv("EMAIL_OUTBOX_BACKEND", "memory").strip().lower()
+    if backend not in {"memory", "file", "sqs"}:
+        raise ValueError("EMAIL_OUTBOX_BACKEND must be memory, file, or sqs")
+    return backend
+
+
+def _max_attempts() -> int:
+    return int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+
+
+def _backoff_seconds(attempts: int) -> float:
+    base = float(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", DEFAULT_BACKOFF_SECONDS))
+    return min(base * (2 ** (attempts - 1)), MAX_BACKOFF_SECONDS)
+
+
+@dataclass
+class EmailJob:
+    kind: str
+    payload: dict
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    attempts: int = 0
+    available_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "EmailJob":
+        return cls(**json.loads(data))
+
+
+def is_permanent_failure(error: BaseException) -> bool:
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in TRANSIENT_STATUS_CODES
+
+
+def deliver(job: EmailJob, sender: MailJetEmail) -> None:
+    """Perform the Mailjet call for a job (blocking)"""
+    if job.kind == "record_user_details":
+        sender.record_user_details(**job.payload)
+    elif job.kind == "record_unknown_question":
+        sender.record_unknown_question(**job.payload)
+    elif job.kind == "send_resume_to_user":
+        sender.send_resume_to_user(**job.payload)
+    else:
+        raise ValueError(f"Unknown email job kind: {job.kind}")
+
+
+class MemoryQueue:
+    """asyncio queue living inside the current process"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._delayed: dict[str, tuple[asyncio.TimerHandle, EmailJob]] = {}
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def put(self, job: EmailJob) -> None:
+        self._get_queue().put_nowait(job)
+
+    async def get(self) -> EmailJob:
+        return await self._get_queue().get()
+
+    def _release(self, job: EmailJob) -> None:
+        self._delayed.pop(job.job_id, None)
+        self._get_queue().put_nowait(job)
+
+    async def requeue(self, job: EmailJob) -> None:
+        delay = max(job.available_at - time.time(), 0)
+        handle = asyncio.get_running_loop().call_later(delay, self._release, job)
+        self._delayed[job.job_id] = (handle, job)
+
+    async def ack(self, job: EmailJob) -> None:
+        pass
+
+    async def dead_letter(self, job: EmailJob) -> None:
+        logger.error("Dropping email job %s (%s) after %s attempts", job.job_id, job.kind, job.attempts)
+
+    def pending(self) -> int:
+        return self._get_queue().qsize() + len(self._delayed)
+
+    def drain(self) -> list[EmailJob]:
+        """Take every queued job, including those waiting out a retry backoff"""
+        jobs = []
+        for handle, job in self._delayed.values():
+            handle.cancel()
+            jobs.append(job)
+        self._delayed.clear()
+        queue = self._get_queue()
+        while not queue.empty():
+            jobs.append(queue.get_nowait())
+        return jobs
+
+
+class FileQueue:
+    """
+    Directory-backed queue used as a local stand-in for a managed queue.
+    Jobs live in pending/ named by their availability time, are claimed by an atomic
+    rename into processing/, and end up deleted (delivered) or in failed/.
+    """
+
+    def __init__(self, directory: str):
+        self.pending_dir = os.path.join(directory, "pending")
+        self.processing_dir = os.path.join(directory, "processing")
+        self.failed_dir = os.path.join(directory, "failed")
+        for path in (self.pending_dir, self.processing_dir, self.failed_dir):
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _file_name(job: EmailJob) -> str:
+        return f"{int(job.available_at * 1000):015d}-{job.job_id}.json"
+
+    def _write(self, directory: str, job: EmailJob) -> None:
+        path = os.path.join(directory, self._file_name(job))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(job.to_json())
+        os.replace(tmp_path, path)
+
+    def _claim(self) -> EmailJob | None:
+        now_ms = int(time.time() * 1000)
+        for name in sorted(os.listdir(self.pending_dir)):
+            if not name.endswith(".json") or int(name.split("-", 1)[0]) > now_ms:
+                continue
+            processing_path = os.path.join(self.processing_dir, name)
+            try:
+                os.rename(os.path.join(self.pending_dir, name), processing_path)
+            except FileNotFoundError:
+                # Claimed by another worker first
+                continue
+            with open(processing_path) as f:
+                return EmailJob.from_json(f.read())
+        return None
+
+    def _remove_processing(self, job: EmailJob) -> None:
+        for name in os.listdir(self.processing_dir):
+            if job.job_id in name:
+                os.remove(os.path.join(self.processing_dir, name))
+
+    async def put(self, job: EmailJob) -> None:
+        await asyncio.to_thread(self._write, self.pending_dir, job)
+
+    async def get(self) -> EmailJob:
+        while True:
+            job = await asyncio.to_thread(self._claim)
+            if job is not None:
+                return job
+            await asyncio.sleep(FILE_QUEUE_POLL_SECONDS)
+
+    async def requeue(self, job: EmailJob) -> None:
+        await asyncio.to_thread(self._remove_processing, job)
+        await self.put(job)
+
+    async def ack(self, job: EmailJob) -> None:
+        await asyncio.to_thread(self._remove_processing, job)
+
+    async def dead_letter(self, job: EmailJob) -> None:
+        await asyncio.to_thread(self._remove_processing, job)
+        await asyncio.to_thread(self._write, self.failed_dir, job)
+        logger.error("Moved email job %s (%s) to failed/ after %s attempts", job.job_id, job.kind, job.attempts)
+
+    def pending(self) -> int:
+        return len([name for name in os.listdir(self.pending_dir) if name.endswith(".json")])
+
+
+class SQSQueue:
+    """
+    Producer side of an SQS outbox for Lambda deployments.
+    Jobs are consumed by `lambda_handler.handler` through an SQS event source mapping,
+    and SQS redelivery provides the retries.
+    """
+
+    def __init__(self, queue_url: str):
+        import boto3
+
+        self.queue_url = queue_url
+        self.client = boto3.client("sqs")
+
+    async def put(self, job: EmailJob) -> None:
+        await asyncio.to_thread(
+            self.client.send_message, QueueUrl=self.queue_url, MessageBody=job.to_json()
+        )
+
+
+class EmailOutbox:
+    def __init__(self, queue, sender: MailJetEmail | None = None):
+        self.queue = queue
+        self.sender = sender or MailJetEmail()
+        self._worker: asyncio.Task | None = None
+        self._digest_timer: asyncio.Task | None = None
+
+    @property
+    def has_worker(self) -> bool:
+        return not isinstance(self.queue, SQSQueue)
+
+    def _ensure_worker(self) -> None:
+        if not self.has_worker:
+            return
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        if digest_enabled() and (self._digest_timer is None or self._digest_timer.done()):
+            self._digest_timer = asyncio.get_running_loop().create_task(self._run_digest_timer())
+
+    async def enqueue(self, kind: str, **payload) -> str:
+        job = EmailJob(kind=kind, payload=payload)
+        await self.queue.put(job)
+        self._ensure_worker()
+        logger.info("Queued email job %s (%s)", job.job_id, kind)
+        return job.job_id
+
+    async def start(self) -> None:
+        self._ensure_worker()
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if isinstance(self.queue, MemoryQueue):
+            await self._drain_memory_queue()
+        if self._digest_timer is not None:
+            self._digest_timer.cancel()
+            self._digest_timer = None
+        if len(self.sender.digest):
+            await asyncio.to_thread(self.sender.flush_digest)
+
+    async def _drain_memory_queue(self) -> None:
+        # Jobs held in process memory do not outlive it (e.g. a Mangum lifespan shutdown on Lambda),
+        # so each gets one last delivery attempt before the process stops
+        jobs = self.queue.drain()
+        if jobs:
+            logger.info("Delivering %s queued email jobs before shutdown", len(jobs))
+        for job in jobs:
+            job.attempts += 1
+            try:
+                await asyncio.to_thread(deliver, job, self.sender)
+                logger.info("Delivered email job %s (%s)", job.job_id, job.kind)
+            except Exception as e:
+                logger.error("Email job %s (%s) lost at shutdown: %s", job.job_id, job.kind, str(e))
+
+    async def _run(self) -> None:
+        while True:
+            job = await self.queue.get()
+            await self.process(job)
+
+    async def _run_digest_timer(self) -> None:
+        # Time-based digest flush; size-based flushes happen as notifications are added
+        while True:
+            await asyncio.sleep(DIGEST_POLL_SECONDS)
+            await asyncio.to_thread(self.sender.flush_digest_if_due)
+
+    async def process(self, job: EmailJob) -> bool:
+        job.attempts += 1
+        try:
+            await asyncio.to_thread(deliver, job, self.sender)
+        except Exception as e:
+            if job.attempts >= _max_attempts() or is_permanent_failure(e):
+                logger.error("Email job %s (%s) failed permanently: %s", job.job_id, job.kind, str(e))
+                await self.queue.dead_letter(job)
+                return False
+            delay = _backoff_seconds(job.attempts)
+            logger.warning(
+                "Email job %s (%s) attempt %s failed, retrying in %.1fs: %s",
+                job.job_id, job.kind, job.attempts, delay, str(e),
+            )
+            job.available_at = time.time() + delay
+            await self.queue.requeue(job)
+            return False
+
+        await self.queue.ack(job)
+        logger.info("Delivered email job %s (%s)", job.job_id, job.kind)
+        return True
+
+
+def create_outbox() -> EmailOutbox:
+    backend = outbox_backend()
+    if backend == "file":
+        return EmailOutbox(FileQueue(os.getenv("EMAIL_OUTBOX_DIR", "../../memory/outbox")))
+    if backend == "sqs":
+        queue_url = os.getenv("EMAIL_OUTBOX_QUEUE_URL")
+        if not queue_url:
+            raise RuntimeError("Missing required environment variable: EMAIL_OUTBOX_QUEUE_URL")
+        return EmailOutbox(SQSQueue(queue_url))
+    return EmailOutbox(MemoryQueue())
+
+
+email_outbox = create_outbox()
+
+
+def handle_sqs_event(event: dict) -> dict:
+    """Deliver outbox jobs from an SQS batch, reporting failed messages for redelivery"""
+    sender = email_outbox.sender
+    failures = []
+    for record in event.get("Records", []):
+        job = EmailJob.from_json(record["body"])
+        try:
+            deliver(job, sender)
+            logger.info("Delivered email job %s (%s)", job.job_id, job.kind)
+        except Exception as e:
+            logger.error("Email job %s (%s) failed: %s", job.job_id, job.kind, str(e))
+            failures.append({"itemIdentifier": record["messageId"]})
+    # A Lambda container may not live until the digest is due, so each SQS batch is one digest
+    if len(sender.digest):
+        sender.flush_digest()
+    return {"batchItemFailures": failures}
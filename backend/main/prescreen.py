@@ -0,0 +1,205 @@
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from threading import Lock
+
+from .resources import derived_artifact
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_MAX_REPLY_CHARS = 600
+
+# Capitalised words that are not names, so a reply may use them without the persona documents doing so
+COMMON_CAPITALISED = frozenset({
+    "i", "i'm", "i've", "i'd", "i'll", "ai", "ok", "okay",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+})
+
+# Phrases that claim a tool-backed action happened, keyed by the tool that must have run.
+ACTION_CLAIMS = {
+    "send_resume_to_user": re.compile(
+        r"\b(sent|emailed|mailed|sending|forwarded)\b[^.!?\n]*\bresume\b|\bresume\b[^.!?\n]*\b(sent|emailed|on its way)\b",
+        re.IGNORECASE,
+    ),
+    "record_user_details": re.compile(
+        r"\b(noted|recorded|saved|passed on|shared)\b[^.!?\n]*\b(details|email|contact)\b",
+        re.IGNORECASE,
+    ),
+    "record_unknown_question": re.compile(
+        r"\b(logged|recorded|noted|flagged)\b[^.!?\n]*\bquestion\b",
+        re.IGNORECASE,
+    ),
+}
+
+JAILBREAK_PATTERN = re.compile(
+    r"\b(ignore (all |any )?(previous|prior|above)|system prompt|jailbreak|pretend (to be|you are)|"
+    r"developer mode|disregard (your|the) instructions|act as)\b",
+    re.IGNORECASE,
+)
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+URL_PATTERN = re.compile(r"(?:https?://|www\.)[^\s)\]>]+", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[A-Za-z][\w'’.+#&-]*")
+# Sentence boundaries, line starts and list markers; the word after one is capitalised anyway
+SENTENCE_START_PATTERN = re.compile(r"(?:^|[.!?:]\s+|\n\s*(?:[-*•]|\d+[.)])?\s*)$")
+
+
+def evaluation_mode() -> str:
+    """`full` sends every reply to the evaluator model, `tiered` pre-screens replies locally first"""
+    mode = os.getenv("EVALUATION_MODE", "full").strip().lower()
+    if mode not in {"full", "tiered"}:
+        raise ValueError("EVALUATION_MODE must be full or tiered")
+    return mode
+
+
+def _max_reply_chars() -> int:
+    return int(os.getenv("PRESCREEN_MAX_REPLY_CHARS", DEFAULT_MAX_REPLY_CHARS))
+
+
+def _normalise_word(word: str) -> str:
+    word = word.replace("’", "'").rstrip(".-'").lower()
+    return word.removesuffix("'s")
+
+
+def _vocabulary(text: str) -> set:
+    words = {_normalise_word(word) for word in WORD_PATTERN.findall(text)}
+    # Hyphenated and dotted names are also known by their parts, e.g. "sde-2" and "sde"
+    words |= {part for word in list(words) for part in re.split(r"[-./]", word) if part}
+    return words
+
+
+def _named_entities(reply: str) -> list[str]:
+    """
+    Words in the reply that look like names: capitalised words that do not start a sentence,
+    words with inner capitals or all capitals anywhere (e.g. "OpenAI", "AWS") and words like "C++" or "C#"
+    """
+    entities = []
+    for match in WORD_PATTERN.finditer(reply):
+        word = match.group().rstrip(".-'’")
+        at_sentence_start = SENTENCE_START_PATTERN.search(reply[:match.start()]) is not None
+        inner_capitals = any(char.isupper() for char in word[1:])
+        if any(char in word for char in "+#") or inner_capitals or (word[0].isupper() and not at_sentence_start):
+            entities.append(word)
+    return entities
+
+
+@dataclass
+class PrescreenResult:
+    approved: bool
+    reason: str
+
+
+@dataclass
+class PrescreenStats:
+    screened: int = 0
+    skipped: int = 0
+    escalated: int = 0
+    escalation_reasons: dict[str, int] = field(default_factory=dict)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def record(self, result: PrescreenResult) -> None:
+        with self._lock:
+            self.screened += 1
+            if result.approved:
+                self.skipped += 1
+            else:
+                self.escalated += 1
+                self.escalation_reasons[result.reason] = self.escalation_reasons.get(result.reason, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "screened": self.screened,
+                "evaluator_calls_skipped": self.skipped,
+                "escalated": self.escalated,
+                "escalation_reasons": dict(self.escalation_reasons),
+            }
+
+
+@dataclass
+class PersonaCorpus:
+    text: str
+    numbers: set
+    contacts: set
+    # Every word of the persona documents; names in a reply must come from here
+    vocabulary: set
+
+
+class ReplyPrescreen:
+    """
+    Cheap rule-based checks that approve low-risk replies without an evaluator call.
+    Anything the rules cannot vouch for is escalated to the evaluator model.
+    """
+
+    def __init__(self):
+        self.stats = PrescreenStats()
+
+    @staticmethod
+    @derived_artifact("facts", "summary", "resume", "linkedin")
+    def _persona(snapshot) -> PersonaCorpus:
+        resources = snapshot.resources
+        text = "\n".join([str(resources.facts), resources.summary, resources.resume, resources.linkedin])
+        return PersonaCorpus(
+            text=text.lower(),
+            numbers=set(NUMBER_PATTERN.findall(text)),
+            contacts={value.lower() for value in resources.facts.values() if isinstance(value, str)},
+            vocabulary=_vocabulary(text) | COMMON_CAPITALISED,
+        )
+
+    def check(self, reply: str, message: str, tool_calls: list[str] | None = None) -> PrescreenResult:
+        tool_calls = tool_calls or []
+        persona = self._persona()
+        lowered_reply = reply.lower()
+        lowered_message = message.lower()
+
+        if JAILBREAK_PATTERN.search(message):
+            return PrescreenResult(False, "possible_jailbreak")
+
+        if len(reply) > _max_reply_chars():
+            return PrescreenResult(False, "long_reply")
+
+        if "```" in reply:
+            return PrescreenResult(False, "contains_code")
+
+        for tool_name, pattern in ACTION_CLAIMS.items():
+            if pattern.search(reply) and tool_name not in tool_calls:
+                return PrescreenResult(False, "unsupported_action_claim")
+
+        if "send_resume_to_user" in tool_calls and not EMAIL_PATTERN.search(message):
+            return PrescreenResult(False, "tool_call_without_email")
+
+        # Companies, roles, projects or technologies the persona documents never mention go to the evaluator.
+        # Names taken from the visitor's message are not exempt: "Have you used Rust?" -> "Yes, Rust..." must be checked.
+        for entity in _named_entities(reply):
+            if _normalise_word(entity) not in persona.vocabulary:
+                return PrescreenResult(False, "unknown_entity")
+
+        message_numbers = set(NUMBER_PATTERN.findall(message))
+        for number in NUMBER_PATTERN.findall(reply):
+            if number not in persona.numbers and number not in message_numbers:
+                return PrescreenResult(False, "unverified_number")
+
+        for contact in EMAIL_PATTERN.findall(lowered_reply) + URL_PATTERN.findall(lowered_reply):
+            contact = contact.rstrip(".,")
+            if contact not in lowered_message and not any(contact in known for known in persona.contacts):
+                return PrescreenResult(False, "unverified_contact")
+
+        return PrescreenResult(True, "approved")
+
+    def screen(self, reply: str, message: str, tool_calls: list[str] | None = None) -> PrescreenResult:
+        result = self.check(reply, message, tool_calls)
+        self.stats.record(result)
+        logger.info(
+            "Pre-screen %s (%s); stats=%s",
+            "approved" if result.approved else "escalated",
+            result.reason,
+            self.stats.snapshot(),
+        )
+        return result
+
+
+reply_prescreen = ReplyPrescreen()
@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import logging
+from threading import Lock
+from typing import Iterator, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+API_STYLES = ("openai", "anthropic")
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_COOLDOWN_SECONDS = 30.0
+
+# Error kinds:
+# - style: the endpoint answered but does not serve this model in this API style; try and pin the other style
+# - transient: connection errors and 5xx; counted against the endpoint and retried on the other style
+# - overloaded: timeouts and 429s; counted against the endpoint but not retried in the same call, since the
+#   caller has already waited and the other style is served by the same upstream
+# - fatal: the request itself is wrong (bad request, auth, context length); raised immediately
+RETRYABLE_KINDS = {"transient", "overloaded"}
+FAILOVER_KINDS = {"style", "transient"}
+STYLE_STATUS_CODES = {404, 405, 415}
+OVERLOADED_STATUS_CODES = {408, 429}
+REQUEST_ERROR_STATUS_CODES = {400, 413, 422}
+TIMEOUT_ERROR_NAMES = {"Timeout", "APITimeoutError", "TimeoutException", "ReadTimeout", "ConnectTimeout", "PoolTimeout"}
+CONNECTION_ERROR_NAMES = {"APIConnectionError", "ConnectError", "ConnectionError", "RemoteProtocolError", "ServerDisconnectedError"}
+STYLE_ERROR_HINTS = ("model not found", "unsupported model", "does not exist", "not supported", "unknown model")
+
+
+def _breaker_failures() -> int:
+    return int(os.getenv("PROVIDER_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES))
+
+
+def _breaker_cooldown() -> float:
+    return float(os.getenv("PROVIDER_BREAKER_COOLDOWN_SECONDS", DEFAULT_BREAKER_COOLDOWN_SECONDS))
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """Classify an upstream error as `style`, `transient`, `overloaded` or `fatal` (see the kinds above)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        name = type(error).__name__
+        # Checked before the status code: litellm reports timeouts as 408 and connection errors as 500
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or name in TIMEOUT_ERROR_NAMES:
+            return "overloaded"
+        if name in CONNECTION_ERROR_NAMES or isinstance(error, ConnectionError):
+            return "transient"
+        status = _status_code(error)
+        if status is not None:
+            if status in STYLE_STATUS_CODES:
+                return "style"
+            if status in OVERLOADED_STATUS_CODES:
+                return "overloaded"
+            if status >= 500:
+                return "transient"
+            if status == 400 and any(hint in str(error).lower() for hint in STYLE_ERROR_HINTS):
+                return "style"
+            return "fatal"
+        error = error.__cause__ or error.__context__
+    return "fatal"
+
+
+def is_retryable(error: BaseException) -> bool:
+    return classify_error(error) in RETRYABLE_KINDS
+
+
+def is_request_error(error: BaseException) -> bool:
+    """A fatal error caused by the request itself (e.g. context length), which another provider would reject too"""
+    return classify_error(error) == "fatal" and _status_code(error) in REQUEST_ERROR_STATUS_CODES
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Every endpoint that could serve the call has an open circuit breaker"""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker: opens after `PROVIDER_BREAKER_FAILURES` consecutive retryable failures,
+    then after `PROVIDER_BREAKER_COOLDOWN_SECONDS` lets a single probe call through (half-open);
+    the probe's outcome closes or re-opens it
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_started: Optional[float] = None
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= _breaker_cooldown():
+                self.state = "half_open"
+                self._probe_started = None
+            # A probe that never reported back (e.g. its request was cancelled) is replaced after a cooldown
+            if self.state == "half_open" and (self._probe_started is None or now - self._probe_started >= _breaker_cooldown()):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit breaker %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= _breaker_failures():
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning("Circuit breaker %s opened after %s failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_started = None
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened}
+
+
+class ProviderHealth:
+    """
+    Endpoint breakers and the API style pinned per OpenCode Go model, shared by the agent model
+    and every `opencode_go_completion` call (evaluator, summaries, hedges)
+    """
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._pins: dict[str, str] = {}
+        self._lock = Lock()
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint)
+            return self._breakers[endpoint]
+
+    def pinned_style(self, model: str) -> Optional[str]:
+        return self._pins.get(model)
+
+    def styles(self, model: str, api_style: str) -> Iterator[str]:
+        """
+        API styles to try for one call, best first. `auto` starts with the pinned style (or `openai` before
+        anything is pinned); styles whose breaker is open are skipped, and a half-open breaker is only
+        claimed when its style is actually about to be tried
+        """
+        if api_style == "auto":
+            first = self.pinned_style(model) or API_STYLES[0]
+            candidates = [first] + [style for style in API_STYLES if style != first]
+        else:
+            candidates = [api_style]
+        previous = None
+        for style in candidates:
+            if not self.breaker(f"opencode_go:{style}").allow():
+                continue
+            if previous is not None:
+                metrics.increment("provider_fallbacks_total", from_style=previous, to_style=style)
+            previous = style
+            yield style
+
+    def succeeded(self, model: str, style: str, api_style: str) -> None:
+        self.breaker(f"opencode_go:{style}").record_success()
+        if api_style == "auto" and self.pinned_style(model) != style:
+            logger.info("Pinned OpenCode Go API style model=%s style=%s", model, style)
+            self._pins[model] = style
+
+    def failed(self, model: str, style: str, api_style: str, error: BaseException) -> bool:
+        """Record a failed call; returns whether the call should move on to the next style"""
+        kind = classify_error(error)
+        metrics.increment("provider_errors_total", provider="opencode_go", api_style=style, kind=kind)
+        logger.warning("OpenCode Go call failed model=%s style=%s kind=%s error=%s", model, style, kind, error)
+        breaker = self.breaker(f"opencode_go:{style}")
+        if kind in RETRYABLE_KINDS:
+            breaker.record_failure()
+        else:
+            # The endpoint answered, so it is healthy even if this request or style was not
+            breaker.record_success()
+        if kind == "style" and self.pinned_style(model) == style:
+            logger.info("Unpinned OpenCode Go API style model=%s style=%s", model, style)
+            self._pins.pop(model, None)
+        return api_style == "auto" and kind in FAILOVER_KINDS
+
+    def exhausted(self, model: str, first_error: Optional[BaseException]) -> Exception:
+        """Error to raise when no style produced a response"""
+        if first_error is None:
+            return ProviderUnavailableError(f"OpenCode Go model '{model}' is unavailable: circuit breakers are open")
+        return RuntimeError(
+            f"OpenCode Go model '{model}' failed with every available API style. First error: {first_error}"
+        )
+
+    def status(self) -> dict:
+        with self._lock:
+            breakers = {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+        return {
+            "breakers": breakers,
+            "pinned_styles": dict(self._pins),
+        }
+
+
+provider_health = ProviderHealth()
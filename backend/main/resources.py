@@ -1,40 +1,403 @@
 import os
-from pypdf import PdfReader
 import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import wraps
+from threading import Lock, Thread
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.normpath(os.path.join(base_dir, "..", "data"))
+bundle_path = os.path.join(data_dir, "persona_bundle.json")
 
-# Read Resume PDF
-try:
-    resume_path = os.path.join(data_dir, "resume.pdf")
-    reader = PdfReader(resume_path)
-    resume = ""
-    for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            resume += text
-except FileNotFoundError:
-    resume = "Resume not available"
-
-# Read Linkedin PDF
-try:
-    linkedin_path = os.path.join(data_dir, "linkedin.pdf")
-    reader = PdfReader(linkedin_path)
-    linkedin = ""
+BUNDLE_FORMAT_VERSION = 2
+SOURCE_FILES = ("resume.pdf", "linkedin.pdf", "summary.txt", "style.txt", "facts.json")
+BUNDLE_FILE = os.path.basename(bundle_path)
+
+DEFAULT_RELOAD_INTERVAL_SECONDS = 60.0
+DEFAULT_S3_PREFIX = "persona/"
+
+
+def persona_source() -> str:
+    """`local` reads backend/data, `s3` reads PERSONA_S3_BUCKET/PERSONA_S3_PREFIX so the profile can change without a redeploy"""
+    source = os.getenv("PERSONA_SOURCE", "local").strip().lower()
+    if source not in {"local", "s3"}:
+        raise ValueError("PERSONA_SOURCE must be local or s3")
+    return source
+
+
+def _reload_interval() -> float:
+    return float(os.getenv("PERSONA_RELOAD_INTERVAL_SECONDS", DEFAULT_RELOAD_INTERVAL_SECONDS))
+
+
+@dataclass(frozen=True)
+class PersonaResources:
+    resume: str
+    linkedin: str
+    summary: str
+    style: str
+    facts: dict
+    content_hash: str
+
+
+def _file_sha256(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _source_hashes(source_dir: str) -> dict:
+    return {name: _file_sha256(os.path.join(source_dir, name)) for name in SOURCE_FILES}
+
+
+def _content_hash(resume, linkedin, summary, style, facts) -> str:
+    payload = json.dumps([resume, linkedin, summary, style, facts], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _read_pdf(path: str, missing_text: str) -> str:
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(path)
+    except FileNotFoundError:
+        return missing_text
+    text = ""
     for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            linkedin += text
-except FileNotFoundError:
-    linkedin = "linkedin profile not available"
+        page_text = page.extract_text()
+        if page_text:
+            text += page_text
+    return text
+
+
+def extract_resources(source_dir: str = data_dir) -> PersonaResources:
+    """Parse the persona documents directly (PDF text extraction included)"""
+    resume = _read_pdf(os.path.join(source_dir, "resume.pdf"), "Resume not available")
+    linkedin = _read_pdf(os.path.join(source_dir, "linkedin.pdf"), "linkedin profile not available")
+
+    with open(os.path.join(source_dir, "summary.txt"), "r", encoding="utf-8") as f:
+        summary = f.read()
+
+    with open(os.path.join(source_dir, "style.txt"), "r", encoding="utf-8") as f:
+        style = f.read()
+
+    with open(os.path.join(source_dir, "facts.json"), "r", encoding="utf-8") as f:
+        facts = json.load(f)
+
+    return PersonaResources(
+        resume=resume,
+        linkedin=linkedin,
+        summary=summary,
+        style=style,
+        facts=facts,
+        content_hash=_content_hash(resume, linkedin, summary, style, facts),
+    )
+
+
+def build_resource_bundle(source_dir: str = data_dir, output_path: str = bundle_path) -> PersonaResources:
+    """Extract all persona documents, and their retrieval chunks, into one JSON artifact so runtime never parses PDFs"""
+    from .retrieval import build_index
+
+    resources = extract_resources(source_dir)
+    bundle = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "source_hashes": _source_hashes(source_dir),
+        "resources": asdict(resources),
+        "retrieval_index": build_index(resources).to_dict(),
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False)
+    logger.info("Built persona bundle %s (content hash %s)", output_path, resources.content_hash)
+    return resources
+
+
+def _read_bundle(source_dir: str, path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            bundle = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning("Persona bundle %s is unreadable: %s", path, str(e))
+        return None
+
+    if bundle.get("format_version") != BUNDLE_FORMAT_VERSION:
+        logger.warning("Persona bundle %s has an unsupported format version", path)
+        return None
+    if bundle.get("source_hashes") != _source_hashes(source_dir):
+        logger.warning("Persona bundle %s is stale, source documents changed", path)
+        return None
+    return bundle
+
+
+class LocalSource:
+    """Persona documents in a directory; the version is a stat() of each file, so polling costs no reads"""
+
+    name = "local"
+
+    def __init__(self, source_dir: str = data_dir, bundle_file: str = bundle_path):
+        self.source_dir = source_dir
+        self.bundle_file = bundle_file
+
+    def version(self) -> str:
+        stamps = []
+        for path in [os.path.join(self.source_dir, name) for name in SOURCE_FILES] + [self.bundle_file]:
+            try:
+                stat = os.stat(path)
+                stamps.append(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}")
+            except FileNotFoundError:
+                stamps.append(f"{os.path.basename(path)}:-")
+        return hashlib.sha256("|".join(stamps).encode("utf-8")).hexdigest()[:16]
+
+    def load(self) -> tuple[PersonaResources, dict | None]:
+        """Resources and the prebuilt retrieval index from the bundle, falling back to parsing the sources"""
+        bundle = _read_bundle(self.source_dir, self.bundle_file)
+        if bundle:
+            return PersonaResources(**bundle["resources"]), bundle.get("retrieval_index")
+        logger.info("Parsing persona documents from %s", self.source_dir)
+        return extract_resources(self.source_dir), None
+
+
+class S3Source:
+    """
+    Persona documents under s3://bucket/prefix, published with `publish_resources`.
+    The version is one ListObjectsV2 call over the objects' ETags; a load downloads them to a
+    temporary directory (/tmp on Lambda) and reads them like a local source.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = DEFAULT_S3_PREFIX, client=None):
+        if client is None:
+            # boto3 is only imported when persona documents come from S3
+            import boto3
+
+            client = boto3.client("s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+
+    def _objects(self) -> dict[str, str]:
+        response = self.client.list_objects_v2(Bucket=self.bucket, Prefix=self.prefix)
+        objects = {obj["Key"][len(self.prefix):]: obj["ETag"] for obj in response.get("Contents", [])}
+        return {name: etag for name, etag in objects.items() if name in SOURCE_FILES or name == BUNDLE_FILE}
+
+    def version(self) -> str:
+        stamps = "|".join(f"{name}:{etag}" for name, etag in sorted(self._objects().items()))
+        return hashlib.sha256(stamps.encode("utf-8")).hexdigest()[:16]
+
+    def load(self) -> tuple[PersonaResources, dict | None]:
+        target = tempfile.mkdtemp(prefix="persona-")
+        try:
+            for name in self._objects():
+                self.client.download_file(self.bucket, f"{self.prefix}{name}", os.path.join(target, name))
+            return LocalSource(target, os.path.join(target, BUNDLE_FILE)).load()
+        finally:
+            shutil.rmtree(target, ignore_errors=True)
+
+
+def create_resource_source():
+    if persona_source() == "s3":
+        bucket = os.getenv("PERSONA_S3_BUCKET") or os.getenv("S3_BUCKET", "")
+        return S3Source(bucket, os.getenv("PERSONA_S3_PREFIX", DEFAULT_S3_PREFIX))
+    return LocalSource()
+
+
+def publish_resources(bucket: str, prefix: str = DEFAULT_S3_PREFIX, source_dir: str = data_dir, client=None) -> PersonaResources:
+    """Build the bundle for `source_dir` and upload it with the source documents for an S3 persona source"""
+    if client is None:
+        import boto3
+
+        client = boto3.client("s3")
+    output_path = os.path.join(source_dir, BUNDLE_FILE)
+    resources = build_resource_bundle(source_dir, output_path)
+    # The bundle goes last: it is only trusted once the sources it was built from are in place
+    for name in SOURCE_FILES + (BUNDLE_FILE,):
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path):
+            client.upload_file(path, bucket, f"{prefix}{name}")
+    logger.info("Published persona resources to s3://%s/%s (content hash %s)", bucket, prefix, resources.content_hash)
+    return resources
+
+
+@dataclass
+class ResourceSnapshot:
+    """One immutable version of the persona resources plus the artifacts derived from it so far"""
+    resources: PersonaResources
+    version: str
+    retrieval_index: dict | None = None
+    loaded_at: float = field(default_factory=time.time)
+    artifacts: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _Artifact:
+    build: Callable[[ResourceSnapshot], Any]
+    fields: tuple[str, ...]
+
+    def key(self, resources: PersonaResources) -> str:
+        if not self.fields:
+            return resources.content_hash
+        payload = json.dumps([getattr(resources, name) for name in self.fields], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_artifacts: dict[str, _Artifact] = {}
+
+
+def derived_artifact(*fields: str):
+    """
+    Register `build(snapshot)` as an artifact derived from the given resource fields (all of them when none are given).
+    The decorated function becomes an accessor for the current snapshot's value; it is built on first use and,
+    after a reload, rebuilt only when one of its fields changed.
+    """
+
+    def register(build):
+        name = f"{build.__module__}.{build.__qualname__}"
+        _artifacts[name] = _Artifact(build, fields)
+
+        @wraps(build)
+        def current(snapshot: ResourceSnapshot | None = None):
+            return resource_manager.artifact(name, snapshot)
+
+        return current
+
+    return register
+
+
+class ResourceManager:
+    """
+    Current persona resources and the artifacts derived from them (prompt strings, retrieval index, caches).
+    Requests read an immutable snapshot. At most every PERSONA_RELOAD_INTERVAL_SECONDS a request kicks off a
+    background version check; a changed source is loaded and its artifacts rebuilt off the request path, then
+    swapped in with a single reference assignment, so in-flight requests keep the snapshot they started with.
+    """
+
+    def __init__(self, source=None):
+        self._source = source
+        self._snapshot: ResourceSnapshot | None = None
+        self._load_lock = Lock()
+        self._reload_lock = Lock()
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.reload_failures = 0
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = create_resource_source()
+        return self._source
+
+    def snapshot(self) -> ResourceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    version = self.source.version()
+                    resources, retrieval_index = self.source.load()
+                    self._snapshot = ResourceSnapshot(resources, version, retrieval_index)
+                    self._checked_at = time.monotonic()
+                return self._snapshot
+        self._schedule_reload()
+        return snapshot
+
+    def resources(self) -> PersonaResources:
+        return self.snapshot().resources
+
+    def artifact(self, name: str, snapshot: ResourceSnapshot | None = None):
+        snapshot = snapshot or self.snapshot()
+        entry = snapshot.artifacts.get(name)
+        if entry is None:
+            artifact = _artifacts[name]
+            # Concurrent first uses may both build; the first one stored wins
+            entry = snapshot.artifacts.setdefault(name, (artifact.key(snapshot.resources), artifact.build(snapshot)))
+        return entry[1]
+
+    def _schedule_reload(self) -> None:
+        interval = _reload_interval()
+        if interval <= 0 or time.monotonic() - self._checked_at < interval:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        self._checked_at = time.monotonic()
+        Thread(target=self._reload_in_background, name="persona-reload", daemon=True).start()
+
+    def _reload_in_background(self) -> None:
+        try:
+            self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def refresh(self) -> bool:
+        """Check the source now; returns whether a new snapshot was swapped in"""
+        self.snapshot()
+        with self._reload_lock:
+            self._checked_at = time.monotonic()
+            return self._reload()
+
+    def _reload(self) -> bool:
+        current = self._snapshot
+        try:
+            version = self.source.version()
+            if version == current.version:
+                return False
+            resources, retrieval_index = self.source.load()
+            snapshot = ResourceSnapshot(resources, version, retrieval_index)
+            rebuilt = []
+            for name, (key, value) in list(current.artifacts.items()):
+                artifact = _artifacts[name]
+                new_key = artifact.key(resources)
+                if new_key != key:
+                    value = artifact.build(snapshot)
+                    rebuilt.append(name)
+                snapshot.artifacts.setdefault(name, (new_key, value))
+        except Exception as e:
+            # Keep serving the current snapshot; the next poll retries
+            self.reload_failures += 1
+            logger.error("Reloading persona resources from %s failed: %s", self.source.name, str(e))
+            return False
+
+        self._snapshot = snapshot
+        self.reloads += 1
+        logger.info(
+            "Reloaded persona resources version %s (content hash %s), rebuilt %s",
+            version, resources.content_hash[:16], ", ".join(rebuilt) or "nothing",
+        )
+        return True
+
+    def status(self) -> dict:
+        snapshot = self.snapshot()
+        return {
+            "source": self.source.name,
+            "version": snapshot.version,
+            "content_hash": snapshot.resources.content_hash[:16],
+            "loaded_at": datetime.fromtimestamp(snapshot.loaded_at).isoformat(),
+            "reload_interval_seconds": _reload_interval(),
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+        }
+
+
+resource_manager = ResourceManager()
+
 
-# Read other data files
-with open(os.path.join(data_dir, "summary.txt"), "r", encoding="utf-8") as f:
-    summary = f.read()
+def load_resources() -> PersonaResources:
+    """Persona documents of the current snapshot"""
+    return resource_manager.resources()
 
-with open(os.path.join(data_dir, "style.txt"), "r", encoding="utf-8") as f:
-    style = f.read()
 
-with open(os.path.join(data_dir, "facts.json"), "r", encoding="utf-8") as f:
-    facts = json.load(f)
\ No newline at end of file
+def __getattr__(name: str):
+    # Current snapshot on access, e.g. `resources.resume`; `from .resources import resume` pins one version
+    if name in {"resume", "linkedin", "summary", "style", "facts"}:
+        return getattr(load_resources(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
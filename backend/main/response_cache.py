@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Optional
+
+from .prescreen import EMAIL_PATTERN, URL_PATTERN
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 21600.0
+DEFAULT_SIMILARITY = 0.8
+# Fewer content words than this is too little signal for a similarity match
+MIN_SIMILARITY_TOKENS = 2
+
+STOPWORDS = frozenset({
+    "a", "about", "am", "an", "and", "any", "are", "can", "could", "do", "does", "for", "give",
+    "hello", "hey", "hi", "i", "is", "it", "me", "my", "of", "on", "or", "please", "so", "tell",
+    "the", "there", "to", "u", "what", "whats", "would", "you", "your", "youre",
+})
+
+
+def response_cache_enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE_ENABLED", "false").strip().lower() == "true"
+
+
+def _max_entries() -> int:
+    return int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+
+def _similarity_threshold() -> float:
+    return float(os.getenv("RESPONSE_CACHE_SIMILARITY", DEFAULT_SIMILARITY))
+
+
+def normalize_question(text: str) -> str:
+    text = text.lower().replace("'", "").replace("’", "")
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text)).strip()
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ies", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def content_tokens(normalized: str) -> frozenset:
+    return frozenset(_stem(word) for word in normalized.split() if word not in STOPWORDS)
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class CachedResponse:
+    question: str
+    response: str
+    tokens: frozenset
+    prompt_hash: str
+    model: str
+    stored_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ResponseCacheStats:
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    evictions: int = 0
+
+    def snapshot(self) -> dict:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        hits = self.exact_hits + self.similar_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evictions": self.evictions,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+        }
+
+
+class ResponseCache:
+    """
+    In-process cache of approved answers to context-free (first-turn) visitor questions.
+    Looks up a normalized exact match first, then the most similar cached question by
+    content-word overlap (CPU only). Entries are tied to the persona prompt hash and model,
+    so changing either invalidates them, and are evicted by TTL and LRU.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.stats = ResponseCacheStats()
+
+    @staticmethod
+    def cacheable_question(message: str, history: list) -> bool:
+        # Only questions without prior context, and never ones carrying contact details or links
+        return not history and not EMAIL_PATTERN.search(message) and not URL_PATTERN.search(message)
+
+    def _is_live(self, entry: CachedResponse, prompt_hash: str, model: str) -> bool:
+        return (
+            entry.prompt_hash == prompt_hash
+            and entry.model == model
+            and time.monotonic() - entry.stored_at < _ttl_seconds()
+        )
+
+    def _find(self, normalized: str, prompt_hash: str, model: str) -> tuple[Optional[CachedResponse], str]:
+        entry = self._entries.get(normalized)
+        if entry is not None:
+            if self._is_live(entry, prompt_hash, model):
+                self._entries.move_to_end(normalized)
+                return entry, "exact"
+            del self._entries[normalized]
+
+        tokens = content_tokens(normalized)
+        if len(tokens) < MIN_SIMILARITY_TOKENS:
+            return None, ""
+        best_key, best_score = None, 0.0
+        for key, candidate in self._entries.items():
+            score = _similarity(tokens, candidate.tokens)
+            if score > best_score and self._is_live(candidate, prompt_hash, model):
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= _similarity_threshold():
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key], "similar"
+        return None, ""
+
+    def lookup(self, message: str, history: list, prompt_hash: str, model: str) -> Optional[str]:
+        if not response_cache_enabled() or not self.cacheable_question(message, history):
+            return None
+        normalized = normalize_question(message)
+        with self._lock:
+            entry, match = self._find(normalized, prompt_hash, model)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if match == "exact":
+                self.stats.exact_hits += 1
+            else:
+                self.stats.similar_hits += 1
+        logger.info("Response cache %s hit for %r (cached question %r)", match, normalized, entry.question)
+        return entry.response
+
+    def store(self, message: str, history: list, response: str, prompt_hash: str, model: str) -> None:
+        """Cache an answer; callers only pass replies the evaluator approved and that needed no tool call"""
+        if not response_cache_enabled() or not self.cacheable_question(message, history):
+            return
+        normalized = normalize_question(message)
+        if not normalized:
+            return
+        with self._lock:
+            self._entries[normalized] = CachedResponse(
+                question=normalized,
+                response=response,
+                tokens=content_tokens(normalized),
+                prompt_hash=prompt_hash,
+                model=model,
+            )
+            self._entries.move_to_end(normalized)
+            self.stats.stored += 1
+            while len(self._entries) > _max_entries():
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"enabled": response_cache_enabled(), "entries": len(self._entries), **self.stats.snapshot()}
+
+
+response_cache = ResponseCache()
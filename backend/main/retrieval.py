@@ -0,0 +1,198 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from .resources import derived_artifact
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_TOP_K = 6
+CHUNK_CHARS = 600
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Persona documents that are chunked and retrieved; facts and style stay in the static prompt
+RETRIEVED_SOURCES = ("summary", "resume", "linkedin")
+
+STOPWORDS = frozenset({
+    "a", "about", "all", "am", "an", "and", "any", "are", "as", "at", "be", "by", "can", "could",
+    "did", "do", "does", "for", "from", "had", "has", "have", "how", "i", "in", "is", "it", "its",
+    "me", "my", "of", "on", "or", "our", "so", "that", "the", "their", "them", "there", "this",
+    "to", "was", "we", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+    "would", "you", "your",
+})
+
+# Visitor wording that rarely appears verbatim in a resume, expanded to the terms the documents use
+QUERY_EXPANSIONS = {
+    "stack": ("skill", "technology", "framework", "language"),
+    "tech": ("skill", "technology"),
+    "study": ("education", "college", "university", "degree", "btech"),
+    "studied": ("education", "college", "university", "degree", "btech"),
+    "school": ("education", "school", "college"),
+    "job": ("experience", "role", "sde"),
+    "work": ("experience", "role", "company"),
+    "worked": ("experience", "role", "company"),
+    "contact": ("email", "linkedin", "github", "website"),
+    "project": ("project", "built", "launched"),
+    "certification": ("certification", "certified"),
+}
+
+
+def retrieval_enabled() -> bool:
+    """`true` sends only the top-k relevant persona chunks with each turn instead of the full documents"""
+    return os.getenv("PERSONA_RETRIEVAL_ENABLED", "false").strip().lower() == "true"
+
+
+def _top_k() -> int:
+    return int(os.getenv("PERSONA_RETRIEVAL_TOP_K", DEFAULT_TOP_K))
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ies", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(word) for word in re.findall(r"[a-z0-9][a-z0-9+#.]*", text.lower()) if word not in STOPWORDS]
+
+
+def _pieces(source: str, text: str) -> list[str]:
+    if source == "summary":
+        # Hand-written notes: paragraphs are the natural unit
+        return [re.sub(r"\s+", " ", paragraph).strip() for paragraph in re.split(r"\n\s*\n", text)]
+    # PDF text extraction breaks lines arbitrarily, so split on bullets and sentences instead
+    flat = re.sub(r"\s+", " ", text)
+    return [piece.strip() for piece in re.split(r"\s*●\s*|(?<=[.!?])\s+(?=[A-Z])", flat)]
+
+
+def _split_long(piece: str, max_chars: int) -> list[str]:
+    parts, current = [], ""
+    for word in piece.split(" "):
+        if current and len(current) + len(word) + 1 > max_chars:
+            parts.append(current)
+            current = ""
+        current = f"{current} {word}".strip()
+    return parts + [current] if current else parts
+
+
+def chunk_text(source: str, text: str, max_chars: int = CHUNK_CHARS) -> list[str]:
+    chunks: list[str] = []
+    current = ""
+    pieces = [part for piece in _pieces(source, text) for part in _split_long(piece, max_chars)]
+    for piece in pieces:
+        if not piece:
+            continue
+        if current and len(current) + len(piece) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {piece}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class Chunk:
+    source: str
+    text: str
+
+
+class BM25Index:
+    """Okapi BM25 over persona chunks; small enough to build in milliseconds and ship inside the bundle"""
+
+    def __init__(self, chunks: list[Chunk], content_hash: str):
+        self.chunks = chunks
+        self.content_hash = content_hash
+        self._term_freqs = [Counter(tokenize(chunk.text)) for chunk in chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freqs = Counter(term for freqs in self._term_freqs for term in freqs)
+        total = len(chunks)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5)) for term, freq in doc_freqs.items()
+        }
+
+    def search(self, query: str, k: int) -> list[tuple[Chunk, float]]:
+        words = query.lower().split()
+        expanded = " ".join(term for word in words for term in QUERY_EXPANSIONS.get(word.strip("?.!,"), ()))
+        terms = set(tokenize(f"{query} {expanded}"))
+        scored = []
+        for chunk, freqs, length in zip(self.chunks, self._term_freqs, self._lengths):
+            score = 0.0
+            for term in terms:
+                freq = freqs.get(term)
+                if not freq:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self._avg_length or 1))
+                score += self._idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            if score > 0:
+                scored.append((chunk, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def to_dict(self) -> dict:
+        return {
+            "format_version": INDEX_FORMAT_VERSION,
+            "content_hash": self.content_hash,
+            "chunks": [asdict(chunk) for chunk in self.chunks],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        return cls([Chunk(**chunk) for chunk in data["chunks"]], data["content_hash"])
+
+
+def build_index(resources) -> BM25Index:
+    """Chunk the retrieved persona documents of a `PersonaResources`"""
+    chunks = [
+        Chunk(source=source, text=text)
+        for source in RETRIEVED_SOURCES
+        for text in chunk_text(source, getattr(resources, source))
+    ]
+    return BM25Index(chunks, resources.content_hash)
+
+
+@derived_artifact(*RETRIEVED_SOURCES)
+def persona_index(snapshot) -> BM25Index:
+    """Index from the precompiled bundle when it matches the loaded resources, otherwise built now"""
+    resources = snapshot.resources
+    data = snapshot.retrieval_index
+    if data and data.get("format_version") == INDEX_FORMAT_VERSION and data.get("content_hash") == resources.content_hash:
+        return BM25Index.from_dict(data)
+    logger.info("Building persona retrieval index")
+    return build_index(resources)
+
+
+def relevant_context(query: str, k: Optional[int] = None) -> str:
+    """Top-k persona chunks for `query`, formatted for a prompt; empty when retrieval is disabled"""
+    if not retrieval_enabled():
+        return ""
+    index = persona_index()
+    results = index.search(query, k or _top_k())
+    if not results:
+        # Nothing matched lexically; the opening of the summary notes is the best general overview
+        results = [(chunk, 0.0) for chunk in index.chunks if chunk.source == "summary"][:1]
+    if not results:
+        return ""
+    excerpts = "\n\n".join(f"[{chunk.source}] {chunk.text}" for chunk, _ in results)
+    return f"## Relevant excerpts from the profile documents\n{excerpts}"
+
+
+def reference_material(history: list, message: str) -> Optional[dict]:
+    """
+    User item with the persona excerpts for `message`, sent right after it (by the agent and by reruns);
+    None when retrieval is disabled. The query includes the previous question so follow-ups keep their topic
+    """
+    if not retrieval_enabled():
+        return None
+    previous_question = next((item["content"] for item in reversed(history) if item["role"] == "user"), "")
+    excerpts = relevant_context(f"{previous_question}\n{message}") or "No relevant excerpts found."
+    return {"role": "user", "content": f"(Reference material for answering the message above, not written by the user)\n{excerpts}"}
@@ -1,30 +1,50 @@
 from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 import logging
-from dotenv import load_dotenv
 from typing import Optional
+from contextlib import asynccontextmanager
 import json
 import uuid
 from datetime import datetime
-from agents import Runner
+from agents import RunHooks, Runner
+from openai.types.responses import ResponseTextDeltaEvent
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 from .chat_agents import chat_agent
 from .context import ChatPrompt
-from .conversation import load_conversation, save_conversation
-from .evaluation import ChatEvaluation
-from .model_client import active_chat_model_name
-
-# Load environment variables
-load_dotenv(override=True)
+from .context_window import build_context_window, conversation_messages, schedule_summary, wait_for_summary
+from .conversation import SessionLog, conversation_store
+from .clients import client_registry
+from .evaluation import ChatEvaluation, Evaluation
+from .hedging import Candidate, HedgedResponder, hedging_enabled
+from .metrics import metrics, metrics_endpoint_enabled, request_trace, span
+from .model_client import active_chat_model_name, model_router, prompt_cache_stats, record_prompt_cache_usage
+from .outbox import email_outbox
+from .prescreen import evaluation_mode, reply_prescreen
+from .provider_health import provider_health
+from .resources import resource_manager
+from .response_cache import response_cache
+from .retrieval import reference_material
 
 model_name = active_chat_model_name()
-app = FastAPI()
-USE_S3 = os.getenv("USE_S3", "false").lower() == "true"
+chat_evaluation = ChatEvaluation()
+hedged_responder = HedgedResponder(chat_evaluation)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Email delivery runs in the background so agent turns never wait on Mailjet
+    await email_outbox.start()
+    yield
+    await email_outbox.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Chat endpoint API key enforcement settings
 CHAT_ENDPOINT_API_KEY = os.getenv("CHAT_ENDPOINT_API_KEY")
@@ -52,11 +72,34 @@ class ChatResponse(BaseModel):
 
 @app.get("/")
 async def root():
+    return {"message": "AI Digital Twin API", "status": "ok"}
+
+
+def _require_internal_endpoint():
+    # Internal state is served only where METRICS_ENDPOINT_ENABLED allows it (off by default on Lambda, where the API is public)
+    if not metrics_endpoint_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/status")
+async def status():
+    """Storage, model, persona, cache, hedging, connection pool, provider health and router state"""
+    _require_internal_endpoint()
     return {
-        "message": "AI Digital Twin API",
         "memory_enabled": True,
-        "storage": "S3" if USE_S3 else "local",
+        "storage": conversation_store.backend_name,
         "ai_model": model_name,
+        "persona_prompt_hash": ChatPrompt.prompt_hash(),
+        "persona": resource_manager.status(),
+        "evaluation_mode": evaluation_mode(),
+        "prescreen": reply_prescreen.stats.snapshot(),
+        "conversation_cache": conversation_store.snapshot(),
+        "response_cache": response_cache.snapshot(),
+        "hedging": hedged_responder.stats.snapshot(),
+        "connections": client_registry.connection_stats(),
+        "provider_health": provider_health.status(),
+        "model_router": model_router.status(),
+        "prompt_cache": {label: stats.snapshot() for label, stats in prompt_cache_stats.items()},
     }
 
 
@@ -70,76 +113,180 @@ async def health_check():
     }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, x_api_key: str = Header(None, alias="x-api-key")):
+def _authorize_chat_request(x_api_key: Optional[str]):
+    # Validate API key if enforcement is enabled
+    if CHECK_CHAT_API_KEY:
+        if x_api_key is None or x_api_key != CHAT_ENDPOINT_API_KEY:
+            logger.warning("Unauthorized chat request: invalid API key")
+            raise HTTPException(status_code=401, detail="Invalid API key for chat endpoint")
+
+
+def _build_agent_input(conversation: list, message: str) -> list:
+    # Role-tagged items rather than one serialized string, so each turn's input extends the
+    # previous turn's and providers can reuse the cached prefix
+    items = [{"role": item["role"], "content": item["content"]} for item in conversation]
+    items.append({"role": "user", "content": message})
+    # Retrieved persona excerpts are not saved with the turn, so they trail the new message, after the
+    # cache breakpoint (see `agent_cache_control_args`): everything up to the message is the next turn's
+    # cached prefix. The slot is always present so the breakpoint position does not depend on a match
+    reference = reference_material(conversation, message)
+    if reference is not None:
+        items.append(reference)
+    return items
+
+
+def _tool_call_names(agent_result) -> list:
+    return [
+        getattr(item.raw_item, "name", None)
+        for item in agent_result.new_items
+        if item.type == "tool_call_item"
+    ]
+
+
+def _final_output_text(final_output) -> str:
+    if isinstance(final_output, dict):
+        return json.dumps(final_output, ensure_ascii=False)
+    if not isinstance(final_output, str):
+        return str(final_output)
+    return final_output
+
+
+async def _run_agent(agent_input: list, hooks: Optional[RunHooks] = None) -> tuple[str, list]:
+    with span("agent"):
+        agent_result = await Runner.run(chat_agent, input=agent_input, hooks=hooks)
+    record_prompt_cache_usage("agent", model_name, agent_result.context_wrapper.usage)
+    return _final_output_text(agent_result.final_output), _tool_call_names(agent_result)
+
+
+async def _evaluate_response(
+    evaluate_response: ChatEvaluation,
+    assistant_response: str,
+    message: str,
+    conversation: list,
+    agent_input: list,
+    session_id: str,
+    tool_calls: list,
+) -> tuple[Optional[str], Evaluation]:
+    """Evaluate the agent reply; returns a corrected reply if the evaluator rejected it (otherwise None) and the verdict"""
     try:
-        # Validate API key if enforcement is enabled
-        if CHECK_CHAT_API_KEY:
-            if x_api_key is None or x_api_key != CHAT_ENDPOINT_API_KEY:
-                logger.warning("Unauthorized chat request: invalid API key")
-                raise HTTPException(status_code=401, detail="Invalid API key for chat endpoint")
+        evaluation = await evaluate_response.evaluate(assistant_response, message, conversation, tool_calls)
+    except Exception as e:
+        logger.error("Evaluation failed for session_id=%s: %s", session_id, str(e))
+        raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
 
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
+    if evaluation.is_acceptable:
+        return None, evaluation
 
-        # Load conversation history
-        conversation = load_conversation(session_id)
+    logger.info("Evaluation rejected for session_id=%s, feedback=%s", session_id, evaluation.feedback)
+    try:
+        if hedging_enabled():
+            rejected = Candidate("primary", assistant_response, tool_calls, evaluation)
+            corrected = await hedged_responder.correct(rejected, message, conversation, agent_input, session_id)
+            return corrected.reply, evaluation
+        corrected_reply = await evaluate_response.rerun(
+            ChatPrompt.prompt(), assistant_response, message, conversation, evaluation.feedback
+        )
+        return corrected_reply, evaluation
+    except Exception as e:
+        logger.error("Evaluation rerun failed for session_id=%s: %s", session_id, str(e))
+        raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
 
-        evaluate_response = ChatEvaluation()
 
-        history_text = json.dumps(conversation, ensure_ascii=False)
-        input_parts = [
-            "Here is the prior conversation as a JSON array of messages:",
-            history_text,
-            "Each message has 'role' and 'content' fields.",
-            "Here is the user's latest message:",
-            request.message,
-            "Respond to the user's latest message as the digital twin, using your tools when appropriate.",
-        ]
-        agent_input = "\n\n".join(input_parts)
+async def _save_turn(
+    session_id: str, session: SessionLog, message: str, assistant_response: str, approved: bool = True,
+) -> SessionLog:
+    turn = [
+        {"role": "user", "content": message, "timestamp": datetime.now().isoformat()},
+        {
+            "role": "assistant",
+            "content": assistant_response,
+            "timestamp": datetime.now().isoformat(),
+        },
+    ]
+    if not approved:
+        # Served past the hedging SLO without passing the evaluator; kept out of the prompt by strip_metadata
+        turn[1]["approved"] = False
 
-        try:
-            agent_result = await Runner.run(
-                chat_agent,
-                input=agent_input,
-            )
-        except Exception as e:
-            logger.error("Agent runner failed for session_id=%s: %s", session_id, str(e))
-            raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
+    # Append the turn to the session log
+    with span("save_conversation"):
+        return await conversation_store.append(session_id, session, turn)
 
-        assistant_response = agent_result.final_output
-        if isinstance(assistant_response, dict):
-            assistant_response = json.dumps(assistant_response, ensure_ascii=False)
-        elif not isinstance(assistant_response, str):
-            assistant_response = str(assistant_response)
 
-        try:
-            evaluation = evaluate_response.evaluate(assistant_response, request.message, conversation)
-        except Exception as e:
-            logger.error("Evaluation failed for session_id=%s: %s", session_id, str(e))
-            raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
+def _cache_approved_response(
+    message: str, conversation: list, assistant_response: str, tool_calls: list, evaluation: Evaluation,
+):
+    # Only replies an LLM evaluator accepted are reused; the pre-screen's heuristics are not enough
+    # to serve a reply to other visitors. Replies that ran a tool depend on the visitor's request details
+    if evaluation.approved_by_model and not tool_calls:
+        response_cache.store(message, conversation, assistant_response, ChatPrompt.prompt_hash(), model_name)
 
-        if not evaluation.is_acceptable:
-            logger.info("Evaluation rejected for session_id=%s, feedback=%s", session_id, evaluation.feedback)
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, x_api_key: str = Header(None, alias="x-api-key")):
+    with request_trace("/chat"):
+        return await _chat(request, x_api_key)
+
+
+async def _chat(request: ChatRequest, x_api_key: Optional[str]) -> ChatResponse:
+    try:
+        _authorize_chat_request(x_api_key)
+
+        # Generate session ID if not provided
+        session_id = request.session_id or str(uuid.uuid4())
+
+        # Load conversation history, with the summary from the previous turn if it is ready in time
+        await wait_for_summary(session_id)
+        with span("load_conversation"):
+            session = await conversation_store.load(session_id)
+        # Rolling summary plus the newest turns, within the model's history token budget
+        conversation = build_context_window(session.messages, model_name).as_history()
+
+        cached_response = response_cache.lookup(request.message, conversation, ChatPrompt.prompt_hash(), model_name)
+        if cached_response is not None:
+            await _save_turn(session_id, session, request.message, cached_response)
+            return ChatResponse(response=cached_response, session_id=session_id)
+
+        agent_input = _build_agent_input(conversation, request.message)
+        approved = True
+        if hedging_enabled():
+            # Agent, evaluator, rerun and a hedge on the other provider race within the latency SLO
             try:
-                assistant_response = evaluate_response.rerun(ChatPrompt.prompt(), assistant_response, request.message, conversation, evaluation.feedback)
+                candidate = await hedged_responder.respond(
+                    request.message, conversation, agent_input, lambda hooks: _run_agent(agent_input, hooks), session_id,
+                )
             except Exception as e:
-                logger.error("Evaluation rerun failed for session_id=%s: %s", session_id, str(e))
+                logger.error("Hedged turn failed for session_id=%s: %s", session_id, str(e))
+                raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
+            assistant_response = candidate.reply
+            approved = candidate.accepted
+            if approved:
+                _cache_approved_response(
+                    request.message, conversation, assistant_response, candidate.tool_calls, candidate.evaluation,
+                )
+            else:
+                logger.info("Serving unapproved %s reply for session_id=%s", candidate.path, session_id)
+        else:
+            try:
+                assistant_response, tool_calls = await _run_agent(agent_input)
+            except Exception as e:
+                logger.error("Agent runner failed for session_id=%s: %s", session_id, str(e))
                 raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
 
-        conversation.append(
-            {"role": "user", "content": request.message, "timestamp": datetime.now().isoformat()}
-        )
-        conversation.append(
-            {
-                "role": "assistant",
-                "content": assistant_response,
-                "timestamp": datetime.now().isoformat(),
-            }
-        )
+            corrected_response, evaluation = await _evaluate_response(
+                chat_evaluation, assistant_response, request.message, conversation, agent_input, session_id, tool_calls,
+            )
+            if corrected_response is not None:
+                assistant_response = corrected_response
+            else:
+                _cache_approved_response(request.message, conversation, assistant_response, tool_calls, evaluation)
 
-        # Save conversation
-        save_conversation(session_id, conversation)
+        session = await _save_turn(session_id, session, request.message, assistant_response, approved)
+        # Older turns are folded into the rolling summary outside this request
+        schedule_summary(session_id, session)
 
         return ChatResponse(response=assistant_response, session_id=session_id)
 
@@ -150,12 +297,95 @@ async def chat(request: ChatRequest, x_api_key: str = Header(None, alias="x-api-
         raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_api_key: str = Header(None, alias="x-api-key")):
+    """
+    Stream the agent reply as server-sent events.
+    Emits `session`, then `token` events as text is generated, an optional `replace` event
+    when the evaluator rejects the streamed reply, and finally `done` (or `error`).
+    With hedging enabled only the correction of a rejected reply is hedged; slow or failed agent
+    runs are not, since their tokens are already on the wire.
+    """
+    _authorize_chat_request(x_api_key)
+
+    session_id = request.session_id or str(uuid.uuid4())
+
+    try:
+        await wait_for_summary(session_id)
+        with span("load_conversation"):
+            session = await conversation_store.load(session_id)
+        # Rolling summary plus the newest turns, within the model's history token budget
+        conversation = build_context_window(session.messages, model_name).as_history()
+    except Exception as e:
+        logger.error("Failed to load conversation for session_id=%s: %s", session_id, str(e))
+        raise HTTPException(status_code=500, detail="Something went wrong while processing your request")
+
+    async def event_stream():
+        with request_trace("/chat/stream"):
+            async for event in events():
+                yield event
+
+    async def events():
+        yield _sse_event("session", {"session_id": session_id})
+
+        try:
+            cached_response = response_cache.lookup(request.message, conversation, ChatPrompt.prompt_hash(), model_name)
+            if cached_response is not None:
+                yield _sse_event("token", {"delta": cached_response})
+                await _save_turn(session_id, session, request.message, cached_response)
+                yield _sse_event("done", {"response": cached_response, "session_id": session_id})
+                return
+
+            agent_input = _build_agent_input(conversation, request.message)
+            with span("agent"):
+                agent_result = Runner.run_streamed(chat_agent, input=agent_input)
+                async for event in agent_result.stream_events():
+                    if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                        yield _sse_event("token", {"delta": event.data.delta})
+
+            record_prompt_cache_usage("agent", model_name, agent_result.context_wrapper.usage)
+            assistant_response = _final_output_text(agent_result.final_output)
+            tool_calls = _tool_call_names(agent_result)
+
+            corrected_response, evaluation = await _evaluate_response(
+                chat_evaluation, assistant_response, request.message, conversation, agent_input, session_id, tool_calls,
+            )
+            if corrected_response is not None:
+                assistant_response = corrected_response
+                yield _sse_event("replace", {"response": assistant_response})
+            else:
+                _cache_approved_response(request.message, conversation, assistant_response, tool_calls, evaluation)
+
+            saved_session = await _save_turn(session_id, session, request.message, assistant_response)
+
+            yield _sse_event("done", {"response": assistant_response, "session_id": session_id})
+            # Older turns are folded into the rolling summary outside this request, after the stream has ended
+            schedule_summary(session_id, saved_session)
+        except Exception as e:
+            if not isinstance(e, HTTPException):
+                logger.error("Streaming chat failed for session_id=%s: %s", session_id, str(e))
+            yield _sse_event("error", {"detail": "Something went wrong while processing your request"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latencies, token usage and cost, evaluator and provider counters in Prometheus text format"""
+    _require_internal_endpoint()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/conversation/{session_id}")
 async def get_conversation(session_id: str):
     """Retrieve conversation history"""
     try:
-        conversation = load_conversation(session_id)
-        return {"session_id": session_id, "messages": conversation}
+        session = await conversation_store.load(session_id)
+        return {"session_id": session_id, "messages": conversation_messages(session.messages)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
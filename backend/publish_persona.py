@@ -0,0 +1,19 @@
+import os
+
+from main.resources import DEFAULT_S3_PREFIX, publish_resources
+
+
+def main():
+    """Upload backend/data to the S3 persona source; running Lambdas pick it up on their next reload poll"""
+    bucket = os.getenv("PERSONA_S3_BUCKET") or os.getenv("S3_BUCKET")
+    if not bucket:
+        raise SystemExit("Set PERSONA_S3_BUCKET (or S3_BUCKET) to the memory bucket")
+    prefix = os.getenv("PERSONA_S3_PREFIX", DEFAULT_S3_PREFIX)
+
+    print(f"Publishing persona documents to s3://{bucket}/{prefix}...")
+    resources = publish_resources(bucket, prefix)
+    print(f"✓ Published persona content hash {resources.content_hash[:16]}")
+
+
+if __name__ == "__main__":
+    main()
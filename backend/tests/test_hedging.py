@@ -0,0 +1,111 @@
+import os
+import sys
+import types
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault("OPENCODE_GO_API_KEY", "test")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("MEMORY_DIR", tempfile.mkdtemp())
+
+from backend.main import hedging, server  # noqa: E402
+from backend.main.evaluation import Evaluation  # noqa: E402
+from backend.main.hedging import HedgedResponder  # noqa: E402
+
+PRIMARY_REPLY = "primary reply"
+HEDGE_REPLY = "hedge reply"
+
+
+class FakeEvaluator:
+    """Rejects the hedge reply at once and accepts everything else after `delay` seconds"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def evaluate(self, reply, message, conversation, tool_calls):
+        if reply == HEDGE_REPLY:
+            return Evaluation(is_acceptable=False, feedback="off persona")
+        await asyncio.sleep(self.delay)
+        return Evaluation(is_acceptable=True, feedback="fine")
+
+    async def rerun(self, system_prompt, reply, message, conversation, feedback):
+        return "rerun reply"
+
+
+async def _hedge_completion(provider, messages, model):
+    message = types.SimpleNamespace(content=HEDGE_REPLY)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+def _slow_primary(delay: float):
+    async def run_primary(hooks):
+        await asyncio.sleep(delay)
+        return PRIMARY_REPLY, []
+    return run_primary
+
+
+async def _failing_primary(hooks):
+    await asyncio.sleep(0.05)
+    raise RuntimeError("provider down")
+
+
+class DeadlineWithRejectedHedgeTest(unittest.IsolatedAsyncioTestCase):
+    """The hedge is rejected before the SLO while the agent is still running"""
+
+    def setUp(self):
+        patches = [
+            mock.patch.dict(os.environ, {"HEDGE_DELAY_SECONDS": "0.01", "HEDGE_LATENCY_SLO_SECONDS": "0.1"}),
+            mock.patch.object(hedging, "hedge_provider", return_value="openrouter"),
+            mock.patch.object(hedging, "provider_completion", _hedge_completion),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def _respond(self, responder, run_primary):
+        return await responder.respond("what do you do", [], [{"role": "user", "content": "what do you do"}], run_primary, "test")
+
+    async def test_rejected_hedge_is_not_returned_while_agent_runs(self):
+        responder = HedgedResponder(FakeEvaluator(delay=1.0))
+        candidate = await self._respond(responder, _slow_primary(0.3))
+
+        # The primary reply arrives past the SLO and is returned before its evaluation finishes
+        self.assertEqual(candidate.path, "primary")
+        self.assertEqual(candidate.reply, PRIMARY_REPLY)
+        self.assertFalse(candidate.accepted)
+        self.assertEqual(responder.stats.slo_exceeded, 1)
+
+    async def test_rejected_hedge_is_unapproved_when_nothing_else_is_left(self):
+        responder = HedgedResponder(FakeEvaluator())
+        candidate = await self._respond(responder, _failing_primary)
+
+        self.assertEqual(candidate.path, "hedge")
+        self.assertFalse(candidate.accepted)
+
+
+class ChatUnapprovedReplyTest(unittest.TestCase):
+    """`/chat` neither caches nor saves an unapproved hedged reply as an approved turn"""
+
+    def test_unapproved_reply_is_flagged_and_not_cached(self):
+        from fastapi.testclient import TestClient
+
+        rejected = hedging.Candidate("hedge", HEDGE_REPLY, [], Evaluation(is_acceptable=False, feedback="off persona"))
+        with (
+            mock.patch.dict(os.environ, {"HEDGING_ENABLED": "true"}),
+            mock.patch.object(server.hedged_responder, "respond", mock.AsyncMock(return_value=rejected)),
+            mock.patch.object(server.response_cache, "store") as store,
+        ):
+            body = TestClient(server.app).post("/chat", json={"message": "what do you do"}).json()
+
+        self.assertEqual(body["response"], HEDGE_REPLY)
+        store.assert_not_called()
+        session = asyncio.run(server.conversation_store.load(body["session_id"]))
+        self.assertIs(session.messages[-1]["approved"], False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -68,12 +68,28 @@ export default function Twin() {
         setInput('');
         setIsLoading(true);
 
+        const assistantId = (Date.now() + 1).toString();
+        const updateAssistant = (update: (content: string) => string) => {
+            setMessages(prev => {
+                if (!prev.some(m => m.id === assistantId)) {
+                    return [...prev, {
+                        id: assistantId,
+                        role: 'assistant',
+                        content: update(''),
+                        timestamp: new Date(),
+                    }];
+                }
+                return prev.map(m => m.id === assistantId ? { ...m, content: update(m.content) } : m);
+            });
+        };
+
         try {
             const response = await fetch(
-                `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}/chat`, {
+                `${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}/chat/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream',
                     'x-api-key': `${process.env.NEXT_PUBLIC_CHAT_ENDPOINT_API_KEY}`
                 },
                 body: JSON.stringify({
@@ -82,31 +98,54 @@ export default function Twin() {
                 }),
             });
 
-            if (!response.ok) throw new Error('Failed to send message');
+            if (!response.ok || !response.body) throw new Error('Failed to send message');
 
-            const data = await response.json();
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
 
-            if (!sessionId) {
-                setSessionId(data.session_id);
-            }
+            // Server-sent events arrive as `event:` / `data:` blocks separated by a blank line
+            const handleEvent = (block: string) => {
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                if (!data) return;
+                const payload = JSON.parse(data);
 
-            const assistantMessage: Message = {
-                id: (Date.now() + 1).toString(),
-                role: 'assistant',
-                content: data.response,
-                timestamp: new Date(),
+                if (event === 'session') {
+                    if (!sessionId) setSessionId(payload.session_id);
+                } else if (event === 'token') {
+                    updateAssistant(content => content + payload.delta);
+                } else if (event === 'replace' || event === 'done') {
+                    // The evaluator may have corrected the streamed reply
+                    updateAssistant(() => payload.response);
+                    finished = finished || event === 'done';
+                } else if (event === 'error') {
+                    throw new Error(payload.detail);
+                }
             };
 
-            setMessages(prev => [...prev, assistantMessage]);
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary = buffer.indexOf('\n\n');
+                while (boundary !== -1) {
+                    handleEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                    boundary = buffer.indexOf('\n\n');
+                }
+            }
+            if (buffer.trim()) handleEvent(buffer);
+
+            if (!finished) throw new Error('Stream ended before the response completed');
         } catch (error) {
             console.error('Error:', error);
-            const errorMessage: Message = {
-                id: (Date.now() + 1).toString(),
-                role: 'assistant',
-                content: 'Sorry, I encountered an error. Please try again.',
-                timestamp: new Date(),
-            };
-            setMessages(prev => [...prev, errorMessage]);
+            updateAssistant(() => 'Sorry, I encountered an error. Please try again.');
         } finally {
             setIsLoading(false);
             // Refocus the input after message is sent
@@ -265,8 +304,8 @@ export default function Twin() {
                     </div>
                 ))}
 
-                {/* Typing Indicator */}
-                {isLoading && (
+                {/* Typing Indicator (until the first streamed token arrives) */}
+                {isLoading && messages[messages.length - 1]?.role !== 'assistant' && (
                     <div className="flex gap-3 justify-start animate-fade-in-up">
                         <div className="flex-shrink-0 pt-1">
                             <div
@@ -45,6 +45,30 @@ if [ -n "$OPENCODE_GO_DISABLE_THINKING" ]; then
   export TF_VAR_opencode_go_disable_thinking="$OPENCODE_GO_DISABLE_THINKING"
 fi
 
+if [ -n "$MEMORY_BACKEND" ]; then
+  export TF_VAR_memory_backend="$MEMORY_BACKEND"
+fi
+
+if [ -n "$MEMORY_TTL_DAYS" ]; then
+  export TF_VAR_memory_ttl_days="$MEMORY_TTL_DAYS"
+fi
+
+if [ -n "$PERSONA_SOURCE" ]; then
+  export TF_VAR_persona_source="$PERSONA_SOURCE"
+fi
+
+if [ -n "$EVALUATION_MODE" ]; then
+  export TF_VAR_evaluation_mode="$EVALUATION_MODE"
+fi
+
+if [ -n "$EMAIL_OUTBOX_BACKEND" ]; then
+  export TF_VAR_email_outbox_backend="$EMAIL_OUTBOX_BACKEND"
+fi
+
+if [ -n "$EMAIL_DIGEST_ENABLED" ]; then
+  export TF_VAR_email_digest_enabled="$EMAIL_DIGEST_ENABLED"
+fi
+
 # 1. Build Lambda package
 echo "📦 Building Lambda package..."
 (cd backend && uv run deploy.py)
@@ -76,6 +100,13 @@ fi
 echo "🎯 Applying Terraform..."
 "${TF_APPLY_CMD[@]}"
 
+# Persona documents served from S3 are published separately from the Lambda package
+if [ "$PERSONA_SOURCE" = "s3" ]; then
+  echo "🧑 Publishing persona documents..."
+  MEMORY_BUCKET=$(terraform output -raw s3_memory_bucket)
+  (cd ../backend && PERSONA_S3_BUCKET="$MEMORY_BUCKET" uv run publish_persona.py)
+fi
+
 API_URL=$(terraform output -raw api_gateway_url)
 FRONTEND_BUCKET=$(terraform output -raw s3_frontend_bucket)
 CUSTOM_URL=$(terraform output -raw custom_domain_url 2>/dev/null || true)
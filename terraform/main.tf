@@ -39,6 +39,31 @@ resource "aws_s3_bucket_ownership_controls" "memory" {
   }
 }
 
+# DynamoDB table for conversation memory (one item per message, newest turns read first)
+resource "aws_dynamodb_table" "memory" {
+  count        = var.memory_backend == "dynamodb" ? 1 : 0
+  name         = "${local.name_prefix}-memory"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "session_id"
+  range_key    = "seq"
+  tags         = local.common_tags
+
+  attribute {
+    name = "session_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "seq"
+    type = "N"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
 # S3 bucket for frontend static website
 resource "aws_s3_bucket" "frontend" {
   bucket = "${local.name_prefix}-frontend-${data.aws_caller_identity.current.account_id}"
@@ -85,6 +110,26 @@ resource "aws_s3_bucket_policy" "frontend" {
   depends_on = [aws_s3_bucket_public_access_block.frontend]
 }
 
+# SQS queue for the email outbox (only when email_outbox_backend = "sqs")
+resource "aws_sqs_queue" "email_outbox_dlq" {
+  count                     = var.email_outbox_backend == "sqs" ? 1 : 0
+  name                      = "${local.name_prefix}-email-outbox-dlq"
+  message_retention_seconds = 1209600
+  tags                      = local.common_tags
+}
+
+resource "aws_sqs_queue" "email_outbox" {
+  count                      = var.email_outbox_backend == "sqs" ? 1 : 0
+  name                       = "${local.name_prefix}-email-outbox"
+  visibility_timeout_seconds = var.lambda_timeout * 6
+  tags                       = local.common_tags
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.email_outbox_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+}
+
 # IAM role for Lambda
 resource "aws_iam_role" "lambda_role" {
   name = "${local.name_prefix}-lambda-role"
@@ -119,6 +164,18 @@ resource "aws_iam_role_policy_attachment" "lambda_s3" {
   role       = aws_iam_role.lambda_role.name
 }
 
+resource "aws_iam_role_policy_attachment" "lambda_dynamodb" {
+  count      = var.memory_backend == "dynamodb" ? 1 : 0
+  policy_arn = "arn:aws:iam::aws:policy/AmazonDynamoDBFullAccess"
+  role       = aws_iam_role.lambda_role.name
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_sqs" {
+  count      = var.email_outbox_backend == "sqs" ? 1 : 0
+  policy_arn = "arn:aws:iam::aws:policy/AmazonSQSFullAccess"
+  role       = aws_iam_role.lambda_role.name
+}
+
 # Lambda function
 resource "aws_lambda_function" "api" {
   filename         = "${path.module}/../backend/lambda-deployment.zip"
@@ -136,6 +193,11 @@ resource "aws_lambda_function" "api" {
       CORS_ORIGINS                      = var.use_custom_domain ? "https://${var.root_domain},https://www.${var.root_domain}" : "https://${aws_cloudfront_distribution.main.domain_name}"
       S3_BUCKET                         = aws_s3_bucket.memory.id
       USE_S3                            = "true"
+      MEMORY_BACKEND                    = var.memory_backend
+      DYNAMODB_TABLE                    = var.memory_backend == "dynamodb" ? aws_dynamodb_table.memory[0].name : ""
+      MEMORY_TTL_DAYS                   = tostring(var.memory_ttl_days)
+      PERSONA_SOURCE                    = var.persona_source
+      PERSONA_S3_BUCKET                 = aws_s3_bucket.memory.id
       BEDROCK_MODEL_ID                  = var.bedrock_model_id
       USE_OPENROUTER                    = var.use_openrouter ? "true" : "false"
       USE_EVALUATION_OPENROUTER         = var.use_evaluation_openrouter ? "true" : "false"
@@ -144,6 +206,7 @@ resource "aws_lambda_function" "api" {
       EVALUATION_MODEL_NAME             = var.evaluation_model_name
       EVALUATION_PROVIDER_ORDER_ENABLED = var.evaluation_provider_order_enabled ? "true" : "false"
       EVALUATION_PROVIDER_ORDER         = var.evaluation_provider_order
+      EVALUATION_MODE                   = var.evaluation_mode
       OPENCODE_GO_API_KEY               = var.opencode_go_api_key
       OPENCODE_GO_MODEL                 = var.opencode_go_model
       OPENCODE_GO_API_STYLE             = var.opencode_go_api_style
@@ -154,6 +217,9 @@ resource "aws_lambda_function" "api" {
       MAILJET_TO_EMAIL                  = var.mailjet_to_email
       CHAT_ENDPOINT_API_KEY             = var.chat_endpoint_api_key
       CHECK_CHAT_API_KEY                = var.check_chat_api_key ? "true" : "false"
+      EMAIL_OUTBOX_BACKEND              = var.email_outbox_backend
+      EMAIL_OUTBOX_QUEUE_URL            = var.email_outbox_backend == "sqs" ? aws_sqs_queue.email_outbox[0].url : ""
+      EMAIL_DIGEST_ENABLED              = var.email_digest_enabled ? "true" : "false"
     }
   }
 
@@ -161,6 +227,16 @@ resource "aws_lambda_function" "api" {
   depends_on = [aws_cloudfront_distribution.main]
 }
 
+# Deliver email outbox jobs with the same Lambda function
+resource "aws_lambda_event_source_mapping" "email_outbox" {
+  count                              = var.email_outbox_backend == "sqs" ? 1 : 0
+  event_source_arn                   = aws_sqs_queue.email_outbox[0].arn
+  function_name                      = aws_lambda_function.api.arn
+  batch_size                         = var.email_outbox_batching_window_seconds > 0 ? 100 : 10
+  maximum_batching_window_in_seconds = var.email_outbox_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
 # API Gateway HTTP API
 resource "aws_apigatewayv2_api" "main" {
   name          = "${local.name_prefix}-api-gateway"
@@ -207,6 +283,12 @@ resource "aws_apigatewayv2_route" "post_chat" {
   target    = "integrations/${aws_apigatewayv2_integration.lambda.id}"
 }
 
+resource "aws_apigatewayv2_route" "post_chat_stream" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /chat/stream"
+  target    = "integrations/${aws_apigatewayv2_integration.lambda.id}"
+}
+
 resource "aws_apigatewayv2_route" "get_health" {
   api_id    = aws_apigatewayv2_api.main.id
   route_key = "GET /health"
@@ -124,6 +124,64 @@ variable "evaluation_provider_order" {
   default     = ""
 }
 
+variable "memory_backend" {
+  description = "Conversation memory store: s3 keeps an append-only log per session, dynamodb stores one item per message with TTL"
+  type        = string
+  default     = "s3"
+  validation {
+    condition     = contains(["s3", "dynamodb"], var.memory_backend)
+    error_message = "Memory backend must be one of: s3, dynamodb."
+  }
+}
+
+variable "memory_ttl_days" {
+  description = "Days after its last write before a DynamoDB conversation item expires (0 disables expiry)"
+  type        = number
+  default     = 30
+}
+
+variable "persona_source" {
+  description = "Where the Lambda reads persona documents: local uses the copy in the deployment package, s3 polls the memory bucket so they can be updated without a redeploy"
+  type        = string
+  default     = "local"
+  validation {
+    condition     = contains(["local", "s3"], var.persona_source)
+    error_message = "Persona source must be one of: local, s3."
+  }
+}
+
+variable "evaluation_mode" {
+  description = "Evaluation policy: full evaluates every reply with the evaluator model, tiered pre-screens replies locally first"
+  type        = string
+  default     = "full"
+  validation {
+    condition     = contains(["full", "tiered"], var.evaluation_mode)
+    error_message = "Evaluation mode must be one of: full, tiered."
+  }
+}
+
+variable "email_outbox_backend" {
+  description = "Email outbox queue: sqs delivers jobs through an SQS queue, memory keeps them in the Lambda process and sends whatever is left at the end of each invocation"
+  type        = string
+  default     = "sqs"
+  validation {
+    condition     = contains(["memory", "sqs"], var.email_outbox_backend)
+    error_message = "Email outbox backend must be one of: memory, sqs."
+  }
+}
+
+variable "email_digest_enabled" {
+  description = "Buffer owner notifications and send them as a single digest email"
+  type        = bool
+  default     = false
+}
+
+variable "email_outbox_batching_window_seconds" {
+  description = "How long SQS gathers outbox jobs before invoking Lambda; with digests enabled each batch becomes one digest email"
+  type        = number
+  default     = 0
+}
+
 variable "mailjet_api_key" {
   description = "Mailjet API key"
   type        = string